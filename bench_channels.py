@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Benchmark the notification channels against local stand-in servers.
+
+Nothing leaves the machine: Telegram, SendGrid and Twilio are served by
+one fake HTTP server on localhost, and email by a minimal SMTP server
+(no TLS or AUTH). Every new connection pays handshake_ms once - standing
+in for the TCP/TLS (and EHLO/AUTH) setup the pools avoid - and every
+request pays latency_ms.
+
+Each channel is timed cold (pools closed before every send, as if each
+notification opened its own connection) and pooled. Then all channels
+are sent together through send_notification(), one after the other and
+in parallel.
+
+Usage:
+    python bench_channels.py [sends] [latency_ms] [handshake_ms]
+"""
+
+import json
+import os
+import socketserver
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    """Answers Telegram sendMessage, SendGrid mail/send and Twilio Messages.json POSTs."""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    disable_nagle_algorithm = True
+    latency_seconds = 0.0
+    handshake_seconds = 0.0
+
+    def setup(self):
+        super().setup()
+        time.sleep(self.handshake_seconds)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.latency_seconds)
+
+        if self.path.endswith('/sendMessage'):
+            status, body = 200, {'ok': True, 'result': {'message_id': 1}}
+        elif self.path == '/v3/mail/send':
+            status, body = 202, None
+        elif self.path.endswith('/Messages.json'):
+            status, body = 201, {'sid': 'SM' + '0' * 32, 'status': 'queued'}
+        else:
+            status, body = 404, {'error': 'not found'}
+
+        data = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeSmtpHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT."""
+
+    latency_seconds = 0.0
+    handshake_seconds = 0.0
+
+    def reply(self, line: str):
+        self.wfile.write(line.encode() + b'\r\n')
+        self.wfile.flush()
+
+    def handle(self):
+        time.sleep(self.handshake_seconds)
+        self.reply('220 localhost fake SMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().split(' ', 1)[0].upper()
+
+            if command == 'EHLO':
+                self.reply('250-localhost')
+                self.reply('250 8BITMIME')
+            elif command in ('HELO', 'MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                time.sleep(self.latency_seconds)
+                self.reply('250 OK queued')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+def _serve(server):
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _time(fn, sends, cold):
+    """Mean milliseconds per call of fn over sends calls (closing the pools first if cold)."""
+    from hockey_agent.pools import close_pools
+
+    timings = []
+    for _ in range(sends):
+        if cold:
+            close_pools()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.mean(timings) * 1000
+
+
+def main():
+    """Time each channel cold and pooled, then all channels together."""
+    sends = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 20.0
+    handshake_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 60.0
+
+    for handler in (FakeApiHandler, FakeSmtpHandler):
+        handler.latency_seconds = latency_ms / 1000
+        handler.handshake_seconds = handshake_ms / 1000
+    api = _serve(ThreadingHTTPServer(('127.0.0.1', 0), FakeApiHandler))
+    smtp = _serve(socketserver.ThreadingTCPServer(('127.0.0.1', 0), FakeSmtpHandler))
+    api_url = f"http://127.0.0.1:{api.server_address[1]}"
+
+    # Point every channel at the stand-ins (before hockey_agent reads its config)
+    os.environ.update({
+        'NOTIFICATION_METHOD': 'telegram,email,sms',
+        'TELEGRAM_BOT_TOKEN': '123:fake', 'TELEGRAM_CHAT_ID': '42', 'TELEGRAM_API_BASE_URL': api_url,
+        'EMAIL_PROVIDER': 'smtp', 'NOTIFICATION_EMAIL': 'player@example.com', 'EMAIL_FROM': 'agent@example.com',
+        'SMTP_HOST': '127.0.0.1', 'SMTP_PORT': str(smtp.server_address[1]), 'SMTP_USERNAME': '',
+        'SMTP_STARTTLS': 'false', 'SMTP_SSL': 'false',
+        'SENDGRID_API_KEY': 'SG.fake', 'SENDGRID_API_BASE_URL': api_url,
+        'TWILIO_ACCOUNT_SID': 'ACfake', 'TWILIO_AUTH_TOKEN': 'fake', 'TWILIO_API_KEY': '', 'TWILIO_API_SECRET': '',
+        'TWILIO_FROM_PHONE': '+15550000000', 'TWILIO_TO_PHONE': '+15550000001', 'TWILIO_API_BASE_URL': api_url,
+    })
+
+    import logging
+    from hockey_agent import notifier
+    from hockey_agent.pools import close_pools, pool_stats
+
+    logging.getLogger('hockey_agent').setLevel(logging.WARNING)
+    sessions = [{'site': 'IceHQ', 'session_type': 'Stick & Puck', 'date_time': 'Sat Jan 10 10:00am - 11:00am',
+                 'url': 'https://example.com/stick-and-puck'}]
+
+    channels = [
+        ('telegram', lambda: notifier.send_telegram_notification(sessions, 1)),
+        ('email (smtp)', lambda: notifier.send_email_notification(sessions, 1)),
+        ('sms', lambda: notifier.send_sms_notification(sessions, 1)),
+    ]
+
+    print(f"\nStand-ins at {api_url} and smtp://127.0.0.1:{smtp.server_address[1]} "
+          f"({latency_ms:.0f}ms per request, {handshake_ms:.0f}ms per new connection), {sends} sends\n")
+    print(f"{'channel':<16} {'cold ms':>8} {'pooled ms':>10} {'speedup':>8}")
+    for name, send in channels:
+        cold = _time(send, sends, cold=True)
+        pooled = _time(send, sends, cold=False)
+        print(f"{name:<16} {cold:>8.1f} {pooled:>10.1f} {cold / pooled:>7.1f}x")
+
+    print(f"\n{'all channels':<16} {'ms/notification':>16}")
+    sequential = _time(lambda: [send() for _, send in channels], sends, cold=False)
+    print(f"{'one by one':<16} {sequential:>16.1f}")
+    parallel = _time(lambda: notifier.send_notification(sessions, 1), sends, cold=False)
+    print(f"{'parallel':<16} {parallel:>16.1f}")
+
+    print(f"\n{'pool':<12} {'hits':>6} {'misses':>7} {'hit rate':>9}")
+    for name, stats in sorted(pool_stats().items()):
+        print(f"{name:<12} {stats['hits']:>6} {stats['misses']:>7} {stats['hit_rate']:>8.0%}")
+
+    close_pools()
+    api.shutdown()
+    smtp.shutdown()
+    print()
+
+
+if __name__ == "__main__":
+    main()
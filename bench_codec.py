@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark the JSON codec against the standard library on a large catalogue.
+
+Builds a synthetic catalogue shaped like IceHQ's data-product blobs and a
+seen-sessions store of the matching size, then times:
+
+    - parsing every product blob (what the scrapers do per product block)
+    - writing and reading the seen store (what storage.py does per session)
+
+with stdlib json (pretty-printed, as the stores used to be written) and
+with hockey_agent.codec (orjson if installed, compact output).
+
+Usage:
+    python bench_codec.py [products] [variants_per_product]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from hockey_agent import codec
+
+
+def build_catalogue(products, variants):
+    """Build product JSON blobs and a seen store with one entry per variant."""
+    blobs = []
+    seen = {}
+    for p in range(products):
+        product = {
+            'id': p,
+            'title': f"Stick & Puck {p}",
+            'variants': [
+                {
+                    'id': p * variants + v,
+                    'attributes': {'Date/time': f"Saturday {v % 28 + 1}th November 10:00am-11:00am"},
+                    'soldOut': v % 3 == 0,
+                    'qtyInStock': v % 20,
+                    'price': 2500,
+                }
+                for v in range(variants)
+            ],
+        }
+        blobs.append(json.dumps(product))
+        for variant in product['variants']:
+            seen[f"IceHQ:{product['title']}:{variant['attributes']['Date/time']}:{variant['id']}"] = {
+                'status': 'SOLD OUT' if variant['soldOut'] else 'AVAILABLE',
+                'last_updated': '2025-11-01T10:00:00',
+                'session_data': {'session_type': product['title'], 'qty_in_stock': variant['qtyInStock']},
+            }
+    return blobs, {'sessions': seen}
+
+
+def best_of(fn, repeat=5):
+    """Fastest of several runs, in milliseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    """Time stdlib json against the codec and print a comparison."""
+    products = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    variants = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    blobs, store = build_catalogue(products, variants)
+
+    path = os.path.join(tempfile.mkdtemp(), 'seen_sessions.json')
+
+    def stdlib_write():
+        with open(path, 'w') as f:
+            json.dump(store, f, indent=2)
+
+    def stdlib_read():
+        with open(path, 'r') as f:
+            json.load(f)
+
+    def codec_write():
+        codec.dump_file(path, store)
+
+    def codec_read():
+        codec.load_file(path)
+
+    stdlib_write()
+    pretty_size = os.path.getsize(path)
+    codec_write()
+    compact_size = os.path.getsize(path)
+
+    rows = [
+        ('parse product blobs', best_of(lambda: [json.loads(b) for b in blobs]),
+         best_of(lambda: [codec.loads(b) for b in blobs])),
+        ('write seen store', best_of(stdlib_write), best_of(codec_write)),
+    ]
+    stdlib_write()
+    stdlib_read_ms = best_of(stdlib_read)
+    codec_write()
+    rows.append(('read seen store', stdlib_read_ms, best_of(codec_read)))
+
+    print(f"\n{products} products x {variants} variants = {products * variants} sessions "
+          f"(codec backend: {codec.BACKEND})\n")
+    print(f"  {'':<22}{'stdlib':>10}{'codec':>10}{'speedup':>10}")
+    for label, stdlib_ms, codec_ms in rows:
+        print(f"  {label:<22}{stdlib_ms:>8.1f}ms{codec_ms:>8.1f}ms{stdlib_ms / codec_ms:>9.1f}x")
+    print(f"\n  seen store size: {pretty_size / 1024:.0f} KB pretty, {compact_size / 1024:.0f} KB compact\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark columnar (NumPy) filtering and diffing against the per-dict checks.
+
+Builds a synthetic multi-rink catalogue, a booked list and a seen store
+covering part of it, then times:
+
+    - the MONITOR_DATES filter the scrapers apply to every variant
+    - classifying sessions as booked, new or reopened (what a check does per site)
+
+with hockey_agent.columnar as-is and with its per-dict fallback (as if
+NumPy weren't installed). Both runs must agree on the classification.
+
+A check streams each site in product blocks of a few dozen variants, so
+classifying is also timed per block (per-dict and columnar) and with the
+blocks joined into DIFF_BATCH_ROWS batches, as _check_sites() does.
+
+Usage:
+    MONITOR_DATES=2025-11-08,2025-12-14 python bench_columnar.py [rinks] [sessions_per_rink] [block_rows]
+"""
+
+import random
+import sys
+import time
+from hockey_agent import columnar
+from hockey_agent.config import MONITOR_DATES, DIFF_BATCH_ROWS
+from hockey_agent.scraper import batch_blocks
+from hockey_agent.scrapers.icehq_playwright import _matches_filter
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+MONTHS = ['November', 'December', 'January']
+
+
+def build_catalogue(rinks, per_rink, seed=1):
+    """Build sessions, booked entries and previous statuses."""
+    rng = random.Random(seed)
+    sessions = []
+    for r in range(rinks):
+        for _ in range(per_rink):
+            hour = rng.randint(6, 21)
+            sessions.append({
+                'site': f"Rink {r}",
+                'session_type': rng.choice(['Stick & Puck', 'Public Skate', 'Drop-in Hockey']),
+                'date_time': f"{rng.choice(DAYS)} {rng.randint(1, 28)}th {rng.choice(MONTHS)} {hour}:00-{hour + 1}:00",
+                'status': rng.choice(['AVAILABLE', 'SOLD OUT']),
+                'qty_in_stock': rng.randint(0, 20),
+            })
+
+    booked = {s['date_time'] for s in rng.sample(sessions, 20)}
+    previous = {columnar.session_id(s): rng.choice(['AVAILABLE', 'SOLD OUT'])
+                for s in rng.sample(sessions, len(sessions) // 2)}
+    return sessions, booked, previous
+
+
+def best_of(fn, repeat=5):
+    """Fastest of several runs, in milliseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def timed(numpy, fn):
+    """Time fn with the NumPy path switched on or off."""
+    have_numpy = columnar.HAVE_NUMPY
+    columnar.HAVE_NUMPY = numpy and have_numpy
+    try:
+        return best_of(fn), fn()
+    finally:
+        columnar.HAVE_NUMPY = have_numpy
+
+
+def main():
+    """Time the columnar path against the per-dict fallback and print a comparison."""
+    if not MONITOR_DATES:
+        raise SystemExit("Set MONITOR_DATES (e.g. MONITOR_DATES=2025-11-08) to benchmark the filter")
+    rinks = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    per_rink = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    block_rows = int(sys.argv[3]) if len(sys.argv) > 3 else 24
+    sessions, booked, previous = build_catalogue(rinks, per_rink)
+    blocks = [sessions[i:i + block_rows] for i in range(0, len(sessions), block_rows)]
+
+    def filter_all():
+        return columnar.filter_sessions(sessions, _matches_filter)
+
+    def classify_all():
+        return columnar.classify_sessions(sessions, booked, previous, skip_booked=True)
+
+    rows = []
+    for label, fn in (('filter (MONITOR_DATES)', filter_all), ('classify booked/new/reopened', classify_all)):
+        dict_ms, dict_result = timed(False, fn)
+        column_ms, column_result = timed(True, fn)
+        rows.append((label, dict_ms, column_ms))
+        if label.startswith('classify') and dict_result != column_result:
+            raise SystemExit("Columnar and per-dict classification disagree")
+
+    def classify_blocks(batches):
+        return [row for batch in batches
+                for row in zip(*columnar.classify_sessions(batch, booked, previous, skip_booked=True))]
+
+    blocked = []
+    for label, fn in ((f'per block ({block_rows} rows)', lambda: classify_blocks(blocks)),
+                      (f'batched ({DIFF_BATCH_ROWS} rows)', lambda: classify_blocks(batch_blocks(blocks, DIFF_BATCH_ROWS)))):
+        dict_ms, dict_result = timed(False, fn)
+        column_ms, column_result = timed(True, fn)
+        blocked.append((label, dict_ms, column_ms))
+        if dict_result != column_result:
+            raise SystemExit("Columnar and per-dict classification disagree")
+
+    print(f"\n{rinks} rinks x {per_rink} sessions = {len(sessions)} sessions "
+          f"(NumPy {'installed' if columnar.HAVE_NUMPY else 'not installed'})\n")
+    print(f"  {'':<30}{'per-dict':>10}{'columnar':>10}{'speedup':>10}")
+    for label, dict_ms, column_ms in rows:
+        print(f"  {label:<30}{dict_ms:>8.1f}ms{column_ms:>8.1f}ms{dict_ms / column_ms:>9.1f}x")
+
+    print(f"\n  classify in {len(blocks)} product blocks, as a check streams them")
+    print(f"  {'':<30}{'per-dict':>10}{'columnar':>10}{'speedup':>10}")
+    for label, dict_ms, column_ms in blocked:
+        print(f"  {label:<30}{dict_ms:>8.1f}ms{column_ms:>8.1f}ms{dict_ms / column_ms:>9.1f}x")
+    print()
+
+
+if __name__ == "__main__":
+    main()
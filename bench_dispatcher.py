@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark the SMS dispatcher against a local fake Twilio server.
+
+Nothing is sent to Twilio: the dispatcher is pointed at a server on
+localhost that accepts Messages.json POSTs and replies like Twilio does.
+
+Usage:
+    python bench_dispatcher.py [recipients] [server_latency_ms]
+"""
+
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class FakeTwilioHandler(BaseHTTPRequestHandler):
+    """Accepts message creation requests and returns a fake SID."""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    disable_nagle_algorithm = True
+    latency_seconds = 0.0
+    received = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        time.sleep(self.latency_seconds)
+
+        with FakeTwilioHandler.lock:
+            FakeTwilioHandler.received += 1
+            sid = f"SM{FakeTwilioHandler.received:032d}"
+
+        body = json.dumps({'sid': sid, 'to': form.get('To', [''])[0], 'status': 'queued'}).encode()
+        self.send_response(201)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    """Run the dispatcher at several concurrency levels and print throughput."""
+    recipients = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 20.0
+
+    FakeTwilioHandler.latency_seconds = latency_ms / 1000
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeTwilioHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    from hockey_agent.dispatcher import NotificationDispatcher, TwilioRestSender
+
+    print(f"\nFake Twilio at {base_url} ({latency_ms:.0f}ms per request), {recipients} recipients\n")
+    print(f"{'workers':>8} {'sent':>6} {'dupes':>6} {'seconds':>8} {'msg/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+
+    # Every 10th recipient is listed twice to exercise deduplication
+    messages = [(f"+6140{i:07d}", "Spot opened: Stick & Puck Sat 10am") for i in range(recipients)]
+    messages += messages[::10]
+
+    for concurrency in (1, 8, 32, 64):
+        dispatcher = NotificationDispatcher(
+            sender=TwilioRestSender(base_url, max_idle=concurrency),
+            concurrency=concurrency,
+            rate_per_second=0,
+            dedup_seconds=3600
+        )
+        stats = dispatcher.dispatch(messages)
+        print(
+            f"{concurrency:>8} {stats['sent']:>6} {stats['deduplicated']:>6} "
+            f"{stats['elapsed_seconds']:>8.2f} {stats['messages_per_second']:>8.0f} "
+            f"{stats['latency_p50'] * 1000:>8.1f} {stats['latency_p95'] * 1000:>8.1f}"
+        )
+
+    server.shutdown()
+    print()
+
+
+if __name__ == "__main__":
+    main()
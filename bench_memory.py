@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Find the smallest Lambda memory setting at which the scrape still succeeds.
+
+Runs the scrape several times to measure peak memory, then re-runs it at
+decreasing memory limits. At each limit the browser is killed as soon as
+total memory (agent + browser) goes over, the way Lambda would kill the
+function. The smallest limit where every trial still returns the same
+sessions as an unlimited run is reported.
+
+Set BROWSER_LOW_MEMORY=true to benchmark the low-memory launch profile.
+
+Usage:
+    python bench_memory.py [trials]
+"""
+
+import logging
+import math
+import sys
+from hockey_agent.config import SITES_TO_MONITOR, BROWSER_LOW_MEMORY
+from hockey_agent.process_tree import PeakRssSampler
+from hockey_agent.scrapers.icehq_playwright import scrape_icehq
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+MB = 1024 * 1024
+LAMBDA_STEP_MB = 64  # round settings to a sensible granularity
+LAMBDA_MIN_MB = 128
+
+
+def run_trial(url, name, limit_bytes=None):
+    """Run one scrape, returning (session count, peak total bytes, killed)."""
+    with PeakRssSampler(interval=0.05, limit_bytes=limit_bytes) as sampler:
+        sessions = scrape_icehq(url, name)
+    return len(sessions), sampler.peak_total_bytes, sampler.exceeded
+
+
+def main():
+    """Measure peak memory, then search downwards for the smallest reliable setting."""
+    trials = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    site = SITES_TO_MONITOR[0]
+    url, name = site['url'], site['name']
+
+    print(f"\nLow-memory profile: {'ON' if BROWSER_LOW_MEMORY else 'OFF'}")
+    print(f"Measuring {trials} unlimited run(s) of {name}...\n")
+
+    baseline_count = None
+    peaks = []
+    for i in range(trials):
+        count, peak, _ = run_trial(url, name)
+        peaks.append(peak)
+        print(f"  run {i + 1}: {count} sessions, peak {peak / MB:.0f} MB")
+        if baseline_count is None:
+            baseline_count = count
+        elif count != baseline_count:
+            print("  (session count changed between runs - results may be noisy)")
+
+    if not baseline_count:
+        print("\nNo sessions found on unlimited runs; can't judge success. Aborting.\n")
+        return 1
+
+    start_mb = math.ceil(max(peaks) / MB / LAMBDA_STEP_MB) * LAMBDA_STEP_MB + LAMBDA_STEP_MB
+    smallest_ok = None
+
+    print(f"\nSearching down from {start_mb} MB in {LAMBDA_STEP_MB} MB steps...\n")
+    limit_mb = start_mb
+    while limit_mb >= LAMBDA_MIN_MB:
+        ok = 0
+        for _ in range(trials):
+            count, _, killed = run_trial(url, name, limit_bytes=limit_mb * MB)
+            if not killed and count == baseline_count:
+                ok += 1
+        print(f"  {limit_mb:5d} MB: {ok}/{trials} succeeded")
+        if ok < trials:
+            break
+        smallest_ok = limit_mb
+        limit_mb -= LAMBDA_STEP_MB
+
+    print()
+    if smallest_ok:
+        print(f"Smallest reliable setting: {smallest_ok} MB (set MemorySize in template.yaml)")
+    else:
+        print(f"Scrape did not succeed reliably even at {start_mb} MB")
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
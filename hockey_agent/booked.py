@@ -1,10 +1,11 @@
 """Track sessions you've already booked."""
 
-import json
-import os
-from typing import List, Set
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 from datetime import datetime
-from hockey_agent.config import BOOKED_SESSIONS_FILE
+from hockey_agent import codec, filestore
+from hockey_agent.config import BOOKED_SESSIONS_FILE, SESSION_RETENTION_GRACE_HOURS
+from hockey_agent.dates import session_has_ended, session_key
 
 logger = None
 try:
@@ -16,44 +17,92 @@ except:
 
 def _load_booked_sessions() -> Set[str]:
     """Load the set of booked session identifiers from storage."""
-    if os.path.exists(BOOKED_SESSIONS_FILE):
-        try:
-            with open(BOOKED_SESSIONS_FILE, 'r') as f:
-                data = json.load(f)
-                return set(data.get('booked_sessions', []))
-        except (json.JSONDecodeError, IOError) as e:
-            if logger:
-                logger.error(f"Error loading booked sessions: {e}")
-            return set()
-    return set()
+    try:
+        data = filestore.read_json(BOOKED_SESSIONS_FILE)
+        return set(data.get('booked_sessions', []))
+    except FileNotFoundError:
+        return set()
+    except (codec.JSONDecodeError, IOError) as e:
+        if logger:
+            logger.error("Error loading booked sessions: %s", e)
+        return set()
 
 
 def _save_booked_sessions(booked_sessions: Set[str]):
-    """Save the set of booked session identifiers to storage."""
+    """Save the set of booked session identifiers to storage (hold filestore.locked)."""
     try:
-        with open(BOOKED_SESSIONS_FILE, 'w') as f:
-            json.dump({
-                'booked_sessions': sorted(list(booked_sessions)),
-                'last_updated': datetime.now().isoformat()
-            }, f, indent=2)
+        filestore.write_json(BOOKED_SESSIONS_FILE, {
+            'booked_sessions': sorted(list(booked_sessions)),
+            'last_updated': datetime.now().isoformat()
+        })
     except IOError as e:
-        print(f"Error saving booked sessions: {e}")
+        if logger:
+            logger.error("Error saving booked sessions: %s", e)
+        else:
+            print(f"Error saving booked sessions: {e}")
+
+
+# Month and weekday names as is_booked() looks for them (last match wins)
+_MONTH_NAMES = ['january', 'february', 'march', 'april', 'may', 'june',
+                'july', 'august', 'september', 'october', 'november', 'december',
+                'jan', 'feb', 'mar', 'apr', 'may', 'jun',
+                'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+_DAY_NAMES = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday',
+              'mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
 
+def match_key(text: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    Extract the components is_booked() compares.
+
+    Args:
+        text: Lower-cased date/time string
 
-def is_booked(date_time: str) -> bool:
+    Returns:
+        (first number, 3-letter month, 3-letter weekday), each None if absent
+    """
+    numbers = re.findall(r'\d+', text)
+
+    month = None
+    for name in _MONTH_NAMES:
+        if name in text:
+            month = name[:3]  # Use 3-letter abbreviation
+
+    day = None
+    for name in _DAY_NAMES:
+        if name in text:
+            day = name[:3]  # Use 3-letter abbreviation
+
+    return (numbers[0] if numbers else None), month, day
+
+
+def load_booked_sessions() -> Set[str]:
+    """
+    Load the booked sessions once, e.g. to check a whole batch with is_booked().
+
+    Returns:
+        Set of booked session date/time strings
+    """
+    return _load_booked_sessions()
+
+
+def is_booked(date_time: str, booked_sessions: Optional[Set[str]] = None) -> bool:
     """
     Check if a session is already booked.
 
     Args:
         date_time: The date/time string from the session
+        booked_sessions: Booked sessions already loaded (loaded from storage if None)
 
     Returns:
         True if this session is already booked
     """
-    booked_sessions = _load_booked_sessions()
+    if booked_sessions is None:
+        booked_sessions = _load_booked_sessions()
 
     # Normalize the date_time string for matching
     normalized = date_time.lower().strip()
+    session_number, session_month, session_day = match_key(normalized)
 
     # Check if any booked session matches
     for booked in booked_sessions:
@@ -64,50 +113,54 @@ def is_booked(date_time: str) -> bool:
             return True
 
         # Try more flexible matching by extracting key date components
-        # Extract numbers (day of month) from both strings
-        import re
+        booked_number, booked_month, booked_day = match_key(booked_lower)
 
-        # Get all numbers from both strings
-        session_numbers = re.findall(r'\d+', normalized)
-        booked_numbers = re.findall(r'\d+', booked_lower)
+        # If we have matching day of week, month, and day of month, it's a match
+        if session_number and booked_number:
+            # Check if day of month matches (first number is usually the day)
+            if session_number == booked_number:  # Same day of month
+                if session_month == booked_month:  # Same month
+                    if session_day == booked_day or session_day is None or booked_day is None:
+                        return True
 
-        # Get month names/abbreviations from both strings
-        months = ['january', 'february', 'march', 'april', 'may', 'june',
-                 'july', 'august', 'september', 'october', 'november', 'december',
-                 'jan', 'feb', 'mar', 'apr', 'may', 'jun',
-                 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+    return False
 
-        session_month = None
-        booked_month = None
 
-        for month in months:
-            if month in normalized:
-                session_month = month[:3]  # Use 3-letter abbreviation
-            if month in booked_lower:
-                booked_month = month[:3]
+def _add_booked_sessions(date_times: Iterable[str]) -> List[str]:
+    """Add sessions to the booked list with one read and one write (see add_booked_sessions)."""
+    with filestore.locked(BOOKED_SESSIONS_FILE):
+        booked_sessions = _load_booked_sessions()
+        keys = {session_key(booked) for booked in booked_sessions}
+        added = []
+        for date_time in date_times:
+            date_time = date_time.strip()
+            key = session_key(date_time)
+            if date_time and key not in keys:
+                keys.add(key)
+                booked_sessions.add(date_time)
+                added.append(date_time)
 
-        # Get day names from both strings
-        days = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday',
-                'mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+        if added:
+            _save_booked_sessions(booked_sessions)
+        return added
 
-        session_day = None
-        booked_day = None
 
-        for day in days:
-            if day in normalized:
-                session_day = day[:3]  # Use 3-letter abbreviation
-            if day in booked_lower:
-                booked_day = day[:3]
+def add_booked_sessions(date_times: Iterable[str]) -> List[str]:
+    """
+    Add many sessions to your booked list with one read and one write.
 
-        # If we have matching day of week, month, and day of month, it's a match
-        if session_numbers and booked_numbers:
-            # Check if day of month matches (first number is usually the day)
-            if session_numbers[0] == booked_numbers[0]:  # Same day of month
-                if session_month == booked_month:  # Same month
-                    if session_day == booked_day or session_day is None or booked_day is None:
-                        return True
+    Sessions already booked (compared by session_key, so in any format) are skipped.
 
-    return False
+    Args:
+        date_times: Date/time strings to mark as booked
+
+    Returns:
+        The entries that weren't already booked
+    """
+    added = _add_booked_sessions(date_times)
+    if logger:
+        logger.info("Added %d booked session(s)", len(added))
+    return added
 
 
 def add_booked_session(date_time: str):
@@ -117,41 +170,95 @@ def add_booked_session(date_time: str):
     Args:
         date_time: The date/time string to mark as booked
     """
-    booked_sessions = _load_booked_sessions()
-    booked_sessions.add(date_time.strip())
-    _save_booked_sessions(booked_sessions)
+    _add_booked_sessions([date_time])
     if logger:
-        logger.info(f"Added booked session: {date_time}")
+        logger.info("Added booked session: %s", date_time)
     else:
         print(f"Added booked session: {date_time}")
 
 
-def remove_booked_session(date_time: str):
+def remove_booked_sessions(date_times: Iterable[str]) -> Set[str]:
     """
-    Remove a session from your booked list.
+    Remove many sessions from your booked list with one read and one write.
+
+    A string with a date and start time removes the entries for that
+    session, whatever format they were written in (compared by
+    session_key). Anything less specific (e.g. just "Nov 9") removes every
+    entry that equals or contains it, as remove_booked_session always has.
 
     Args:
-        date_time: The date/time string to remove
+        date_times: Date/time strings (or parts of them) to remove
+
+    Returns:
+        The entries removed
     """
-    booked_sessions = _load_booked_sessions()
-    # Try to remove exact match or partial match
-    to_remove = set()
-    normalized = date_time.lower().strip()
+    with filestore.locked(BOOKED_SESSIONS_FILE):
+        booked_sessions = _load_booked_sessions()
+        by_text: Dict[str, Set[str]] = {}
+        by_key: Dict[str, Set[str]] = {}
+        for booked in booked_sessions:
+            by_text.setdefault(booked.lower().strip(), set()).add(booked)
+            by_key.setdefault(session_key(booked), set()).add(booked)
+
+        to_remove = set()
+        for date_time in date_times:
+            normalized = date_time.lower().strip()
+            key = session_key(date_time)
+            to_remove |= by_text.get(normalized, set())
+            if 'T' in key:
+                to_remove |= by_key.get(key, set())
+            else:
+                # Partial match, e.g. "Nov 9" (scans every entry)
+                to_remove |= {booked for text, entries in by_text.items() if normalized in text for booked in entries}
+
+        if to_remove:
+            _save_booked_sessions(booked_sessions - to_remove)
+        return to_remove
 
-    for booked in booked_sessions:
-        if booked.lower().strip() == normalized or normalized in booked.lower().strip():
-            to_remove.add(booked)
 
-    for item in to_remove:
-        booked_sessions.discard(item)
+def remove_booked_session(date_time: str):
+    """
+    Remove a session from your booked list.
 
-    _save_booked_sessions(booked_sessions)
+    Args:
+        date_time: The date/time string to remove
+    """
+    to_remove = remove_booked_sessions([date_time])
     if logger:
-        logger.info(f"Removed booked session(s): {to_remove}")
+        logger.info("Removed booked session(s): %s", to_remove)
     else:
         print(f"Removed booked session(s): {to_remove}")
 
 
+def replace_booked_sessions(date_times: Iterable[str]) -> Tuple[List[str], List[str]]:
+    """
+    Make the booked list exactly date_times, with one read and (if anything changed) one write.
+
+    Entries are compared by session_key, so an existing entry written in a
+    different format (e.g. "Saturday 8th November 10:00am" vs "Sat 8 Nov 10am")
+    is kept as it is rather than removed and re-added.
+
+    Args:
+        date_times: The complete set of booked date/time strings
+
+    Returns:
+        (entries added, entries removed)
+    """
+    with filestore.locked(BOOKED_SESSIONS_FILE):
+        booked_sessions = _load_booked_sessions()
+        current = {session_key(booked): booked for booked in booked_sessions}
+        wanted = {session_key(date_time): date_time.strip() for date_time in date_times if date_time.strip()}
+
+        added = sorted(date_time for key, date_time in wanted.items() if key not in current)
+        removed = sorted(booked for booked in booked_sessions if session_key(booked) not in wanted)
+
+        if added or removed:
+            _save_booked_sessions((booked_sessions - set(removed)) | set(added))
+        if logger:
+            logger.info("Synced booked sessions: %d added, %d removed", len(added), len(removed))
+        return added, removed
+
+
 def list_booked_sessions() -> List[str]:
     """
     Get a list of all booked sessions.
@@ -163,12 +270,28 @@ def list_booked_sessions() -> List[str]:
     return sorted(list(booked_sessions))
 
 
-def clear_old_sessions():
+def clear_old_sessions(grace_hours: float = SESSION_RETENTION_GRACE_HOURS,
+                       now: Optional[datetime] = None) -> int:
     """
     Clear sessions that are in the past.
 
-    Note: This is a placeholder. Actual implementation would need
-    date parsing logic based on the format of your date strings.
+    Booked strings whose date can't be parsed are kept.
+
+    Args:
+        grace_hours: How long to keep a session after it ends
+        now: Current time (defaults to now)
+
+    Returns:
+        Number of booked sessions removed
     """
-    # TODO: Implement if needed
-    pass
+    with filestore.locked(BOOKED_SESSIONS_FILE):
+        booked_sessions = _load_booked_sessions()
+        now = now or datetime.now()
+
+        kept = {b for b in booked_sessions if not session_has_ended(b, grace_hours, now)}
+        removed = len(booked_sessions) - len(kept)
+        if removed:
+            _save_booked_sessions(kept)
+            if logger:
+                logger.info("Cleared %s past booked session(s)", removed)
+        return removed
@@ -0,0 +1,128 @@
+"""Persistent browser profile with a size-bounded HTTP disk cache.
+
+Reusing a profile between runs means cookies, static assets and service
+worker caches survive, so repeat loads only fetch the dynamic inventory.
+In Lambda the profile lives in /tmp (which survives warm starts) and can
+be restored from a seed packaged with the function on cold starts.
+"""
+
+import logging
+import os
+import shutil
+import tarfile
+from typing import List, Optional
+from hockey_agent.config import (
+    BROWSER_PROFILE_DIR,
+    BROWSER_PROFILE_SEED,
+    BROWSER_CACHE_MAX_MB
+)
+
+logger = logging.getLogger(__name__)
+
+CACHE_SUBDIR = 'disk-cache'
+
+
+def _restore_seed(profile_dir: str):
+    """Populate an empty profile directory from BROWSER_PROFILE_SEED (a directory or .tar.gz)."""
+    if not BROWSER_PROFILE_SEED or not os.path.exists(BROWSER_PROFILE_SEED):
+        return
+
+    try:
+        if os.path.isdir(BROWSER_PROFILE_SEED):
+            shutil.copytree(BROWSER_PROFILE_SEED, profile_dir, dirs_exist_ok=True)
+        else:
+            with tarfile.open(BROWSER_PROFILE_SEED, 'r:*') as tar:
+                try:
+                    tar.extractall(profile_dir, filter='data')
+                except TypeError:
+                    # Python < 3.11.4 has no extraction filters (the seed is our own package)
+                    tar.extractall(profile_dir)
+        logger.info("Restored browser profile from seed %s", BROWSER_PROFILE_SEED)
+    except (IOError, OSError, tarfile.TarError) as e:
+        logger.warning("Could not restore browser profile seed: %s", e)
+
+
+def prepare_profile_dir() -> Optional[str]:
+    """
+    Get the persistent profile directory, creating or restoring it if needed.
+
+    Returns:
+        Path to the profile directory, or None if persistent profiles are disabled
+    """
+    if not BROWSER_PROFILE_DIR:
+        return None
+
+    if not os.path.isdir(BROWSER_PROFILE_DIR) or not os.listdir(BROWSER_PROFILE_DIR):
+        os.makedirs(BROWSER_PROFILE_DIR, exist_ok=True)
+        _restore_seed(BROWSER_PROFILE_DIR)
+
+    return BROWSER_PROFILE_DIR
+
+
+def profile_launch_args(profile_dir: str) -> List[str]:
+    """
+    Get Chromium arguments that put the HTTP cache inside the profile and cap its size.
+
+    Args:
+        profile_dir: Path to the profile directory
+
+    Returns:
+        List of command-line arguments
+    """
+    cache_bytes = BROWSER_CACHE_MAX_MB * 1024 * 1024
+    return [
+        f"--disk-cache-dir={os.path.join(profile_dir, CACHE_SUBDIR)}",
+        f"--disk-cache-size={cache_bytes}",
+    ]
+
+
+def _dir_files(path: str) -> List[tuple]:
+    """List (mtime, size, path) for every file under a directory."""
+    files = []
+    for root, _, names in os.walk(path):
+        for file_name in names:
+            file_path = os.path.join(root, file_name)
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, file_path))
+    return files
+
+
+def enforce_cache_cap(profile_dir: str):
+    """
+    Evict the oldest cache files once the profile grows past BROWSER_CACHE_MAX_MB.
+
+    Chromium's --disk-cache-size only bounds the HTTP cache; service worker
+    caches and code caches elsewhere in the profile are not covered, so the
+    whole directory is measured here.
+
+    Args:
+        profile_dir: Path to the profile directory
+    """
+    cap = BROWSER_CACHE_MAX_MB * 1024 * 1024
+    files = _dir_files(profile_dir)
+    total = sum(size for _, size, _ in files)
+    if total <= cap:
+        logger.debug("Browser profile is %.1f MB (cap %s MB)", total / 1024 / 1024, BROWSER_CACHE_MAX_MB)
+        return
+
+    # Only evict from cache directories so cookies and settings survive
+    evictable = sorted(f for f in files if 'cache' in os.path.relpath(f[2], profile_dir).lower())
+    freed = 0
+    for _, size, file_path in evictable:
+        if total - freed <= cap:
+            break
+        try:
+            os.remove(file_path)
+            freed += size
+        except OSError:
+            continue
+
+    logger.info(
+        "Browser profile was %.1f MB, evicted %.1f MB of cache (cap %s MB)",
+        total / 1024 / 1024, freed / 1024 / 1024, BROWSER_CACHE_MAX_MB
+    )
+    if total - freed > cap:
+        logger.warning("Browser profile still over cap after evicting cache files")
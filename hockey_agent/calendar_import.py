@@ -0,0 +1,161 @@
+"""Read bookings from calendar (ICS) and spreadsheet (CSV) exports.
+
+Each booking becomes a short booked-list entry like "Sat 8 Nov 10-11am"
+(dates.format_label), which booked.is_booked() matches against the
+date/time strings the rinks publish.
+
+ICS: every VEVENT's DTSTART/DTEND. UTC times ("...Z") are converted to
+local time; times with a TZID are taken as local wall-clock times.
+
+CSV: a column named date_time, "Date/time", when or start (or separate
+date and time columns). Files without a recognised header use the first
+column of each row.
+"""
+
+import csv
+import io
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from hockey_agent.dates import format_label, short_label
+
+logger = logging.getLogger(__name__)
+
+_CSV_DATE_TIME_COLUMNS = ('date_time', 'date/time', 'date and time', 'when', 'start', 'session')
+
+
+def _unfold(text: str) -> List[str]:
+    """Join RFC 5545 folded lines (continuations start with a space or tab)."""
+    lines: List[str] = []
+    for line in text.splitlines():
+        if line[:1] in (' ', '\t') and lines:
+            lines[-1] += line[1:]
+        elif line:
+            lines.append(line)
+    return lines
+
+
+def _parse_ics_time(value: str, params: str) -> Optional[datetime]:
+    """Parse a DTSTART/DTEND value (date-time or all-day date) to a naive local datetime."""
+    try:
+        if 'VALUE=DATE' in params.upper() and 'VALUE=DATE-TIME' not in params.upper():
+            return datetime.strptime(value[:8], '%Y%m%d')
+        if value.endswith('Z'):
+            utc = datetime.strptime(value[:15], '%Y%m%dT%H%M%S').replace(tzinfo=timezone.utc)
+            return utc.astimezone().replace(tzinfo=None)
+        if 'T' in value:
+            return datetime.strptime(value[:15], '%Y%m%dT%H%M%S')
+        return datetime.strptime(value[:8], '%Y%m%d')
+    except ValueError:
+        return None
+
+
+def parse_ics(text: str, summary_filter: str = '') -> List[str]:
+    """
+    Extract bookings from iCalendar text.
+
+    Args:
+        text: Contents of an .ics file
+        summary_filter: Only events whose SUMMARY contains this (case-insensitive)
+
+    Returns:
+        Booked-list entries, in file order
+    """
+    entries = []
+    event: Optional[Dict[str, str]] = None
+    for line in _unfold(text):
+        name, _, value = line.partition(':')
+        prop, _, params = name.partition(';')
+        prop = prop.upper()
+
+        if prop == 'BEGIN' and value.upper() == 'VEVENT':
+            event = {}
+        elif prop == 'END' and value.upper() == 'VEVENT' and event is not None:
+            entry = _ics_entry(event, summary_filter)
+            if entry:
+                entries.append(entry)
+            event = None
+        elif event is not None and prop in ('DTSTART', 'DTEND', 'SUMMARY'):
+            event[prop] = value.strip()
+            event[prop + ';'] = params
+    return entries
+
+
+def _ics_entry(event: Dict[str, str], summary_filter: str) -> Optional[str]:
+    """Booked-list entry for one VEVENT, or None if it is filtered out or has no start."""
+    if summary_filter and summary_filter.lower() not in event.get('SUMMARY', '').lower():
+        return None
+
+    start = _parse_ics_time(event.get('DTSTART', ''), event.get('DTSTART;', ''))
+    if start is None:
+        logger.warning("Skipping event without a usable DTSTART: %s", event.get('SUMMARY', '?'))
+        return None
+
+    # All-day events are just a date
+    if 'T' not in event.get('DTSTART', ''):
+        return format_label(start)
+
+    times = [(start.hour, start.minute)]
+    end = _parse_ics_time(event.get('DTEND', ''), event.get('DTEND;', ''))
+    if end is not None and end.date() == start.date():
+        times.append((end.hour, end.minute))
+    return format_label(start, times)
+
+
+def parse_csv(text: str, summary_filter: str = '') -> List[str]:
+    """
+    Extract bookings from CSV text.
+
+    Args:
+        text: Contents of a .csv file
+        summary_filter: Only rows containing this text in any column (case-insensitive)
+
+    Returns:
+        Booked-list entries, in file order
+    """
+    rows = list(csv.reader(io.StringIO(text)))
+    if not rows:
+        return []
+
+    header = [column.strip().lower() for column in rows[0]]
+    if any(name in header for name in _CSV_DATE_TIME_COLUMNS):
+        column = next(header.index(name) for name in _CSV_DATE_TIME_COLUMNS if name in header)
+        values = [row[column] for row in rows[1:] if len(row) > column and _row_matches(row, summary_filter)]
+    elif 'date' in header:
+        date_column = header.index('date')
+        time_column = header.index('time') if 'time' in header else None
+        values = [
+            f"{row[date_column]} {row[time_column] if time_column is not None and len(row) > time_column else ''}"
+            for row in rows[1:] if len(row) > date_column and _row_matches(row, summary_filter)
+        ]
+    else:
+        values = [row[0] for row in rows if row and _row_matches(row, summary_filter)]
+
+    return [short_label(value.strip()) for value in values if value.strip()]
+
+
+def _row_matches(row: List[str], summary_filter: str) -> bool:
+    return not summary_filter or any(summary_filter.lower() in cell.lower() for cell in row)
+
+
+def load_bookings(path: str, summary_filter: str = '') -> List[str]:
+    """
+    Read bookings from an .ics or .csv file (chosen by extension, else by content).
+
+    Args:
+        path: File to read
+        summary_filter: Only events/rows mentioning this text
+
+    Returns:
+        Booked-list entries, without duplicates, in file order
+
+    Raises:
+        OSError: If the file can't be read
+    """
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        text = f.read()
+
+    is_ics = os.path.splitext(path)[1].lower() in ('.ics', '.ical') or 'BEGIN:VCALENDAR' in text[:200].upper()
+    entries = parse_ics(text, summary_filter) if is_ics else parse_csv(text, summary_filter)
+    return list(dict.fromkeys(entries))
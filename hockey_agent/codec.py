@@ -0,0 +1,97 @@
+"""JSON encoding and decoding for hot paths.
+
+Uses orjson when it's installed (several times faster for both parsing
+product blobs and rewriting the stores) and falls back to the standard
+library otherwise. Both backends produce the same data; machine-written
+files are compact unless JSON_PRETTY is set for debugging.
+
+Decode errors are always json.JSONDecodeError (orjson's error subclasses
+it), so callers can keep catching that.
+"""
+
+import json
+from typing import Any
+from hockey_agent.config import JSON_PRETTY
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+JSONDecodeError = json.JSONDecodeError
+
+
+def _default(obj):
+    """Encode types JSON doesn't know (sets become sorted lists, anything else a string)."""
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    return str(obj)
+
+
+def loads(data) -> Any:
+    """
+    Parse JSON.
+
+    Args:
+        data: JSON text as str, bytes or a memoryview (e.g. of an mmap)
+
+    Returns:
+        The decoded value
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def dumps(obj: Any, pretty: bool = False) -> bytes:
+    """
+    Encode a value as UTF-8 JSON.
+
+    Args:
+        obj: Value to encode
+        pretty: Indent with two spaces (for files people read)
+
+    Returns:
+        JSON bytes
+    """
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2 if pretty else 0
+        return orjson.dumps(obj, default=_default, option=option)
+    if pretty:
+        return json.dumps(obj, default=_default, indent=2, ensure_ascii=False).encode()
+    return json.dumps(obj, default=_default, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def dumps_str(obj: Any) -> str:
+    """Encode a value as compact JSON text (e.g. for HTTP or Lambda response bodies)."""
+    return dumps(obj).decode()
+
+
+def load_file(path: str) -> Any:
+    """
+    Read and parse a JSON file.
+
+    Raises:
+        IOError: If the file can't be read
+        JSONDecodeError: If it isn't valid JSON
+    """
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def dump_file(path: str, obj: Any):
+    """
+    Write a value to a JSON file (compact unless JSON_PRETTY is set).
+
+    The file is replaced atomically, so readers never see a partial write.
+
+    Raises:
+        IOError: If the file can't be written
+    """
+    from hockey_agent.filestore import atomic_write
+
+    atomic_write(path, dumps(obj, pretty=JSON_PRETTY))
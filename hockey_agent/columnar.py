@@ -0,0 +1,345 @@
+"""Columnar, vectorised filtering and diffing of scraped sessions.
+
+A batch of session dictionaries is turned into NumPy columns (start time,
+weekday, month/day, type code, qty, sold-out flag) once, and the day/date
+filters, booked exclusion and the diff against the previous statuses are
+evaluated as boolean masks over the whole batch instead of string checks
+per variant. Parsing a date/time string is cached, since the same strings
+come back on every check.
+
+The booked mask and the weekday filter apply exactly the rules of
+booked.is_booked() and the scrapers' _matches_filter(). MONITOR_DATES are
+matched on the parsed month and day (and as a substring), so "Nov 4" and
+"4th November" match without dateutil; rows whose date can't be parsed
+go through the scraper's check. Without NumPy every function falls back
+to the per-dict checks.
+"""
+
+import logging
+from datetime import datetime
+from functools import cached_property, lru_cache
+from itertools import compress
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from hockey_agent.booked import is_booked, match_key
+from hockey_agent.config import MONITOR_DAYS, MONITOR_DATES
+from hockey_agent.dates import MONTHS, DAY_NAMES, parse_session_date, parse_session_times, parse_weekday
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+HAVE_NUMPY = np is not None
+
+# Previous-status codes
+UNSEEN, AVAILABLE, SOLD_OUT = 0, 1, 2
+_STATUS_CODES = {'AVAILABLE': AVAILABLE, 'SOLD OUT': SOLD_OUT}
+
+# Per-row change codes returned by classify_sessions(): the observed status
+# against the confirmed one (SOLD is first seen sold out or newly sold out)
+NO_CHANGE, NEW, REOPENED, SOLD = 0, 1, 2, 3
+
+
+@lru_cache(maxsize=8192)
+def _parse(date_time: str, today: int) -> Tuple[float, int, int]:
+    """
+    Parse the fields the columns need from a date/time string.
+
+    Args:
+        date_time: Session date/time string
+        today: Ordinal of the reference date (part of the cache key, for year inference)
+
+    Returns:
+        (start epoch seconds or NaN, weekday or -1, month * 32 + day or -1)
+    """
+    now = datetime.fromordinal(today)
+    date = parse_session_date(date_time, now)
+    if date is None:
+        return float('nan'), -1, -1
+
+    times = parse_session_times(date_time, now)
+    start = times[0].timestamp() if times else date.timestamp()
+    weekday = parse_weekday(date_time, now)
+    return start, -1 if weekday is None else weekday, date.month * 32 + date.day
+
+
+def _month_day(month: int, day: int) -> int:
+    return month * 32 + day
+
+
+@lru_cache(maxsize=8192)
+def _day_bits(date_time: str) -> int:
+    text = date_time.lower()
+    return sum(1 << day_num for day_num, day_name in enumerate(DAY_NAMES) if day_name in text)
+
+
+class SessionColumns:
+    """Column arrays for a batch of sessions (row i is sessions[i])."""
+
+    def __init__(self, sessions: List[Dict], now: Optional[datetime] = None):
+        """
+        Set up the columns; each is built the first time it is used.
+
+        Args:
+            sessions: Session dictionaries
+            now: Reference time for year inference (defaults to now)
+        """
+        self.sessions = sessions
+        self.today = (now or datetime.now()).toordinal()
+
+    @cached_property
+    def date_times(self) -> List[str]:
+        """Raw date/time strings."""
+        return [s.get('date_time', '') for s in self.sessions]
+
+    @cached_property
+    def _types(self) -> Tuple[List[str], 'np.ndarray']:
+        types: List[str] = []
+        type_codes: Dict[str, int] = {}
+        codes = []
+        for session in self.sessions:
+            session_type = session.get('session_type', '').lower()
+            if session_type not in type_codes:
+                type_codes[session_type] = len(types)
+                types.append(session_type)
+            codes.append(type_codes[session_type])
+        return types, np.array(codes, dtype=np.int16)
+
+    @property
+    def types(self) -> List[str]:
+        """Lower-cased session types; type_code indexes this list."""
+        return self._types[0]
+
+    @property
+    def type_code(self) -> 'np.ndarray':
+        """Session type as an index into types."""
+        return self._types[1]
+
+    @cached_property
+    def qty(self) -> 'np.ndarray':
+        """Spots left."""
+        return np.array([int(s.get('qty_in_stock') or 0) for s in self.sessions], dtype=np.int32)
+
+    @cached_property
+    def sold_out(self) -> 'np.ndarray':
+        """True for sold-out sessions."""
+        return np.array([s.get('status') == 'SOLD OUT' for s in self.sessions], dtype=bool)
+
+    @cached_property
+    def _dates(self) -> 'np.ndarray':
+        parsed = [_parse(date_time, self.today) for date_time in self.date_times]
+        return np.array(parsed, dtype=np.float64).reshape(len(parsed), 3)
+
+    @cached_property
+    def start(self) -> 'np.ndarray':
+        """Start time as epoch seconds (NaN if unknown)."""
+        return self._dates[:, 0]
+
+    @cached_property
+    def weekday(self) -> 'np.ndarray':
+        """Weekday, 0=Monday (-1 if unknown)."""
+        return self._dates[:, 1].astype(np.int8)
+
+    @cached_property
+    def month_day(self) -> 'np.ndarray':
+        """month * 32 + day (-1 if unknown)."""
+        return self._dates[:, 2].astype(np.int16)
+
+    @property
+    def parsed(self) -> 'np.ndarray':
+        """Rows whose date could be parsed."""
+        return self.month_day >= 0
+
+    @cached_property
+    def _booked_keys(self) -> Tuple['np.ndarray', Dict[Optional[str], int], 'np.ndarray', 'np.ndarray', 'np.ndarray']:
+        normalized = [date_time.lower().strip() for date_time in self.date_times]
+        keys = [_match_key(text) for text in normalized]
+        vocab: Dict[Optional[str], int] = {None: 0}
+        number = np.array([vocab.setdefault(k[0], len(vocab)) for k in keys], dtype=np.int32)
+        month = np.array([_MONTH_CODES.get(k[1], 0) for k in keys], dtype=np.int8)
+        weekday = np.array([_DAY_CODES.get(k[2], 0) for k in keys], dtype=np.int8)
+        return np.array(normalized, dtype=str), vocab, number, month, weekday
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def type_mask(self, session_types: Iterable[str]) -> 'np.ndarray':
+        """Rows whose type contains any of session_types (all rows if none given)."""
+        session_types = list(session_types)
+        if not session_types:
+            return np.ones(len(self), dtype=bool)
+        matching = [code for code, name in enumerate(self.types) if any(t in name for t in session_types)]
+        return np.isin(self.type_code, matching)
+
+    @cached_property
+    def day_bits(self) -> 'np.ndarray':
+        """Bit i set if the date/time string names weekday i in full (as the scrapers' filter reads it)."""
+        return np.fromiter(map(_day_bits, self.date_times), dtype=np.uint8, count=len(self))
+
+    def filter_mask(self, days: Iterable[int] = MONITOR_DAYS, dates: Iterable[str] = MONITOR_DATES,
+                    fallback: Optional[Callable[[str], bool]] = None) -> 'np.ndarray':
+        """
+        Rows that fall on a monitored weekday or date (all rows if neither is set).
+
+        Args:
+            days: Weekday numbers (0=Monday), matched on the day named in the string
+            dates: Dates as YYYY-MM-DD, matched as a substring or on the parsed month and day
+            fallback: Per-string check for rows whose date couldn't be parsed
+
+        Returns:
+            Boolean mask
+        """
+        days, dates = list(days), list(dates)
+        if not days and not dates:
+            return np.ones(len(self), dtype=bool)
+
+        mask = np.zeros(len(self), dtype=bool)
+        if days:
+            mask |= (self.day_bits & sum(1 << day for day in set(days))) != 0
+        if dates:
+            targets = []
+            raw = np.array(self.date_times, dtype=str)
+            for target in dates:
+                mask |= np.char.find(raw, target) >= 0
+                try:
+                    parsed = datetime.strptime(target, '%Y-%m-%d')
+                except ValueError:
+                    continue
+                targets.append(_month_day(parsed.month, parsed.day))
+            mask |= np.isin(self.month_day, targets)
+
+            if fallback is not None:
+                for i in np.flatnonzero(~self.parsed & ~mask):
+                    mask[i] = fallback(self.date_times[i])
+        return mask
+
+    def booked_mask(self, booked: Iterable[str]) -> 'np.ndarray':
+        """
+        Rows matching a booked session, by the same rules as booked.is_booked().
+
+        Each booked entry is one comparison over the whole batch: a substring
+        test either way on the normalised strings, or the same first number,
+        month and (if both name one) weekday.
+
+        Args:
+            booked: Booked date/time strings
+
+        Returns:
+            Boolean mask
+        """
+        mask = np.zeros(len(self), dtype=bool)
+        if not len(self):
+            return mask
+
+        normalized, vocab, number, month, weekday = self._booked_keys
+
+        for entry in booked:
+            entry = entry.lower().strip()
+            mask |= np.char.find(normalized, entry) >= 0
+            mask |= np.char.find(entry, normalized) >= 0
+
+            booked_number, booked_month, booked_day = _match_key(entry)
+            if booked_number is None or booked_number not in vocab:
+                continue
+            same = (number == vocab[booked_number]) & (month == _MONTH_CODES.get(booked_month, 0))
+            if booked_day is not None:
+                same &= (weekday == 0) | (weekday == _DAY_CODES[booked_day])
+            mask |= same
+        return mask
+
+    def status_codes(self, session_ids: List[str], previous: Dict[str, str]) -> 'np.ndarray':
+        """Previous status of each row as UNSEEN/AVAILABLE/SOLD_OUT codes."""
+        return np.array([_STATUS_CODES.get(previous.get(sid), UNSEEN) for sid in session_ids], dtype=np.int8)
+
+
+# booked.match_key() is pure and sees the same strings every check
+_match_key = lru_cache(maxsize=8192)(match_key)
+
+# Codes for booked.match_key() components (0 = absent)
+_MONTH_CODES = {name: code for code, name in enumerate(MONTHS, start=1)}
+_DAY_CODES = {name[:3]: code for code, name in enumerate(DAY_NAMES, start=1)}
+
+
+def session_id(session: Dict) -> str:
+    """Unique identifier for a session in the seen store."""
+    return f"{session['site']}:{session['session_type']}:{session['date_time']}"
+
+
+def filter_sessions(sessions: List[Dict], fallback: Callable[[str], bool]) -> List[Dict]:
+    """
+    Keep sessions on a monitored weekday/date (MONITOR_DAYS / MONITOR_DATES).
+
+    Args:
+        sessions: Session dictionaries
+        fallback: Per-string check (the scraper's _matches_filter), used
+            without NumPy and for rows whose date can't be parsed
+
+    Returns:
+        Matching sessions, in order
+    """
+    if not MONITOR_DAYS and not MONITOR_DATES:
+        return sessions
+    # A weekday-only filter is a few substring tests per row, already cheaper than building columns
+    if not HAVE_NUMPY or not MONITOR_DATES or not sessions:
+        return [s for s in sessions if fallback(s.get('date_time', ''))]
+
+    mask = SessionColumns(sessions).filter_mask(MONITOR_DAYS, MONITOR_DATES, fallback)
+    return list(compress(sessions, mask.tolist()))
+
+
+class Classified(NamedTuple):
+    """Per-row results of classify_sessions()."""
+    session_ids: List[str]
+    booked: List[bool]
+    notifiable: List[bool]  # not skipped as booked; these rows are stored
+    change: List[int]  # NO_CHANGE, NEW, REOPENED or SOLD
+
+
+def classify_sessions(sessions: List[Dict], booked: Set[str], previous: Dict[str, str],
+                      skip_booked: bool) -> Classified:
+    """
+    Work out which sessions are booked, new, reopened or sold out in one pass.
+
+    Args:
+        sessions: Scraped session dictionaries
+        booked: Booked date/time strings
+        previous: Last stored status per session ID
+        skip_booked: Leave booked sessions out of the diff (no subscribers)
+
+    Returns:
+        Classified lists, one entry per session
+    """
+    ids = [session_id(s) for s in sessions]
+
+    if not HAVE_NUMPY or not sessions:
+        booked_flags = [is_booked(s['date_time'], booked) for s in sessions]
+        notifiable = [not (b and skip_booked) for b in booked_flags]
+        change = []
+        for sid, session, ok in zip(ids, sessions, notifiable):
+            prev = previous.get(sid)
+            if not ok:
+                change.append(NO_CHANGE)
+            elif session['status'] == 'SOLD OUT':
+                change.append(NO_CHANGE if prev == 'SOLD OUT' else SOLD)
+            elif prev is None:
+                change.append(NEW)
+            elif prev == 'SOLD OUT':
+                change.append(REOPENED)
+            else:
+                change.append(NO_CHANGE)
+        return Classified(ids, booked_flags, notifiable, change)
+
+    columns = SessionColumns(sessions)
+    booked_mask = columns.booked_mask(booked)
+    notifiable = ~booked_mask if skip_booked else np.ones(len(columns), dtype=bool)
+    available = ~columns.sold_out
+    prev = columns.status_codes(ids, previous)
+
+    change = np.zeros(len(columns), dtype=np.int8)
+    change[notifiable & available & (prev == UNSEEN)] = NEW
+    change[notifiable & available & (prev == SOLD_OUT)] = REOPENED
+    change[notifiable & columns.sold_out & (prev != SOLD_OUT)] = SOLD
+
+    return Classified(ids, booked_mask.tolist(), notifiable.tolist(), change.tolist())
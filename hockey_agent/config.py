@@ -33,11 +33,67 @@ MONITOR_SESSION_TYPES = [s.strip().lower() for s in os.getenv('MONITOR_SESSION_T
 HEADLESS_BROWSER = os.getenv('HEADLESS_BROWSER', 'true').lower() == 'true'
 BROWSER_WAIT_TIME = int(os.getenv('BROWSER_WAIT_TIME', '10'))  # seconds
 
+# Low-memory Chromium launch profile (single renderer, no images, small viewport)
+BROWSER_LOW_MEMORY = os.getenv('BROWSER_LOW_MEMORY', 'false').lower() == 'true'
+LOW_MEMORY_CHROMIUM_ARGS = [
+    '--renderer-process-limit=1',
+    '--disable-site-isolation-trials',
+    '--disable-features=site-per-process,IsolateOrigins,Translate,BackForwardCache,MediaRouter,OptimizationHints,AudioServiceOutOfProcess',
+    '--disable-extensions',
+    '--disable-background-networking',
+    '--disable-background-timer-throttling',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--disable-dev-shm-usage',
+    '--disable-gpu',
+    '--mute-audio',
+    '--no-first-run',
+    '--blink-settings=imagesEnabled=false',
+    '--js-flags=--max-old-space-size=128',
+]
+LOW_MEMORY_VIEWPORT = {'width': 800, 'height': 600}
+
+# Persistent browser profile so cookies and static assets are cached between runs
+# (empty = fresh profile every run; in Lambda use a path under /tmp)
+BROWSER_PROFILE_DIR = os.getenv('BROWSER_PROFILE_DIR', '')
+BROWSER_PROFILE_SEED = os.getenv('BROWSER_PROFILE_SEED', '')  # directory or .tar.gz restored into an empty profile
+BROWSER_CACHE_MAX_MB = int(os.getenv('BROWSER_CACHE_MAX_MB', '100'))
+
+# Record a Playwright trace + HAR per scrape, kept only for slow or failed runs
+SCRAPE_TRACE_DIR = os.getenv('SCRAPE_TRACE_DIR', '')  # empty = disabled (in Lambda use a path under /tmp)
+SCRAPE_TRACE_KEEP = int(os.getenv('SCRAPE_TRACE_KEEP', '10'))  # newest kept runs retained
+SCRAPE_SLOW_SECONDS = float(os.getenv('SCRAPE_SLOW_SECONDS', '20'))
+
+# Read IceHQ product JSON from network responses instead of the rendered DOM
+ICEHQ_CAPTURE_NETWORK_JSON = os.getenv('ICEHQ_CAPTURE_NETWORK_JSON', 'false').lower() == 'true'
+ICEHQ_PRODUCT_URL_PATTERN = os.getenv('ICEHQ_PRODUCT_URL_PATTERN', r'product|inventory|variant')  # regex on response URL
+ICEHQ_CAPTURE_SETTLE_MS = int(os.getenv('ICEHQ_CAPTURE_SETTLE_MS', '500'))  # stop once no new payloads for this long
+
 # Notification settings
-NOTIFICATION_METHOD = os.getenv('NOTIFICATION_METHOD', 'console')  # console, email, telegram, sms
+NOTIFICATION_METHOD = os.getenv('NOTIFICATION_METHOD', 'console')  # console, email, telegram, sms (comma-separate to use several)
+NOTIFICATION_METHODS = [m.strip().lower() for m in NOTIFICATION_METHOD.split(',') if m.strip()]
 NOTIFICATION_EMAIL = os.getenv('NOTIFICATION_EMAIL', '')
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID', '')
+TELEGRAM_API_BASE_URL = os.getenv('TELEGRAM_API_BASE_URL', 'https://api.telegram.org')  # Override for a local fake server
+
+# Email: through an SMTP server, or SendGrid's HTTP API
+EMAIL_PROVIDER = os.getenv('EMAIL_PROVIDER', 'smtp').lower()  # smtp, sendgrid
+EMAIL_FROM = os.getenv('EMAIL_FROM', '')  # defaults to SMTP_USERNAME, then NOTIFICATION_EMAIL
+SMTP_HOST = os.getenv('SMTP_HOST', '')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
+SMTP_USERNAME = os.getenv('SMTP_USERNAME', '')
+SMTP_PASSWORD = os.getenv('SMTP_PASSWORD', '')
+SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', 'true').lower() == 'true'
+SMTP_SSL = os.getenv('SMTP_SSL', 'false').lower() == 'true'  # implicit TLS (port 465)
+SENDGRID_API_KEY = os.getenv('SENDGRID_API_KEY', '')
+SENDGRID_API_BASE_URL = os.getenv('SENDGRID_API_BASE_URL', 'https://api.sendgrid.com')  # Override for a local fake server
+
+# Keep-alive connection pools shared by the notifiers (Twilio, Telegram, SendGrid, SMTP)
+POOL_MAX_IDLE = int(os.getenv('POOL_MAX_IDLE', '4'))  # idle connections kept per provider
+POOL_IDLE_SECONDS = float(os.getenv('POOL_IDLE_SECONDS', '50'))  # reconnect after idling this long
+POOL_TIMEOUT_SECONDS = float(os.getenv('POOL_TIMEOUT_SECONDS', '30'))
 
 # Twilio SMS settings
 TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID', '')
@@ -46,7 +102,97 @@ TWILIO_API_KEY = os.getenv('TWILIO_API_KEY', '')  # API Key SID (recommended)
 TWILIO_API_SECRET = os.getenv('TWILIO_API_SECRET', '')  # API Key Secret (recommended)
 TWILIO_FROM_PHONE = os.getenv('TWILIO_FROM_PHONE', '')  # Your Twilio phone number (e.g., +1234567890)
 TWILIO_TO_PHONE = os.getenv('TWILIO_TO_PHONE', '')  # Your personal phone number
+TWILIO_API_BASE_URL = os.getenv('TWILIO_API_BASE_URL', 'https://api.twilio.com')  # Override for a local fake server
+SMS_MAX_SEGMENTS = int(os.getenv('SMS_MAX_SEGMENTS', '3'))  # split into more messages beyond this
+SMS_EMOJI = os.getenv('SMS_EMOJI', 'false').lower() == 'true'  # emoji force UCS-2 (70 chars per segment)
+
+# Fan-out dispatch to many subscribers
+DISPATCH_CONCURRENCY = int(os.getenv('DISPATCH_CONCURRENCY', '8'))  # worker threads
+DISPATCH_RATE_PER_SECOND = float(os.getenv('DISPATCH_RATE_PER_SECOND', '1'))  # provider limit (long code = 1/s, 0 = unlimited)
+DISPATCH_BURST = float(os.getenv('DISPATCH_BURST', '0'))  # token bucket size (0 = same as rate)
+DISPATCH_DEDUP_SECONDS = float(os.getenv('DISPATCH_DEDUP_SECONDS', '3600'))  # suppress identical repeats
+
+# Flap suppression: a status change must persist this long before it counts, and a
+# session that reopens again within the cooldown of its last notification isn't re-notified
+FLAP_DWELL_SECONDS = float(os.getenv('FLAP_DWELL_SECONDS', '0'))  # 0 = confirm changes on the first check
+FLAP_COOLDOWN_SECONDS = float(os.getenv('FLAP_COOLDOWN_SECONDS', '1800'))  # 0 = notify every reopening
+
+# Hard deadlines per check phase (seconds); an overrunning browser is killed and
+# the check returns partial, "degraded" results. Keep the sum under the Lambda timeout.
+WATCHDOG_ENABLED = os.getenv('WATCHDOG_ENABLED', 'true').lower() == 'true'
+WATCHDOG_BUDGETS = {
+    phase.strip(): float(seconds)
+    for phase, seconds in (
+        item.split('=', 1)
+        for item in os.getenv('WATCHDOG_BUDGETS', 'launch=20,load=50,extract=15,store=10,notify=20').split(',')
+        if '=' in item
+    )
+}
+
+# Fan-out: split sites across this many parallel worker invocations (0 or 1 = scrape in one invocation).
+# Workers are invoked through the Lambda API using FANOUT_FUNCTION_NAME (defaults to this
+# function in Lambda); with no function name they run in-process.
+FANOUT_SHARDS = int(os.getenv('FANOUT_SHARDS', '0'))
+FANOUT_FUNCTION_NAME = os.getenv('FANOUT_FUNCTION_NAME', os.getenv('AWS_LAMBDA_FUNCTION_NAME', ''))
+
+# Multiple subscribers with their own filters (see hockey_agent/subscriptions.py)
+# When set, MONITOR_* act as a global pre-filter and should cover every subscriber
+SUBSCRIPTIONS_FILE = os.getenv('SUBSCRIPTIONS_FILE', '')
+
+# Lease against overlapping checks (a slow scheduled run, the daemon and test_scraper.py):
+# file or sqlite (one machine), dynamodb (shared, e.g. between Lambda invocations),
+# module:Class for your own backend, or none
+LEASE_BACKEND = os.getenv('LEASE_BACKEND', 'file')
+LEASE_FILE = os.getenv('LEASE_FILE', 'check_lease.json')  # file backend
+LEASE_DB_FILE = os.getenv('LEASE_DB_FILE', 'leases.sqlite3')  # sqlite backend
+LEASE_TABLE = os.getenv('LEASE_TABLE', 'hockey-agent-leases')  # dynamodb backend (partition key "name")
+LEASE_TTL_SECONDS = float(os.getenv('LEASE_TTL_SECONDS', '900'))  # a crashed holder's lease expires after this
+LEASE_WAIT_SECONDS = float(os.getenv('LEASE_WAIT_SECONDS', '0'))  # 0 = skip at once if another check is running
+LEASE_POLL_SECONDS = float(os.getenv('LEASE_POLL_SECONDS', '2'))
+LEASE_FRESH_SECONDS = float(os.getenv('LEASE_FRESH_SECONDS', '0'))  # reuse a snapshot this recent instead of scraping
+
+# Scraper backend: playwright (default) or selenium
+SCRAPER_BACKEND = os.getenv('SCRAPER_BACKEND', 'playwright').lower()
+
+# Selenium: chromedriver to use (empty = resolve once with webdriver-manager and cache the path)
+CHROMEDRIVER_PATH = os.getenv('CHROMEDRIVER_PATH', '')
+CHROMEDRIVER_CACHE_FILE = os.getenv('CHROMEDRIVER_CACHE_FILE', os.path.expanduser('~/.cache/hockey-agent/chromedriver-path'))
+
+# Daemon mode (main.py): local control API and warm browser
+CONTROL_HOST = os.getenv('CONTROL_HOST', '127.0.0.1')
+CONTROL_PORT = int(os.getenv('CONTROL_PORT', '8765'))  # 0 = no control API
+WARM_BROWSER = os.getenv('WARM_BROWSER', 'true').lower() == 'true'  # keep the browser open between checks
+WARM_BROWSER_MAX_SCRAPES = int(os.getenv('WARM_BROWSER_MAX_SCRAPES', '50'))  # relaunch after this many (0 = never)
 
 # Storage
 STORAGE_FILE = os.getenv('STORAGE_FILE', 'seen_sessions.json')
 BOOKED_SESSIONS_FILE = os.getenv('BOOKED_SESSIONS_FILE', 'booked_sessions.json')
+
+# Retention: drop sessions from the seen, booked and history stores once they
+# ended more than this many hours ago (negative = keep forever)
+SESSION_RETENTION_GRACE_HOURS = float(os.getenv('SESSION_RETENTION_GRACE_HOURS', '24'))
+
+# Inventory history (fixed-size ring buffer of samples per session)
+HISTORY_FILE = os.getenv('HISTORY_FILE', 'session_history.bin')
+HISTORY_SAMPLES = int(os.getenv('HISTORY_SAMPLES', '96'))  # samples kept per session
+HISTORY_HEARTBEAT_MINUTES = int(os.getenv('HISTORY_HEARTBEAT_MINUTES', '60'))  # record unchanged inventory this often
+
+# A check classifies sessions in batches of at least this many rows, joining a site's
+# product blocks, so the columnar diff's fixed cost isn't paid per block (1 = per block)
+DIFF_BATCH_ROWS = int(os.getenv('DIFF_BATCH_ROWS', '500'))
+
+# Snapshot of the last scrape, queried without launching a browser
+SNAPSHOT_FILE = os.getenv('SNAPSHOT_FILE', 'last_snapshot.json')
+
+# Write machine-maintained JSON files indented (for debugging; compact otherwise)
+JSON_PRETTY = os.getenv('JSON_PRETTY', 'false').lower() == 'true'
+
+# Logging (written by a background thread; see hockey_agent/logs.py)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # text or json (one object per line)
+
+# Profiling (diagnose slow checks without redeploying)
+PROFILE_EVERY_N_RUNS = int(os.getenv('PROFILE_EVERY_N_RUNS', '0'))  # 0 = disabled
+PROFILE_PHASE = os.getenv('PROFILE_PHASE', 'check_all_sites')  # check_all_sites, scrape, notify
+PROFILE_OUTPUT_DIR = os.getenv('PROFILE_OUTPUT_DIR', '')  # empty = write to the log (e.g. in Lambda)
+PROFILE_TOP_N = int(os.getenv('PROFILE_TOP_N', '25'))
@@ -0,0 +1,212 @@
+"""Long-running agent: scheduled checks, a warm browser and a local control API.
+
+Checks run one at a time on a single worker thread, which also owns the
+warm browser (Playwright's sync API is bound to one thread). The asyncio
+loop only schedules checks and answers the control API, so it stays
+responsive while a check is running.
+
+Control API (JSON over HTTP, bound to CONTROL_HOST:CONTROL_PORT):
+
+    POST /check            run a check now (joins one already in progress);
+                           add ?wait=0 to return without waiting
+    GET  /status           daemon state and the last check's summary
+    GET  /snapshot         every upcoming session from the last check
+    GET  /upcoming         ?n=5&type=stick&all=1 (see snapshot.query_snapshot)
+    GET  /search           ?q=saturday
+    GET  /metrics          counters, gauges and timings
+"""
+
+import asyncio
+import logging
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+from hockey_agent import codec, metrics
+from hockey_agent.config import CHECK_INTERVAL_MINUTES, CONTROL_HOST, CONTROL_PORT, WARM_BROWSER
+from hockey_agent.scraper import check_all_sites, enable_warm_browser, stop_warm_browser
+from hockey_agent.snapshot import query_snapshot
+
+logger = logging.getLogger(__name__)
+
+_REASONS = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+class Daemon:
+    """Runs checks on a schedule and on demand."""
+
+    def __init__(self, interval_minutes: float = CHECK_INTERVAL_MINUTES, warm_browser: bool = WARM_BROWSER):
+        self.interval = interval_minutes * 60
+        self.warm_browser = warm_browser
+        self.started_at = time.time()
+        self.checks_run = 0
+        self.last_check: Optional[Dict] = None
+        self.next_check_at: Optional[float] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='check')
+        self._current: Optional[asyncio.Future] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._warm = None
+
+    def _run_check(self, trigger: str) -> Dict:
+        """Run one check on the worker thread."""
+        if self.warm_browser and self._warm is None:
+            self._warm = enable_warm_browser()
+
+        started = time.time()
+        try:
+            summary = check_all_sites()
+        except Exception as e:
+            logger.error("Check failed: %s", e, exc_info=True)
+            summary = {'error': str(e)}
+
+        summary['trigger'] = trigger
+        summary['started_at'] = datetime.fromtimestamp(started).isoformat()
+        summary['duration_seconds'] = round(time.time() - started, 2)
+        metrics.observe(f'daemon.check.{trigger}', summary['duration_seconds'])
+        return summary
+
+    def check(self, trigger: str) -> asyncio.Future:
+        """
+        Start a check, or join the one already running.
+
+        Args:
+            trigger: Why the check is running ('startup', 'scheduled', 'on_demand')
+
+        Returns:
+            Future resolving to the check's summary
+        """
+        if self._current is not None and not self._current.done():
+            return self._current
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, self._run_check, trigger)
+        future.add_done_callback(self._check_done)
+        self._current = future
+        return future
+
+    def _check_done(self, future: asyncio.Future):
+        if future.cancelled() or future.exception():
+            return
+        self.last_check = future.result()
+        self.checks_run += 1
+        logger.info("%s check took %ss", self.last_check['trigger'].capitalize(), self.last_check['duration_seconds'])
+
+    def status(self) -> Dict:
+        """Describe the daemon and its last check."""
+        warm = self._warm
+        return {
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+            'checking': self._current is not None and not self._current.done(),
+            'checks_run': self.checks_run,
+            'next_check_in_seconds': round(self.next_check_at - time.time(), 1) if self.next_check_at else None,
+            'last_check': self.last_check,
+            'warm_browser': {
+                'enabled': self.warm_browser,
+                'alive': bool(warm and warm.alive),
+                'launches': warm.launches if warm else 0,
+                'scrapes_since_launch': warm.scrapes if warm else 0,
+            },
+        }
+
+    async def _schedule(self):
+        """Run a check at startup and then every interval until stopped."""
+        while not self._stop.is_set():
+            self.next_check_at = None
+            await asyncio.shield(self.check('startup' if self.checks_run == 0 else 'scheduled'))
+
+            self.next_check_at = time.time() + self.interval
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _route(self, method: str, target: str):
+        """Handle one control API request, returning (status, JSON-serialisable body)."""
+        parts = urlsplit(target)
+        params = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        path = parts.path.rstrip('/') or '/'
+
+        if path == '/check':
+            if method != 'POST':
+                return 405, {'error': 'use POST'}
+            future = self.check('on_demand')
+            if params.get('wait', '1') == '0':
+                return 202, {'checking': True}
+            return 200, await asyncio.shield(future)
+
+        if method != 'GET':
+            return 405, {'error': 'use GET'}
+        if path == '/status':
+            return 200, self.status()
+        if path == '/metrics':
+            return 200, metrics.snapshot()
+        if path == '/snapshot':
+            path, params = '/upcoming', {'n': '1000000', 'all': '1'}
+        if path in ('/upcoming', '/search'):
+            try:
+                response = query_snapshot(path, params)
+            except ValueError as e:
+                return 400, {'error': str(e)}
+            return (404 if 'error' in response else 200), response
+
+        return 404, {'error': f"unknown path {path}"}
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve one HTTP/1.0-style request per connection."""
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            # Skip headers; the API takes no request body
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+
+            if len(request_line) < 2:
+                status, body = 400, {'error': 'bad request'}
+            else:
+                status, body = await self._route(request_line[0].upper(), request_line[1])
+
+            payload = codec.dumps(body)
+            writer.write(
+                f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: close\r\n\r\n".encode() + payload
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.error("Control API error: %s", e, exc_info=True)
+        finally:
+            writer.close()
+
+    async def run(self):
+        """Run until SIGINT/SIGTERM."""
+        self._stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self._stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        server = None
+        if CONTROL_PORT:
+            server = await asyncio.start_server(self._handle, CONTROL_HOST, CONTROL_PORT)
+            logger.info("Control API listening on http://%s:%s "
+                        "(POST /check, GET /status, /snapshot, /upcoming, /search, /metrics)", CONTROL_HOST, CONTROL_PORT)
+
+        logger.info("Checking every %s minutes. Press Ctrl+C to exit.", CHECK_INTERVAL_MINUTES)
+        scheduler = asyncio.create_task(self._schedule())
+        await self._stop.wait()
+
+        logger.info("Shutting down Hockey Agent...")
+        if server:
+            server.close()
+            await server.wait_closed()
+        scheduler.cancel()
+        if self._current is not None:
+            await asyncio.gather(self._current, return_exceptions=True)
+
+        # The warm browser belongs to the worker thread, so close it there
+        await loop.run_in_executor(self._executor, stop_warm_browser)
+        self._executor.shutdown()
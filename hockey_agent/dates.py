@@ -0,0 +1,268 @@
+"""Parsing of session date/time strings from rink websites."""
+
+import re
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+MONTHS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+}
+
+DAY_NAMES = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+_MONTH_PATTERN = r'(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?'
+_DAY_PATTERN = r'(\d{1,2})(?:st|nd|rd|th)?'
+
+# "4th November", "4 Nov"
+_DAY_MONTH_RE = re.compile(r'\b' + _DAY_PATTERN + r'\s+(?:of\s+)?' + _MONTH_PATTERN + r'(?:\s+(\d{4}))?')
+# "November 4", "Nov 4th, 2025"
+_MONTH_DAY_RE = re.compile(r'\b' + _MONTH_PATTERN + r'\s+' + _DAY_PATTERN + r'\b(?:,?\s+(\d{4}))?')
+# "2025-11-04"
+_ISO_DATE_RE = re.compile(r'\b(\d{4})-(\d{2})-(\d{2})\b')
+# "11:45am", "8pm", "20:00"
+_TIME_RE = re.compile(r'\b(\d{1,2})(?::(\d{2}))?\s*(am|pm)?\b(?!\s*(?:st|nd|rd|th))')
+
+# Sessions without an explicit end time are assumed to run this long
+DEFAULT_SESSION_LENGTH = timedelta(hours=1)
+
+
+def _infer_year(month: int, day: int, now: datetime) -> Optional[datetime]:
+    """Pick the year that puts a month/day closest to now (sites omit the year)."""
+    candidates = []
+    for year in (now.year - 1, now.year, now.year + 1):
+        try:
+            candidates.append(datetime(year, month, day))
+        except ValueError:
+            continue
+    if not candidates:
+        return None
+    return min(candidates, key=lambda d: abs(d - now))
+
+
+def parse_session_date(date_time: str, now: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Parse the calendar date out of a session date/time string.
+
+    Args:
+        date_time: Date string from the website (e.g., "Tuesday 4th November 11:45am-12:45pm")
+        now: Reference time used to infer a missing year (defaults to now)
+
+    Returns:
+        Midnight of the session date, or None if no date could be found
+    """
+    now = now or datetime.now()
+    text = date_time.lower()
+
+    match = _ISO_DATE_RE.search(text)
+    if match:
+        try:
+            return datetime(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        except ValueError:
+            return None
+
+    match = _DAY_MONTH_RE.search(text)
+    if match:
+        day, month, year = int(match.group(1)), MONTHS[match.group(2)], match.group(3)
+    else:
+        match = _MONTH_DAY_RE.search(text)
+        if not match:
+            return None
+        month, day, year = MONTHS[match.group(1)], int(match.group(2)), match.group(3)
+
+    if year:
+        try:
+            return datetime(int(year), month, day)
+        except ValueError:
+            return None
+    return _infer_year(month, day, now)
+
+
+def _to_24h(hour: int, meridiem: str) -> int:
+    """Convert a 12-hour clock hour to 24-hour (no-op without am/pm)."""
+    if meridiem == 'pm' and hour < 12:
+        return hour + 12
+    if meridiem == 'am' and hour == 12:
+        return 0
+    return hour
+
+
+def _parse_times(text: str) -> list:
+    """Return (hour, minute) tuples for each clock time in the string, in order."""
+    # Strip dates first so day-of-month and year digits aren't mistaken for times
+    text = _ISO_DATE_RE.sub(' ', text)
+    text = _DAY_MONTH_RE.sub(' ', text)
+    text = _MONTH_DAY_RE.sub(' ', text)
+
+    times = []
+    raw = _TIME_RE.findall(text)
+    for idx, (hour, minute, meridiem) in enumerate(raw):
+        # Only accept bare numbers if they look like "20:00" or start a range ("1-2pm")
+        next_meridiem = raw[idx + 1][2] if idx + 1 < len(raw) else ''
+        if not minute and not meridiem and not next_meridiem:
+            continue
+        hour = int(hour)
+        # "1:00-2:00pm": the first time borrows the meridiem of the second,
+        # unless that would put it after the end ("11:45-12:45pm")
+        if not meridiem and next_meridiem:
+            next_hour = _to_24h(int(raw[idx + 1][0]), next_meridiem)
+            meridiem = next_meridiem
+            if _to_24h(hour, meridiem) > next_hour:
+                meridiem = 'am' if meridiem == 'pm' else 'pm'
+        hour = _to_24h(hour, meridiem)
+        if hour > 23:
+            continue
+        times.append((hour, int(minute or 0)))
+    return times
+
+
+def parse_session_times(date_time: str, now: Optional[datetime] = None) -> Optional[Tuple[datetime, datetime]]:
+    """
+    Parse the start and end time of a session.
+
+    Args:
+        date_time: Date string from the website (e.g., "Tuesday 4th November 11:45am-12:45pm")
+        now: Reference time used to infer a missing year (defaults to now)
+
+    Returns:
+        (start, end) datetimes, or None if no date could be found.
+        Missing times default to the whole day; a missing end time
+        defaults to DEFAULT_SESSION_LENGTH after the start.
+    """
+    date = parse_session_date(date_time, now)
+    if date is None:
+        return None
+
+    times = _parse_times(date_time.lower())
+    if not times:
+        return date, date + timedelta(days=1)
+
+    start = date.replace(hour=times[0][0], minute=times[0][1])
+    if len(times) > 1:
+        end = date.replace(hour=times[1][0], minute=times[1][1])
+        if end <= start:
+            end += timedelta(days=1)
+    else:
+        end = start + DEFAULT_SESSION_LENGTH
+    return start, end
+
+
+def session_has_ended(date_time: str, grace_hours: float = 0, now: Optional[datetime] = None,
+                      seen_at: Optional[datetime] = None) -> bool:
+    """
+    Check if a session finished more than grace_hours ago.
+
+    Args:
+        date_time: Date string from the website
+        grace_hours: How long after the end time a session still counts as current
+        now: Current time (defaults to now)
+        seen_at: When the string was scraped; used to infer the year, so a
+            session seen last November isn't mistaken for next November
+
+    Returns:
+        True if the session has ended; False if it hasn't or can't be parsed
+    """
+    now = now or datetime.now()
+    times = parse_session_times(date_time, seen_at or now)
+    if times is None:
+        return False
+    return times[1] + timedelta(hours=grace_hours) < now
+
+
+def parse_weekday(date_time: str, now: Optional[datetime] = None) -> Optional[int]:
+    """
+    Get the day of week of a session (0=Monday, 6=Sunday).
+
+    Args:
+        date_time: Date string from the website
+        now: Reference time used to infer a missing year (defaults to now)
+
+    Returns:
+        Weekday number, or None if it can't be determined
+    """
+    text = date_time.lower()
+    for day_num, day_name in enumerate(DAY_NAMES):
+        if re.search(r'\b' + day_name[:3], text):
+            return day_num
+
+    date = parse_session_date(date_time, now)
+    return date.weekday() if date else None
+
+
+def _short_time(hour: int, minute: int) -> str:
+    """Format a 24-hour time as "7", "7:30" (meridiem added by the caller)."""
+    return f"{hour % 12 or 12}:{minute:02d}" if minute else str(hour % 12 or 12)
+
+
+def format_label(date: datetime, times: Optional[List[Tuple[int, int]]] = None,
+                 weekday: Optional[int] = None) -> str:
+    """
+    Format a date and optional (hour, minute) start/end times as a short label.
+
+    Args:
+        date: Session date
+        times: Up to two (hour, minute) tuples in 24-hour time
+        weekday: Weekday to show (defaults to the date's)
+
+    Returns:
+        Label like "Sat 8 Nov 10-11am" or "Tue 4 Nov 11:45am-12:45pm"
+    """
+    weekday = date.weekday() if weekday is None else weekday
+    label = f"{DAY_NAMES[weekday][:3].title()} {date.day} {date.strftime('%b')}"
+
+    times = (times or [])[:2]
+    if not times:
+        return label
+
+    meridiems = ['am' if hour < 12 else 'pm' for hour, _ in times]
+    parts = [_short_time(hour, minute) for hour, minute in times]
+    if len(parts) == 2 and meridiems[0] == meridiems[1]:
+        return f"{label} {parts[0]}-{parts[1]}{meridiems[1]}"
+    return f"{label} " + '-'.join(part + meridiem for part, meridiem in zip(parts, meridiems))
+
+
+def short_label(date_time: str, now: Optional[datetime] = None) -> str:
+    """
+    Abbreviate a session date/time string for SMS and the booked list.
+
+    "Tuesday 4th November 11:45am-12:45pm" becomes "Tue 4 Nov 11:45am-12:45pm"
+    and "Saturday 8th November 10:00am-11:00am" becomes "Sat 8 Nov 10-11am".
+    Strings without a recognisable date are returned unchanged.
+
+    Args:
+        date_time: Date string from the website
+        now: Reference time used to infer a missing year (defaults to now)
+
+    Returns:
+        Short label
+    """
+    date = parse_session_date(date_time, now)
+    if date is None:
+        return date_time
+    # Keep the weekday the site printed; the year (and so the date's weekday) is only inferred
+    return format_label(date, _parse_times(date_time.lower()), parse_weekday(date_time, now))
+
+
+def session_key(date_time: str, now: Optional[datetime] = None) -> str:
+    """
+    Normalise a session date/time string into a stable lookup key.
+
+    "Tuesday 4th November 11:45am-12:45pm" and "Tue, Nov 4 - 11:45am" both
+    become "2025-11-04T11:45". Strings that can't be parsed fall back to
+    their lower-cased, whitespace-collapsed form.
+
+    Args:
+        date_time: Date string from the website or typed by the user
+        now: Reference time used to infer a missing year (defaults to now)
+
+    Returns:
+        Normalised key string
+    """
+    date = parse_session_date(date_time, now)
+    if date is None:
+        return ' '.join(date_time.lower().split())
+
+    times = _parse_times(date_time.lower())
+    if not times:
+        return date.strftime('%Y-%m-%d')
+    return date.replace(hour=times[0][0], minute=times[0][1]).strftime('%Y-%m-%dT%H:%M')
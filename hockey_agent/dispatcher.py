@@ -0,0 +1,300 @@
+"""High fan-out SMS dispatch with bounded concurrency and rate limiting.
+
+A reopened spot has to reach every interested subscriber before somebody
+else books it, so messages are sent from a worker pool instead of one at a
+time. A shared token bucket keeps the aggregate send rate within the
+provider's limit (Twilio long codes allow about 1 message/second, toll-free
+numbers 3/second, short codes 100/second).
+"""
+
+import base64
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+from hockey_agent import codec, metrics
+from hockey_agent.config import (
+    TWILIO_ACCOUNT_SID,
+    TWILIO_AUTH_TOKEN,
+    TWILIO_API_KEY,
+    TWILIO_API_SECRET,
+    TWILIO_FROM_PHONE,
+    TWILIO_API_BASE_URL,
+    DISPATCH_CONCURRENCY,
+    DISPATCH_RATE_PER_SECOND,
+    DISPATCH_BURST,
+    DISPATCH_DEDUP_SECONDS,
+    POOL_MAX_IDLE
+)
+from hockey_agent.pools import http_pool
+from hockey_agent.sms import segment_count
+
+logger = logging.getLogger(__name__)
+
+# A sender takes (recipient, body) and returns a provider message ID
+Sender = Callable[[str, str], str]
+
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """
+        Create a token bucket.
+
+        Args:
+            rate: Tokens added per second (0 or less disables limiting)
+            burst: Maximum tokens held at once (defaults to rate, minimum 1)
+        """
+        self.rate = rate
+        self.capacity = max(1.0, burst if burst else rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, cancel: Optional[threading.Event] = None) -> float:
+        """
+        Take one token, blocking until one is available.
+
+        Args:
+            cancel: Event that ends the wait early (no token is taken)
+
+        Returns:
+            Seconds spent waiting
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            if cancel is not None:
+                if cancel.wait(delay):
+                    return waited
+            else:
+                time.sleep(delay)
+            waited += delay
+
+
+class TwilioRestSender:
+    """Send SMS through the Twilio REST API over pooled keep-alive connections.
+
+    Connections come from the shared Twilio pool (see pools.py), so they
+    are reused across worker threads, single sends and checks. The base
+    URL can point at a local fake server for benchmarking.
+    """
+
+    def __init__(self, base_url: str = TWILIO_API_BASE_URL, max_idle: int = max(POOL_MAX_IDLE, DISPATCH_CONCURRENCY)):
+        """
+        Create a sender.
+
+        Args:
+            base_url: Twilio API scheme and host
+            max_idle: Connections to keep open (one per dispatch worker avoids reconnecting)
+        """
+        self._pool = http_pool(base_url, 'twilio', max_idle)
+
+        # Prefer API Key if available, fallback to Auth Token
+        if TWILIO_API_KEY and TWILIO_API_SECRET:
+            username, password = TWILIO_API_KEY, TWILIO_API_SECRET
+        else:
+            username, password = TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN
+        credentials = base64.b64encode(f"{username}:{password}".encode()).decode()
+
+        self._path = f"/2010-04-01/Accounts/{TWILIO_ACCOUNT_SID}/Messages.json"
+        self._headers = {
+            'Authorization': f"Basic {credentials}",
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Connection': 'keep-alive',
+        }
+
+    def __call__(self, recipient: str, body: str) -> str:
+        # Bytes so headers and body go out in one packet (avoids Nagle/delayed-ACK stalls)
+        payload = urlencode({'To': recipient, 'From': TWILIO_FROM_PHONE, 'Body': body}).encode()
+        status, data = self._pool.request('POST', self._path, body=payload, headers=self._headers)
+
+        if status >= 400:
+            raise RuntimeError(f"Twilio returned {status}: {data[:200]!r}")
+        return codec.loads(data).get('sid', '')
+
+
+_sender: Optional[TwilioRestSender] = None
+
+
+def get_twilio_sender() -> TwilioRestSender:
+    """Get the shared Twilio sender (used by the dispatcher and single sends)."""
+    global _sender
+    if _sender is None:
+        _sender = TwilioRestSender()
+    return _sender
+
+
+def _normalise_recipient(recipient: str) -> str:
+    """Strip formatting from a phone number so duplicates compare equal."""
+    return ''.join(c for c in recipient if c.isdigit() or c == '+')
+
+
+class NotificationDispatcher:
+    """Send many messages concurrently within a provider rate limit."""
+
+    def __init__(self, sender: Optional[Sender] = None, concurrency: int = DISPATCH_CONCURRENCY,
+                 rate_per_second: float = DISPATCH_RATE_PER_SECOND, burst: float = DISPATCH_BURST,
+                 dedup_seconds: float = DISPATCH_DEDUP_SECONDS):
+        """
+        Create a dispatcher.
+
+        Args:
+            sender: Callable sending one message (defaults to the shared TwilioRestSender)
+            concurrency: Number of worker threads
+            rate_per_second: Aggregate send rate limit (0 = unlimited)
+            burst: Token bucket size (0 = same as rate)
+            dedup_seconds: How long an identical message to the same recipient is suppressed
+        """
+        self.sender = sender or get_twilio_sender()
+        self.concurrency = max(1, concurrency)
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.dedup_seconds = dedup_seconds
+        # (recipient, body hash) -> time sent
+        self._recent: Dict[Tuple[str, str], float] = {}
+        self._recent_lock = threading.Lock()
+
+    def _is_duplicate(self, recipient: str, body: str) -> bool:
+        """
+        Check a (recipient, body) pair for deduplication, reserving it if new.
+
+        The reservation keeps the same message from being sent twice while
+        it is in flight; _forget() drops it again if the send fails, so the
+        next dispatch retries instead of treating the message as sent.
+        """
+        key = (recipient, hashlib.sha1(body.encode()).hexdigest())
+        now = time.monotonic()
+        with self._recent_lock:
+            sent_at = self._recent.get(key)
+            if sent_at is not None and now - sent_at < self.dedup_seconds:
+                return True
+            self._recent[key] = now
+            return False
+
+    def _forget(self, recipient: str, body: str):
+        """Drop a pair's reservation after a failed send."""
+        key = (recipient, hashlib.sha1(body.encode()).hexdigest())
+        with self._recent_lock:
+            self._recent.pop(key, None)
+
+    def _prune_recent(self):
+        """Forget messages older than the dedup window."""
+        cutoff = time.monotonic() - self.dedup_seconds
+        with self._recent_lock:
+            self._recent = {k: t for k, t in self._recent.items() if t >= cutoff}
+
+    def _send_one(self, recipient: str, body: str, cancel: Optional[threading.Event] = None) -> Tuple[Optional[bool], float]:
+        """Send one message, returning (success, latency in seconds); success is None if cancelled first."""
+        waited = self.bucket.acquire(cancel)
+        metrics.observe('dispatch.rate_limit_wait', waited)
+        if cancel is not None and cancel.is_set():
+            self._forget(recipient, body)
+            return None, 0.0
+
+        start = time.perf_counter()
+        try:
+            sid = self.sender(recipient, body)
+            latency = time.perf_counter() - start
+            logger.debug("Sent to %s (%s) in %.0fms", recipient, sid, latency * 1000)
+            return True, latency
+        except Exception as e:
+            latency = time.perf_counter() - start
+            logger.error("Error sending to %s: %s", recipient, e)
+            self._forget(recipient, body)
+            return False, latency
+
+    def dispatch(self, messages: List[Tuple[str, str]], cancel: Optional[threading.Event] = None) -> Dict:
+        """
+        Send a batch of messages.
+
+        Args:
+            messages: List of (recipient, body) tuples
+            cancel: Event that stops sending (e.g. the watchdog's notify deadline);
+                messages not yet sent are counted as cancelled and can go out next time
+
+        Returns:
+            Statistics dictionary with sent, failed, cancelled, deduplicated, segments,
+            elapsed_seconds, messages_per_second and latency percentiles
+        """
+        self._prune_recent()
+
+        unique = []
+        deduplicated = 0
+        for recipient, body in messages:
+            recipient = _normalise_recipient(recipient)
+            if not recipient or self._is_duplicate(recipient, body):
+                deduplicated += 1
+                continue
+            unique.append((recipient, body))
+
+        start = time.perf_counter()
+        results = []
+        if unique:
+            workers = min(self.concurrency, len(unique))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dispatch') as pool:
+                results = list(pool.map(lambda m: self._send_one(*m, cancel), unique))
+        elapsed = time.perf_counter() - start
+
+        sent = sum(1 for ok, _ in results if ok)
+        cancelled = sum(1 for ok, _ in results if ok is None)
+        failed = len(results) - sent - cancelled
+        segments = sum(segment_count(body) for (_, body), (ok, _) in zip(unique, results) if ok)
+        latencies = sorted(latency for ok, latency in results if ok is not None)
+
+        metrics.increment('dispatch.sent', sent)
+        metrics.increment('dispatch.failed', failed)
+        metrics.increment('dispatch.cancelled', cancelled)
+        metrics.increment('dispatch.deduplicated', deduplicated)
+        metrics.increment('dispatch.segments', segments)
+        for latency in latencies:
+            metrics.observe('dispatch.latency', latency)
+
+        stats = {
+            'sent': sent,
+            'failed': failed,
+            'cancelled': cancelled,
+            'deduplicated': deduplicated,
+            'segments': segments,
+            'elapsed_seconds': elapsed,
+            'messages_per_second': sent / elapsed if elapsed > 0 else 0.0,
+            'latency_p50': _percentile(latencies, 50),
+            'latency_p95': _percentile(latencies, 95),
+        }
+        logger.info(
+            "Dispatched %s message(s), %s segment(s) (%s failed, %s cancelled, %s deduplicated) in %.2fs (%.1f/s)",
+            sent, segments, failed, cancelled, deduplicated, elapsed, stats['messages_per_second']
+        )
+        return stats
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+_dispatcher: Optional[NotificationDispatcher] = None
+
+
+def get_dispatcher() -> NotificationDispatcher:
+    """Get the shared dispatcher (so dedup state and connections persist across checks)."""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = NotificationDispatcher()
+    return _dispatcher
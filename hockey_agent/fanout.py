@@ -0,0 +1,214 @@
+"""Split a check across several Lambda invocations.
+
+A coordinator invocation splits SITES_TO_MONITOR into shards and invokes a
+worker per shard in parallel. Workers only scrape and return the sessions
+they found; the coordinator then merges them and runs the usual diff,
+store and notify steps once, so seen/booked state (which lives in the
+coordinator's /tmp) stays in one place and each change is notified once.
+
+Workers are invoked through an invoker object: LambdaInvoker calls the
+real Lambda Invoke API, LocalInvoker runs the worker in-process so the
+whole flow can be exercised offline.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from hockey_agent import codec
+from hockey_agent.config import SITES_TO_MONITOR, FANOUT_SHARDS, FANOUT_FUNCTION_NAME
+from hockey_agent.scraper import scrape_sites, check_all_sites
+from hockey_agent.lease import check_lease, lease_summary, SKIPPED, REUSED
+from hockey_agent.watchdog import watch_check
+
+logger = logging.getLogger(__name__)
+
+WORKER_MODE = 'worker'
+
+
+def plan_shards(sites: List[Dict], shard_count: int) -> List[List[Dict]]:
+    """
+    Split sites into at most shard_count non-empty shards, round-robin.
+
+    Args:
+        sites: Site configuration dictionaries
+        shard_count: Number of shards wanted
+
+    Returns:
+        List of shards (each a list of sites)
+    """
+    shard_count = max(1, min(shard_count, len(sites)))
+    shards = [[] for _ in range(shard_count)]
+    for i, site in enumerate(sites):
+        shards[i % shard_count].append(site)
+    return [shard for shard in shards if shard]
+
+
+def run_worker(event: Dict) -> Dict:
+    """
+    Scrape one shard (the worker side of a fan-out).
+
+    Args:
+        event: Worker event with a 'sites' list
+
+    Returns:
+        {'sites': [{'site': ..., 'sessions': [...]}, ...], 'blown_phases': [...]}
+    """
+    results = []
+    with watch_check() as watchdog:
+        for site, sessions in scrape_sites(event.get('sites', [])):
+            results.append({'site': site, 'sessions': sessions})
+            logger.info("Worker scraped %s session(s) from %s", len(sessions), site['name'])
+
+    return {
+        'sites': results,
+        'blown_phases': list(watchdog.blown_phases) if watchdog else [],
+    }
+
+
+class LambdaInvoker:
+    """Invokes worker shards as synchronous Lambda invocations."""
+
+    def __init__(self, function_name: str):
+        """
+        Create an invoker.
+
+        Args:
+            function_name: Name or ARN of the function to invoke (usually this one)
+        """
+        import boto3
+        from botocore.config import Config
+
+        self.function_name = function_name
+        # Wait as long as a worker may run; retrying would scrape twice
+        self.client = boto3.client('lambda', config=Config(
+            read_timeout=900,
+            retries={'max_attempts': 0},
+        ))
+
+    def invoke(self, payload: Dict) -> Dict:
+        """
+        Invoke a worker and wait for its result.
+
+        Args:
+            payload: Worker event
+
+        Returns:
+            The worker's result
+
+        Raises:
+            RuntimeError: If the worker raised an error
+        """
+        response = self.client.invoke(
+            FunctionName=self.function_name,
+            InvocationType='RequestResponse',
+            Payload=codec.dumps(payload),
+        )
+        result = codec.loads(response['Payload'].read() or b'null')
+        if response.get('FunctionError'):
+            raise RuntimeError(f"Worker failed: {result}")
+        return result
+
+
+class LocalInvoker:
+    """In-process stand-in for LambdaInvoker, for running fan-out offline."""
+
+    def __init__(self, handler: Callable[[Dict], Dict] = run_worker):
+        """
+        Create an invoker.
+
+        Args:
+            handler: Function run for each worker event
+        """
+        self.handler = handler
+
+    def invoke(self, payload: Dict) -> Dict:
+        """
+        Run a worker in this process.
+
+        The payload and result go through JSON like they would over the
+        Invoke API, so anything that wouldn't survive the real trip fails here too.
+
+        Args:
+            payload: Worker event
+
+        Returns:
+            The worker's result
+        """
+        return codec.loads(codec.dumps(self.handler(codec.loads(codec.dumps(payload)))))
+
+
+def get_invoker():
+    """Get a LambdaInvoker if a function name is configured, else a LocalInvoker."""
+    if FANOUT_FUNCTION_NAME:
+        return LambdaInvoker(FANOUT_FUNCTION_NAME)
+    return LocalInvoker()
+
+
+def fan_out(invoker, shards: List[List[Dict]]) -> Tuple[List[Tuple[Dict, List[Dict]]], List[str], int]:
+    """
+    Run every shard in parallel and merge the results.
+
+    Args:
+        invoker: LambdaInvoker or LocalInvoker
+        shards: Lists of sites to scrape
+
+    Returns:
+        ((site, sessions) pairs from all shards, blown phases reported by
+        workers, number of shards that failed)
+    """
+    def invoke(shard):
+        return invoker.invoke({'mode': WORKER_MODE, 'sites': shard})
+
+    scraped = []
+    blown_phases = []
+    failed = 0
+
+    with ThreadPoolExecutor(max_workers=len(shards) or 1) as executor:
+        futures = [(shard, executor.submit(invoke, shard)) for shard in shards]
+        for shard, future in futures:
+            names = ', '.join(site['name'] for site in shard)
+            try:
+                result = future.result()
+            except Exception as e:
+                failed += 1
+                logger.error("Shard [%s] failed: %s", names, e)
+                continue
+
+            for entry in result.get('sites', []):
+                scraped.append((entry['site'], entry['sessions']))
+            blown_phases.extend(result.get('blown_phases', []))
+
+    return scraped, blown_phases, failed
+
+
+def run_coordinator(invoker=None, shard_count: Optional[int] = None) -> Dict:
+    """
+    Check all sites by fanning the scrapes out to worker invocations.
+
+    The coordinator holds the check lease from before the fan-out until the
+    notifications are sent (see lease.py).
+
+    Args:
+        invoker: Invoker for the workers (defaults to get_invoker())
+        shard_count: Number of shards (defaults to FANOUT_SHARDS)
+
+    Returns:
+        check_all_sites() summary, plus 'shards' and 'failed_shards'
+    """
+    with check_lease() as (lease, snapshot):
+        if lease in (SKIPPED, REUSED):
+            return dict(lease_summary(lease, snapshot), shards=0, failed_shards=0)
+
+        invoker = invoker or get_invoker()
+        shards = plan_shards(SITES_TO_MONITOR, shard_count or FANOUT_SHARDS)
+        logger.info("Fanning out %s site(s) across %s worker(s)", len(SITES_TO_MONITOR), len(shards))
+
+        scraped, worker_blown_phases, failed = fan_out(invoker, shards)
+        summary = check_all_sites(scraped)
+
+    summary['lease'] = lease
+    summary['blown_phases'] = worker_blown_phases + summary['blown_phases']
+    summary['shards'] = len(shards)
+    summary['failed_shards'] = failed
+    summary['degraded'] = bool(summary['blown_phases'] or failed)
+    return summary
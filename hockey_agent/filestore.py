@@ -0,0 +1,200 @@
+"""Multi-process-safe JSON store files.
+
+The daemon, manage_booked.py and test_scraper.py runs can all touch the
+same store files. Three rules keep them consistent:
+
+- Writes are atomic: data goes to a temporary file in the same directory
+  which then replaces the store (os.replace), so a reader sees either the
+  old file or the new one, never a torn one.
+- Read-modify-write sequences hold an advisory lock (flock) on a sidecar
+  "<file>.lock", so two writers can't lose each other's changes. The lock
+  is on the sidecar because the store itself is replaced on every write.
+- Readers never lock. read_json() keeps the last parsed value per file and
+  only re-reads (through mmap) when the file's signature - inode, mtime and
+  size, all of which change on every atomic replace - is different. The
+  value is shared between callers and must not be modified; copy it first.
+
+On platforms without fcntl the lock only serialises threads in this process.
+"""
+
+import mmap
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+from hockey_agent import codec
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+Signature = Tuple[int, int, int]
+
+
+class _FileLock:
+    """Reentrant lock held across threads of this process and (via flock) other processes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self._file = open(self.path, 'a+b')
+                if fcntl is not None:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            except OSError:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+
+
+_locks: Dict[str, _FileLock] = {}
+_locks_guard = threading.Lock()
+
+# path -> (signature, parsed value)
+_cache: Dict[str, Tuple[Signature, Any]] = {}
+_cache_lock = threading.Lock()
+
+
+@contextmanager
+def locked(path: str):
+    """
+    Hold the exclusive write lock for a store file.
+
+    Reentrant within a thread, so functions that lock can call each other.
+
+    Args:
+        path: Store file (the lock is taken on "<path>.lock")
+    """
+    lock_path = os.path.abspath(path) + '.lock'
+    with _locks_guard:
+        lock = _locks.setdefault(lock_path, _FileLock(lock_path))
+    lock.acquire()
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+def _signature(stat: os.stat_result) -> Signature:
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def signature(path: str) -> Optional[Signature]:
+    """Get a file's change signature (inode, mtime, size), or None if it doesn't exist."""
+    try:
+        return _signature(os.stat(path))
+    except OSError:
+        return None
+
+
+@contextmanager
+def atomic_writer(path: str):
+    """
+    Write a file's new contents piece by piece, replacing it atomically at the end.
+
+    If the block raises, the file is left as it was.
+
+    Args:
+        path: File to replace
+
+    Yields:
+        Binary file object for the new contents
+
+    Raises:
+        OSError: If the file can't be written
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write(path: str, data: bytes):
+    """
+    Replace a file's contents atomically.
+
+    Raises:
+        OSError: If the file can't be written
+    """
+    with atomic_writer(path) as f:
+        f.write(data)
+
+
+def read_json(path: str) -> Any:
+    """
+    Read a JSON store without locking, re-parsing only if the file changed.
+
+    Returns:
+        The parsed value (shared - don't modify it)
+
+    Raises:
+        OSError: If the file can't be read (FileNotFoundError if it doesn't exist)
+        codec.JSONDecodeError: If it isn't valid JSON
+    """
+    with open(path, 'rb') as f:
+        sig = _signature(os.fstat(f.fileno()))
+        with _cache_lock:
+            cached = _cache.get(path)
+        if cached is not None and cached[0] == sig:
+            return cached[1]
+
+        if sig[2] == 0:
+            value = codec.loads(b'')
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                view = memoryview(data)
+                try:
+                    value = codec.loads(view)
+                finally:
+                    view.release()
+
+    with _cache_lock:
+        _cache[path] = (sig, value)
+    return value
+
+
+def write_json(path: str, value: Any):
+    """
+    Write a JSON store atomically and remember the value for read_json().
+
+    Call while holding locked(path). The value becomes the shared cached
+    copy, so don't modify it afterwards.
+
+    Raises:
+        OSError: If the file can't be written
+    """
+    codec.dump_file(path, value)
+    sig = signature(path)
+    if sig is not None:
+        with _cache_lock:
+            _cache[path] = (sig, value)
@@ -0,0 +1,104 @@
+"""Hysteresis for session status changes, so flapping sessions don't spam notifications.
+
+A session can flip between SOLD OUT and AVAILABLE several times in a few
+minutes as carts are abandoned and spots are reserved again. Each session
+has a small state machine, kept in its seen-store entry under 'flap':
+
+    confirmed     status notifications are based on
+    pending       a different status that has been seen but not confirmed yet
+    pending_since epoch time pending was first seen
+    notified_at   epoch time of the last notification for this session
+
+A change is only confirmed when a check still sees it at least
+FLAP_DWELL_SECONDS after it was first seen, so a sell-out that reverts
+before then never produces a "spot opened" notification. Keep the dwell
+shorter than the check interval, or real changes wait extra checks. A
+confirmed reopening within FLAP_COOLDOWN_SECONDS of the last notification
+for the same session is suppressed. With both set to 0 every change is
+notified, as before.
+"""
+
+from typing import Dict, Optional, Tuple
+from hockey_agent.config import FLAP_DWELL_SECONDS, FLAP_COOLDOWN_SECONDS
+
+# Events returned by advance()
+NEW = 'new'  # first seen with spots: notify
+REOPENED = 'reopened'  # confirmed SOLD OUT -> AVAILABLE: notify
+HELD = 'held'  # change seen, waiting out the dwell time
+FLAPPED = 'flapped'  # pending reopening reverted before it was confirmed (suppressed)
+COOLDOWN = 'cooldown'  # confirmed reopening inside the cooldown (suppressed)
+
+SUPPRESSED = (FLAPPED, COOLDOWN)
+
+
+def state_of(entry: Optional[Dict]) -> Optional[Dict]:
+    """
+    Get the flap state of a seen-store entry.
+
+    Entries written before flap state existed are treated as confirmed at their status.
+
+    Args:
+        entry: Stored entry (with 'status' and optionally 'flap'), or None if never seen
+
+    Returns:
+        Flap state, or None for a session never seen before
+    """
+    if entry is None:
+        return None
+    return entry.get('flap') or {'confirmed': entry.get('status')}
+
+
+def confirmed_status(entry: Optional[Dict]) -> Optional[str]:
+    """Confirmed status of a seen-store entry (None if never seen)."""
+    state = state_of(entry)
+    return state.get('confirmed') if state else None
+
+
+def advance(state: Optional[Dict], observed: str, now: float,
+            dwell: float = FLAP_DWELL_SECONDS, cooldown: float = FLAP_COOLDOWN_SECONDS) -> Tuple[Dict, Optional[str]]:
+    """
+    Feed one observation of a session into its state machine.
+
+    Args:
+        state: Current flap state (None if the session was never seen)
+        observed: Status seen now ('AVAILABLE' or 'SOLD OUT')
+        now: Epoch time of the observation
+        dwell: Seconds a change must persist before it is confirmed
+        cooldown: Seconds after a notification during which reopenings are suppressed
+
+    Returns:
+        (new state, event) where event is NEW, REOPENED, HELD, FLAPPED, COOLDOWN or None
+    """
+    if state is None:
+        if observed == 'AVAILABLE':
+            return {'confirmed': observed, 'notified_at': now}, NEW
+        return {'confirmed': observed}, None
+
+    confirmed = state.get('confirmed')
+    pending = state.get('pending')
+
+    if observed == confirmed:
+        if pending is None:
+            return state, None
+        # Reverted before the dwell time was up; only a reopening that
+        # didn't last would have been a notification
+        return _without_pending(state), FLAPPED if pending == 'AVAILABLE' else None
+
+    since = state.get('pending_since', now) if pending == observed else now
+    if now - since < dwell:
+        return dict(state, pending=observed, pending_since=since), HELD
+
+    state = _without_pending(state)
+    state['confirmed'] = observed
+    if observed != 'AVAILABLE':
+        return state, None
+
+    last = state.get('notified_at')
+    if last is not None and now - last < cooldown:
+        return state, COOLDOWN
+    state['notified_at'] = now
+    return state, REOPENED
+
+
+def _without_pending(state: Dict) -> Dict:
+    return {key: value for key, value in state.items() if key not in ('pending', 'pending_since')}
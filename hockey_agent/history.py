@@ -0,0 +1,365 @@
+"""Compact per-session inventory history.
+
+Each session keeps a fixed-size ring buffer of (timestamp, qty_in_stock,
+sold_out) samples backed by `array` columns, so memory per session is
+bounded at HISTORY_SAMPLES * 7 bytes no matter how long it is tracked.
+A sample is recorded when the inventory changes, or as a heartbeat once
+HISTORY_HEARTBEAT_MINUTES have passed since the last one.
+
+On disk (HISTORY_FILE) the buffers are stored back to back in a small
+binary format:
+
+    b'HAH2'                                 magic/version
+    per session:
+        uint16 key length, key (UTF-8)
+        uint16 date/time length, date/time (UTF-8)
+        uint16 sample count
+        count x (uint32 epoch seconds, uint16 qty, uint8 sold out)
+
+The session's date/time text is kept as its own column because session
+IDs ("site:session type:date/time") can't be split reliably: types and
+times both contain colons. HAH1 files (without it) are still read.
+"""
+
+import logging
+import struct
+import time
+from array import array
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Set, Tuple
+from hockey_agent import filestore
+from hockey_agent.config import (
+    HISTORY_FILE,
+    HISTORY_SAMPLES,
+    HISTORY_HEARTBEAT_MINUTES
+)
+from hockey_agent.dates import session_has_ended
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'HAH2'
+_MAGIC_V1 = b'HAH1'
+_LENGTH = struct.Struct('<H')
+_SAMPLE = struct.Struct('<IHB')
+_MAX_QTY = 0xFFFF
+
+
+class SessionHistory:
+    """Fixed-capacity ring buffer of inventory samples for one session."""
+
+    __slots__ = ('capacity', '_ts', '_qty', '_sold', '_start', '_size')
+
+    def __init__(self, capacity: int = HISTORY_SAMPLES):
+        """
+        Create an empty history.
+
+        Args:
+            capacity: Maximum number of samples kept (oldest are overwritten)
+        """
+        self.capacity = max(1, capacity)
+        self._ts = array('I', [0]) * self.capacity
+        self._qty = array('H', [0]) * self.capacity
+        self._sold = array('B', [0]) * self.capacity
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, timestamp: float, qty_in_stock: int, sold_out: bool):
+        """
+        Add a sample, overwriting the oldest if the buffer is full.
+
+        Args:
+            timestamp: Epoch seconds
+            qty_in_stock: Spots left
+            sold_out: Whether the session showed as sold out
+        """
+        if self._size < self.capacity:
+            idx = (self._start + self._size) % self.capacity
+            self._size += 1
+        else:
+            idx = self._start
+            self._start = (self._start + 1) % self.capacity
+
+        self._ts[idx] = int(timestamp)
+        self._qty[idx] = max(0, min(_MAX_QTY, int(qty_in_stock or 0)))
+        self._sold[idx] = 1 if sold_out else 0
+
+    def last(self) -> Optional[Tuple[int, int, bool]]:
+        """Get the newest sample, or None if empty."""
+        if not self._size:
+            return None
+        idx = (self._start + self._size - 1) % self.capacity
+        return self._ts[idx], self._qty[idx], bool(self._sold[idx])
+
+    def samples(self, since: Optional[float] = None) -> Iterator[Tuple[int, int, bool]]:
+        """
+        Iterate samples oldest first.
+
+        Args:
+            since: Only yield samples at or after this epoch time
+
+        Yields:
+            (timestamp, qty_in_stock, sold_out) tuples
+        """
+        for offset in range(self._size):
+            idx = (self._start + offset) % self.capacity
+            if since is not None and self._ts[idx] < since:
+                continue
+            yield self._ts[idx], self._qty[idx], bool(self._sold[idx])
+
+    def sell_through_rate(self, window_hours: float = 24, now: Optional[float] = None) -> Optional[float]:
+        """
+        Spots sold per hour over a recent window.
+
+        Only decreases in stock count as sales; spots released by
+        cancellations are ignored (see release_rate()).
+
+        Args:
+            window_hours: How far back to look
+            now: Reference epoch time (defaults to now)
+
+        Returns:
+            Spots sold per hour, or None if there are fewer than two samples in the window
+        """
+        return self._rate(window_hours, now, sold=True)
+
+    def release_rate(self, window_hours: float = 24, now: Optional[float] = None) -> Optional[float]:
+        """
+        Spots released (e.g. by cancellations) per hour over a recent window.
+
+        Args:
+            window_hours: How far back to look
+            now: Reference epoch time (defaults to now)
+
+        Returns:
+            Spots released per hour, or None if there are fewer than two samples in the window
+        """
+        return self._rate(window_hours, now, sold=False)
+
+    def _rate(self, window_hours: float, now: Optional[float], sold: bool) -> Optional[float]:
+        now = now or time.time()
+        window = list(self.samples(since=now - window_hours * 3600))
+        if len(window) < 2:
+            return None
+
+        total = 0
+        for (_, previous_qty, _), (_, qty, _) in zip(window, window[1:]):
+            change = previous_qty - qty if sold else qty - previous_qty
+            if change > 0:
+                total += change
+
+        hours = (window[-1][0] - window[0][0]) / 3600
+        return total / hours if hours > 0 else None
+
+    def to_bytes(self) -> bytes:
+        """Encode the samples (oldest first) without the unused capacity."""
+        return b''.join(_SAMPLE.pack(ts, qty, sold) for ts, qty, sold in self.samples())
+
+    @classmethod
+    def from_bytes(cls, data: bytes, capacity: int = HISTORY_SAMPLES) -> 'SessionHistory':
+        """
+        Decode samples written by to_bytes().
+
+        Args:
+            data: Packed samples
+            capacity: Buffer capacity (older samples beyond it are dropped)
+
+        Returns:
+            SessionHistory
+        """
+        history = cls(capacity)
+        for ts, qty, sold in _SAMPLE.iter_unpack(data):
+            history.append(ts, qty, bool(sold))
+        return history
+
+
+class HistoryStore:
+    """All session histories, loaded once and saved once per check.
+
+    A check holds its store for its whole run, so the file isn't locked in
+    between. Instead save() takes the file's lock and, if another process
+    (e.g. `manage_booked.py compact`) wrote it since it was loaded, merges
+    only this store's own changes into the latest copy.
+    """
+
+    def __init__(self, path: str = HISTORY_FILE, capacity: int = HISTORY_SAMPLES):
+        self.path = path
+        self.capacity = capacity
+        self.sessions: Dict[str, SessionHistory] = {}
+        self.date_times: Dict[str, str] = {}  # session ID -> the session's date/time text
+        self._changed: Set[str] = set()  # session IDs recorded since load
+        self._removed: Set[str] = set()  # session IDs removed since load
+        self._signature: Optional[filestore.Signature] = None  # of the file as loaded
+
+    def get(self, session_id: str) -> Optional[SessionHistory]:
+        """Get a session's history, or None if it has none."""
+        return self.sessions.get(session_id)
+
+    def date_time(self, session_id: str) -> str:
+        """Get a session's date/time text ('' if unknown)."""
+        date_time = self.date_times.get(session_id)
+        if date_time is None:
+            # Written before the date/time was stored; only right if the site and type have no colons
+            parts = session_id.split(':', 2)
+            date_time = parts[2] if len(parts) == 3 else ''
+        return date_time
+
+    def record(self, session_id: str, qty_in_stock: int, sold_out: bool, timestamp: Optional[float] = None,
+               date_time: Optional[str] = None):
+        """
+        Record a sample if the inventory changed or the heartbeat interval has passed.
+
+        Args:
+            session_id: Unique identifier for the session
+            qty_in_stock: Spots left
+            sold_out: Whether the session showed as sold out
+            timestamp: Epoch seconds (defaults to now)
+            date_time: The session's date/time text (used to prune it once it has happened)
+        """
+        if date_time is not None and self.date_times.get(session_id) != date_time:
+            self.date_times[session_id] = date_time
+            self._changed.add(session_id)
+
+        timestamp = timestamp or time.time()
+        history = self.sessions.get(session_id)
+        if history is None:
+            history = self.sessions[session_id] = SessionHistory(self.capacity)
+
+        last = history.last()
+        if last is not None:
+            last_ts, last_qty, last_sold = last
+            unchanged = last_qty == max(0, min(_MAX_QTY, int(qty_in_stock or 0))) and last_sold == bool(sold_out)
+            if unchanged and timestamp - last_ts < HISTORY_HEARTBEAT_MINUTES * 60:
+                return
+
+        history.append(timestamp, qty_in_stock, sold_out)
+        self._changed.add(session_id)
+        self._removed.discard(session_id)
+
+    def remove(self, session_id: str):
+        """Forget a session's history."""
+        self.date_times.pop(session_id, None)
+        if self.sessions.pop(session_id, None) is not None:
+            self._removed.add(session_id)
+            self._changed.discard(session_id)
+
+    def prune_past(self, grace_hours: float, now: Optional[float] = None) -> int:
+        """
+        Drop histories of sessions that ended more than grace_hours ago.
+
+        Args:
+            grace_hours: How long to keep a session after it ends
+            now: Current epoch time (defaults to now)
+
+        Returns:
+            Number of histories removed
+        """
+        now_dt = datetime.fromtimestamp(now or time.time())
+        stale = []
+        for session_id, history in self.sessions.items():
+            date_time = self.date_time(session_id)
+            if not date_time:
+                continue
+            last = history.last()
+            seen_at = datetime.fromtimestamp(last[0]) if last else None
+            if session_has_ended(date_time, grace_hours, now_dt, seen_at):
+                stale.append(session_id)
+
+        for session_id in stale:
+            self.remove(session_id)
+        return len(stale)
+
+    def load(self) -> 'HistoryStore':
+        """Load histories from disk (missing or corrupt files give an empty store)."""
+        self.sessions, self.date_times, self._signature = self._read()
+        self._changed = set()
+        self._removed = set()
+        return self
+
+    def _read(self) -> Tuple[Dict[str, SessionHistory], Dict[str, str], Optional[filestore.Signature]]:
+        """Read the file: (histories, date/times, file signature)."""
+        sessions: Dict[str, SessionHistory] = {}
+        date_times: Dict[str, str] = {}
+        # Taken before reading: if the file is replaced in between, save() just merges once more
+        sig = filestore.signature(self.path)
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return sessions, date_times, None
+        except IOError as e:
+            logger.error("Error loading session history: %s", e)
+            return sessions, date_times, None
+
+        try:
+            magic = data[:len(MAGIC)]
+            if magic not in (MAGIC, _MAGIC_V1):
+                raise ValueError("bad header")
+
+            offset = len(MAGIC)
+            while offset < len(data):
+                key, offset = _unpack_text(data, offset)
+                if magic == MAGIC:
+                    date_times[key], offset = _unpack_text(data, offset)
+                count, = _LENGTH.unpack_from(data, offset)
+                offset += _LENGTH.size
+                end = offset + count * _SAMPLE.size
+                sessions[key] = SessionHistory.from_bytes(data[offset:end], self.capacity)
+                offset = end
+        except (ValueError, struct.error, UnicodeDecodeError) as e:
+            logger.error("Error loading session history: %s", e)
+            return {}, {}, sig
+
+        return sessions, date_times, sig
+
+    def save(self):
+        """Write histories to disk if anything changed, merging with changes made by other processes."""
+        if not self._changed and not self._removed:
+            return
+
+        try:
+            with filestore.locked(self.path):
+                if filestore.signature(self.path) != self._signature:
+                    # Someone else wrote it since we loaded: start from theirs, apply ours
+                    sessions, date_times, _ = self._read()
+                    for session_id in self._removed:
+                        sessions.pop(session_id, None)
+                        date_times.pop(session_id, None)
+                    for session_id in self._changed:
+                        if session_id in self.sessions:
+                            sessions[session_id] = self.sessions[session_id]
+                        if session_id in self.date_times:
+                            date_times[session_id] = self.date_times[session_id]
+                    self.sessions, self.date_times = sessions, date_times
+
+                parts = [MAGIC]
+                for key, history in self.sessions.items():
+                    parts.append(_pack_text(key))
+                    parts.append(_pack_text(self.date_time(key)))
+                    parts.append(_LENGTH.pack(len(history)))
+                    parts.append(history.to_bytes())
+
+                filestore.atomic_write(self.path, b''.join(parts))
+                self._signature = filestore.signature(self.path)
+                self._changed = set()
+                self._removed = set()
+        except IOError as e:
+            logger.error("Error saving session history: %s", e)
+
+
+def _pack_text(text: str) -> bytes:
+    data = text.encode()
+    return _LENGTH.pack(len(data)) + data
+
+
+def _unpack_text(data: bytes, offset: int) -> Tuple[str, int]:
+    length, = _LENGTH.unpack_from(data, offset)
+    offset += _LENGTH.size
+    return data[offset:offset + length].decode(), offset + length
+
+
+def load_history() -> HistoryStore:
+    """Load the session history store from HISTORY_FILE."""
+    return HistoryStore().load()
@@ -0,0 +1,371 @@
+"""Leases that keep checks from overlapping.
+
+EventBridge can start a check while a slow one is still running, and a
+manual test_scraper.py run can overlap the daemon. Each would scrape,
+diff and notify on its own: twice the compute and duplicate SMS. A check
+therefore takes the "check" lease before it scrapes.
+
+A lease has an owner and an expiry, so one left behind by a crashed run
+lapses after LEASE_TTL_SECONDS. The local backends (FileLease,
+SqliteLease) also free it at once if its owner was a process on this
+machine that no longer exists. DynamoDbLease shares the lease between
+machines, e.g. Lambda invocations that each have their own /tmp. Any
+other store fits behind the LeaseBackend interface (LEASE_BACKEND=module:Class).
+
+A run that can't get the lease waits up to LEASE_WAIT_SECONDS for it. If
+the holder finished meanwhile and saved a snapshot, that snapshot is used
+instead of scraping again. Otherwise the run is skipped. If the backend
+itself fails, the check runs without a lease: a duplicate notification
+is better than a missed one.
+
+Metrics: lease.acquired, lease.waits (runs that had to wait), lease.wait
+(time spent waiting), lease.skipped, lease.reused_snapshot, lease.errors.
+"""
+
+import importlib
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from contextlib import closing, contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+from hockey_agent import codec, filestore, metrics
+from hockey_agent.config import (
+    LEASE_BACKEND,
+    LEASE_FILE,
+    LEASE_DB_FILE,
+    LEASE_TABLE,
+    LEASE_TTL_SECONDS,
+    LEASE_WAIT_SECONDS,
+    LEASE_POLL_SECONDS,
+    LEASE_FRESH_SECONDS,
+)
+from hockey_agent.snapshot import SnapshotIndex, load_snapshot_index
+
+logger = logging.getLogger(__name__)
+
+CHECK_LEASE = 'check'
+
+# How a check went with the lease (the 'lease' key of its summary)
+ACQUIRED = 'acquired'  # this run held the lease
+UNLOCKED = 'unlocked'  # no lease backend, or it failed; ran anyway
+SKIPPED = 'skipped'  # another run held the lease
+REUSED = 'reused_snapshot'  # another run had just finished; used its snapshot
+
+
+class LeaseBackend:
+    """Interface for lease stores; acquire and release must be atomic across processes."""
+
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        """
+        Take a lease (or extend it, if owner already holds it).
+
+        Args:
+            name: Lease name
+            owner: Unique ID of the run taking it
+            ttl: Seconds until it expires
+
+        Returns:
+            True if owner now holds the lease, False if someone else does
+        """
+        raise NotImplementedError
+
+    def release(self, name: str, owner: str):
+        """Give a lease back (does nothing unless owner holds it)."""
+        raise NotImplementedError
+
+    def holder(self, name: str) -> Optional[str]:
+        """Get the owner of a live lease, or None if it's free."""
+        raise NotImplementedError
+
+
+def lease_owner() -> str:
+    """Make a unique owner ID for this run ("host:pid:token")."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _expired(owner: str, expires_at: float, now: float) -> bool:
+    """Whether a lease has lapsed, or its owner was a process on this machine that has exited."""
+    if expires_at <= now:
+        return True
+    host, _, rest = owner.partition(':')
+    pid = rest.partition(':')[0]
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        pass  # exists, but belongs to another user
+    return False
+
+
+class FileLease(LeaseBackend):
+    """Leases in a JSON file, updated under the file's lock (processes on one machine)."""
+
+    def __init__(self, path: str = LEASE_FILE):
+        self.path = path
+
+    def _read(self) -> Dict[str, Dict]:
+        try:
+            return dict(filestore.read_json(self.path))
+        except (FileNotFoundError, codec.JSONDecodeError):
+            return {}
+
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with filestore.locked(self.path):
+            leases = self._read()
+            current = leases.get(name)
+            if current and current['owner'] != owner and not _expired(current['owner'], current['expires_at'], now):
+                return False
+            leases[name] = {'owner': owner, 'expires_at': now + ttl}
+            filestore.write_json(self.path, leases)
+        return True
+
+    def release(self, name: str, owner: str):
+        with filestore.locked(self.path):
+            leases = self._read()
+            if leases.get(name, {}).get('owner') == owner:
+                del leases[name]
+                filestore.write_json(self.path, leases)
+
+    def holder(self, name: str) -> Optional[str]:
+        current = self._read().get(name)
+        if current and not _expired(current['owner'], current['expires_at'], time.time()):
+            return current['owner']
+        return None
+
+
+class SqliteLease(LeaseBackend):
+    """Leases in a SQLite table, updated in IMMEDIATE transactions (processes on one machine)."""
+
+    def __init__(self, path: str = LEASE_DB_FILE):
+        self.path = path
+        with closing(self._connect()) as db:
+            db.execute('CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)')
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with closing(self._connect()) as db:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                row = db.execute('SELECT owner, expires_at FROM leases WHERE name = ?', (name,)).fetchone()
+                if row and row[0] != owner and not _expired(row[0], row[1], now):
+                    db.execute('ROLLBACK')
+                    return False
+                db.execute('INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)', (name, owner, now + ttl))
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+        return True
+
+    def release(self, name: str, owner: str):
+        with closing(self._connect()) as db:
+            db.execute('DELETE FROM leases WHERE name = ? AND owner = ?', (name, owner))
+
+    def holder(self, name: str) -> Optional[str]:
+        with closing(self._connect()) as db:
+            row = db.execute('SELECT owner, expires_at FROM leases WHERE name = ?', (name,)).fetchone()
+        if row and not _expired(row[0], row[1], time.time()):
+            return row[0]
+        return None
+
+
+class DynamoDbLease(LeaseBackend):
+    """
+    Leases in a DynamoDB table, taken with conditional writes (shared between machines).
+
+    The table needs a string partition key "name". Enabling DynamoDB TTL on
+    "expires_at" clears out old leases, but isn't required.
+    """
+
+    def __init__(self, table: str = LEASE_TABLE):
+        import boto3
+
+        self.table = table
+        self.client = boto3.client('dynamodb')
+
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        from botocore.exceptions import ClientError
+
+        now = time.time()
+        try:
+            self.client.put_item(
+                TableName=self.table,
+                Item={'name': {'S': name}, 'owner': {'S': owner}, 'expires_at': {'N': str(int(now + ttl))}},
+                ConditionExpression='attribute_not_exists(#name) OR expires_at <= :now OR #owner = :owner',
+                ExpressionAttributeNames={'#name': 'name', '#owner': 'owner'},
+                ExpressionAttributeValues={':now': {'N': str(int(now))}, ':owner': {'S': owner}},
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+        return True
+
+    def release(self, name: str, owner: str):
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.delete_item(
+                TableName=self.table,
+                Key={'name': {'S': name}},
+                ConditionExpression='#owner = :owner',
+                ExpressionAttributeNames={'#owner': 'owner'},
+                ExpressionAttributeValues={':owner': {'S': owner}},
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+    def holder(self, name: str) -> Optional[str]:
+        item = self.client.get_item(TableName=self.table, Key={'name': {'S': name}}, ConsistentRead=True).get('Item')
+        if item and float(item['expires_at']['N']) > time.time():
+            return item['owner']['S']
+        return None
+
+
+_backend: Optional[LeaseBackend] = None
+
+
+def get_lease_backend() -> Optional[LeaseBackend]:
+    """
+    Get the shared lease backend chosen by LEASE_BACKEND.
+
+    Returns:
+        The backend, or None if leases are turned off
+
+    Raises:
+        ValueError: If LEASE_BACKEND isn't a known backend or module:Class
+    """
+    global _backend
+    if _backend is not None:
+        return _backend
+
+    if LEASE_BACKEND in ('', 'none'):
+        return None
+    if LEASE_BACKEND == 'file':
+        _backend = FileLease()
+    elif LEASE_BACKEND == 'sqlite':
+        _backend = SqliteLease()
+    elif LEASE_BACKEND == 'dynamodb':
+        _backend = DynamoDbLease()
+    elif ':' in LEASE_BACKEND:
+        module, _, name = LEASE_BACKEND.partition(':')
+        _backend = getattr(importlib.import_module(module), name)()
+    else:
+        raise ValueError(f"Unknown LEASE_BACKEND: {LEASE_BACKEND}")
+    return _backend
+
+
+def _fresh_snapshot(started: float) -> Optional[SnapshotIndex]:
+    """The latest snapshot if it was taken since started (or within LEASE_FRESH_SECONDS), else None."""
+    index = load_snapshot_index()
+    if index is None:
+        return None
+    if index.taken_at >= started or (LEASE_FRESH_SECONDS > 0 and index.age_seconds <= LEASE_FRESH_SECONDS):
+        return index
+    return None
+
+
+@contextmanager
+def check_lease(backend: Optional[LeaseBackend] = None,
+                name: str = CHECK_LEASE) -> Iterator[Tuple[str, Optional[SnapshotIndex]]]:
+    """
+    Hold the check lease for the duration of a check.
+
+    Usage:
+        with check_lease() as (lease, snapshot):
+            if lease in (SKIPPED, REUSED):
+                return lease_summary(lease, snapshot)
+            ...scrape, diff and notify...
+
+    Args:
+        backend: Lease backend (defaults to get_lease_backend())
+        name: Lease name
+
+    Yields:
+        (ACQUIRED, None) or (UNLOCKED, None) to go ahead with the check,
+        (SKIPPED, None) if another run holds the lease, or (REUSED, index)
+        with the snapshot another run has just saved
+    """
+    started = time.time()
+    owner = lease_owner()
+    acquired = False
+    try:
+        backend = backend or get_lease_backend()
+        if backend is not None:
+            acquired = backend.acquire(name, owner, LEASE_TTL_SECONDS)
+            if not acquired and LEASE_WAIT_SECONDS > 0:
+                metrics.increment('lease.waits')
+                logger.info("Check lease held by %s; waiting up to %.0fs", backend.holder(name), LEASE_WAIT_SECONDS)
+                deadline = started + LEASE_WAIT_SECONDS
+                while not acquired and time.time() < deadline:
+                    time.sleep(max(0.0, min(LEASE_POLL_SECONDS, deadline - time.time())))
+                    acquired = backend.acquire(name, owner, LEASE_TTL_SECONDS)
+                metrics.observe('lease.wait', time.time() - started)
+    except Exception as e:
+        logger.warning("Lease backend failed (%s); checking without a lease", e)
+        metrics.increment('lease.errors')
+        backend = None
+
+    if backend is None:
+        yield UNLOCKED, None
+        return
+
+    if not acquired:
+        metrics.increment('lease.skipped')
+        logger.info("Another check is running; skipping this one")
+        yield SKIPPED, None
+        return
+
+    try:
+        snapshot = _fresh_snapshot(started)
+        if snapshot is not None:
+            metrics.increment('lease.reused_snapshot')
+            logger.info("Another check just finished; using its snapshot (%d session(s), %.0fs old)",
+                        snapshot.size, snapshot.age_seconds)
+            yield REUSED, snapshot
+        else:
+            metrics.increment('lease.acquired')
+            yield ACQUIRED, None
+    finally:
+        try:
+            backend.release(name, owner)
+        except Exception as e:
+            logger.warning("Could not release the check lease (it expires in %.0fs): %s", LEASE_TTL_SECONDS, e)
+            metrics.increment('lease.errors')
+
+
+def lease_summary(lease: str, snapshot: Optional[SnapshotIndex]) -> Dict:
+    """
+    Build a check summary for a run that didn't scrape.
+
+    Args:
+        lease: SKIPPED or REUSED
+        snapshot: The reused snapshot (for REUSED)
+
+    Returns:
+        Summary with the same keys as check_all_sites(), plus 'lease' (and
+        'snapshot_age_seconds' when a snapshot was reused)
+    """
+    summary = {
+        'sessions_found': snapshot.size if snapshot is not None else 0,
+        'newly_available': 0,
+        'new': 0,
+        'suppressed': 0,
+        'degraded': False,
+        'blown_phases': [],
+        'lease': lease,
+    }
+    if snapshot is not None:
+        summary['snapshot_age_seconds'] = round(snapshot.age_seconds, 1)
+    return summary
@@ -0,0 +1,109 @@
+"""Non-blocking logging setup.
+
+Log calls only put records on an in-memory queue (QueueHandler); a
+background QueueListener thread formats them and does the I/O, so the
+scrape and check loops never wait on stdout/stderr or CloudWatch.
+
+Call setup_logging() once at startup. Messages use %-style arguments
+(logger.debug("Found %d", n)), and both the message and any exception
+traceback are only formatted on the listener thread. The args are
+formatted after the call returns, so pass primitives (strings, numbers)
+rather than objects that may still change. With LOG_FORMAT=json each record is written as one JSON object
+per line, which CloudWatch Logs Insights can query by field.
+"""
+
+import atexit
+import logging
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+from hockey_agent import codec
+from hockey_agent.config import LOG_LEVEL, LOG_FORMAT
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Standard LogRecord attributes; anything else was passed via extra= and is emitted as a field
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as a single-line JSON object."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return codec.dumps_str(entry)
+
+
+class _LazyQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler formats the message (and traceback) before queueing;
+    this one queues the record as it is, so the message and traceback are
+    both formatted off the hot path.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT):
+    """
+    Route all logging through a queue to a background writer thread.
+
+    Replaces any handlers already on the root logger (e.g. Lambda's), so
+    calling it again just reconfigures.
+
+    Args:
+        level: Root log level name (e.g. 'INFO', 'DEBUG')
+        fmt: 'json' for one JSON object per line, anything else for plain text
+    """
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_LazyQueueHandler(records))
+    root.setLevel(level.upper())
+
+    _listener = QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+
+
+def flush_logs():
+    """
+    Wait until every queued record has been written.
+
+    Call before a Lambda invocation returns; otherwise records still on the
+    queue when the environment is frozen only appear on the next invocation.
+    """
+    if _listener is not None:
+        # stop() drains the queue and joins the thread
+        _listener.stop()
+        _listener.start()
+
+
+@atexit.register
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
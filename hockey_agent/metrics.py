@@ -0,0 +1,70 @@
+"""Lightweight in-process metrics (counters, gauges and timings)."""
+
+import threading
+from typing import Dict
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = {}
+_timings: Dict[str, Dict[str, float]] = {}
+_gauges: Dict[str, float] = {}
+
+
+def increment(name: str, value: float = 1):
+    """
+    Increment a counter.
+
+    Args:
+        name: Counter name (e.g., 'sms.sent')
+        value: Amount to add
+    """
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def observe(name: str, seconds: float):
+    """
+    Record a timing.
+
+    Args:
+        name: Timing name (e.g., 'sms.latency')
+        seconds: Observed duration in seconds
+    """
+    with _lock:
+        timing = _timings.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0})
+        timing['count'] += 1
+        timing['total'] += seconds
+        timing['max'] = max(timing['max'], seconds)
+
+
+def gauge(name: str, value: float):
+    """
+    Set a gauge to its latest value.
+
+    Args:
+        name: Gauge name (e.g., 'browser.peak_rss_mb')
+        value: Current value
+    """
+    with _lock:
+        _gauges[name] = value
+
+
+def snapshot() -> Dict[str, Dict]:
+    """
+    Get a copy of all metrics.
+
+    Returns:
+        Dictionary with 'counters', 'gauges' and 'timings' (count, total, max, avg per timing)
+    """
+    with _lock:
+        timings = {}
+        for name, timing in _timings.items():
+            timings[name] = dict(timing, avg=timing['total'] / timing['count'] if timing['count'] else 0.0)
+        return {'counters': dict(_counters), 'gauges': dict(_gauges), 'timings': timings}
+
+
+def reset():
+    """Clear all metrics."""
+    with _lock:
+        _counters.clear()
+        _timings.clear()
+        _gauges.clear()
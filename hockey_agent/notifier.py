@@ -1,9 +1,28 @@
 """Notification system for new hockey sessions."""
 
 import logging
-from typing import List, Dict
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from email.message import EmailMessage
+from typing import Callable, List, Dict, Optional, Tuple
+from hockey_agent import codec, metrics
 from hockey_agent.config import (
-    NOTIFICATION_METHOD,
+    NOTIFICATION_METHODS,
+    NOTIFICATION_EMAIL,
+    TELEGRAM_BOT_TOKEN,
+    TELEGRAM_CHAT_ID,
+    TELEGRAM_API_BASE_URL,
+    EMAIL_PROVIDER,
+    EMAIL_FROM,
+    SMTP_HOST,
+    SMTP_PORT,
+    SMTP_USERNAME,
+    SMTP_PASSWORD,
+    SMTP_STARTTLS,
+    SMTP_SSL,
+    SENDGRID_API_KEY,
+    SENDGRID_API_BASE_URL,
     TWILIO_ACCOUNT_SID,
     TWILIO_AUTH_TOKEN,
     TWILIO_API_KEY,
@@ -11,141 +30,350 @@ from hockey_agent.config import (
     TWILIO_FROM_PHONE,
     TWILIO_TO_PHONE
 )
+from hockey_agent.columnar import session_id
+from hockey_agent.pools import http_pool, smtp_pool
+from hockey_agent.sms import describe, pack_messages
 
 logger = logging.getLogger(__name__)
 
 
-def send_notification(sessions: List[Dict[str, str]], newly_available_count: int = 0):
+def send_notification(sessions: List[Dict[str, str]], newly_available_count: int = 0,
+                      recipient: Optional[str] = None, cancel: Optional[threading.Event] = None):
     """
     Send notification about new hockey sessions.
 
+    With several NOTIFICATION_METHODs, every channel sends at the same time.
+
     Args:
         sessions: List of session dictionaries
         newly_available_count: Number of sessions that were sold out but now have spots
+        recipient: Phone number to send to (defaults to TWILIO_TO_PHONE)
+        cancel: Event that stops further sends and stops waiting for ones in flight
+            (e.g. the watchdog's notify deadline)
     """
-    if NOTIFICATION_METHOD == 'console':
-        send_console_notification(sessions, newly_available_count)
-    elif NOTIFICATION_METHOD == 'email':
-        send_email_notification(sessions, newly_available_count)
-    elif NOTIFICATION_METHOD == 'telegram':
-        send_telegram_notification(sessions, newly_available_count)
-    elif NOTIFICATION_METHOD == 'sms':
-        send_sms_notification(sessions, newly_available_count)
+    _run_all([lambda m=method: _send_via(m, sessions, newly_available_count, recipient, cancel)
+              for method in _known_methods()], cancel)
+
+
+def _known_methods() -> List[str]:
+    """NOTIFICATION_METHODS that have a channel (warning about the rest)."""
+    methods = []
+    for method in NOTIFICATION_METHODS:
+        if method in _CHANNELS:
+            methods.append(method)
+        else:
+            logger.warning("Unknown notification method: %s", method)
+    return methods
+
+
+def _run_all(sends: List[Callable[[], object]], cancel: Optional[threading.Event] = None):
+    """
+    Run sends in parallel (or inline when there is only one).
+
+    Once cancel is set, stops waiting: sends still in flight finish in the
+    background, bounded by their connections' POOL_TIMEOUT_SECONDS.
+    """
+    if len(sends) == 1:
+        sends[0]()
+        return
+    if not sends:
+        return
+
+    pool = ThreadPoolExecutor(max_workers=len(sends), thread_name_prefix='notify')
+    try:
+        pending = {pool.submit(send) for send in sends}
+        while pending and not (cancel and cancel.is_set()):
+            done, pending = wait(pending, timeout=0.1 if cancel else None)
+            for future in done:
+                future.result()
+    finally:
+        pool.shutdown(wait=not (cancel and cancel.is_set()), cancel_futures=True)
+
+
+def _send_via(method: str, sessions: List[Dict[str, str]], newly_available_count: int,
+              recipient: Optional[str], cancel: Optional[threading.Event] = None) -> bool:
+    """Send through one channel, recording notify.<method>.latency and sent/failed counts."""
+    start = time.perf_counter()
+    if method == 'sms':
+        ok = send_sms_notification(sessions, newly_available_count, recipient, cancel)
     else:
-        logger.warning(f"Unknown notification method: {NOTIFICATION_METHOD}")
+        ok = _CHANNELS[method](sessions, newly_available_count)
+    metrics.observe(f'notify.{method}.latency', time.perf_counter() - start)
+    metrics.increment(f'notify.{method}.sent' if ok else f'notify.{method}.failed')
+    return ok
 
 
-def send_console_notification(sessions: List[Dict[str, str]], newly_available_count: int = 0):
-    """Print notification to console."""
-    print("\n" + "=" * 70)
-    print("HOCKEY SESSIONS AVAILABLE!")
-    print("=" * 70)
+def format_console_message(sessions: List[Dict[str, str]], newly_available_count: int = 0) -> str:
+    """
+    Format the console notification text.
+
+    Args:
+        sessions: List of session dictionaries (newly available ones first)
+        newly_available_count: Number of sessions that were sold out but now have spots
+
+    Returns:
+        Multi-line notification text
+    """
+    lines = ["", "=" * 70, "HOCKEY SESSIONS AVAILABLE!", "=" * 70]
 
     if newly_available_count > 0:
-        print(f"\nSPOTS OPENED UP! {newly_available_count} previously sold-out session(s) now available!")
+        lines.append(f"\nSPOTS OPENED UP! {newly_available_count} previously sold-out session(s) now available!")
 
     newly_available = sessions[:newly_available_count]
     new_sessions = sessions[newly_available_count:]
 
-    if newly_available:
-        print("\n--- NEWLY AVAILABLE (were sold out) ---")
-        for i, session in enumerate(newly_available, 1):
-            print(f"\n{i}. {session.get('session_type', 'Unknown Type')}")
-            print(f"   When: {session.get('date_time', 'Unknown')}")
-            print(f"   Site: {session.get('site', 'Unknown')}")
-            print(f"   URL: {session.get('url', '')}")
-
-    if new_sessions:
-        print("\n--- NEW SESSIONS ---")
-        for i, session in enumerate(new_sessions, 1):
-            print(f"\n{i}. {session.get('session_type', 'Unknown Type')}")
-            print(f"   When: {session.get('date_time', 'Unknown')}")
-            print(f"   Site: {session.get('site', 'Unknown')}")
-            print(f"   URL: {session.get('url', '')}")
-
-    print("\n" + "=" * 70 + "\n")
-
-
-def send_email_notification(sessions: List[Dict[str, str]], newly_available_count: int = 0):
-    """Send email notification (requires email service setup)."""
-    # TODO: Implement email notification
-    # You can use SendGrid, Gmail SMTP, etc.
-    logger.warning("Email notification not yet implemented")
-    send_console_notification(sessions, newly_available_count)  # Fallback to console
-
-
-def send_telegram_notification(sessions: List[Dict[str, str]], newly_available_count: int = 0):
-    """Send Telegram notification (requires bot setup)."""
-    # TODO: Implement Telegram notification
-    # from telegram import Bot
-    # bot = Bot(token=TELEGRAM_BOT_TOKEN)
-    # message = format_message(sessions)
-    # bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=message)
-    logger.warning("Telegram notification not yet implemented")
-    send_console_notification(sessions, newly_available_count)  # Fallback to console
-
-
-def send_sms_notification(sessions: List[Dict[str, str]], newly_available_count: int = 0):
-    """Send SMS notification via Twilio."""
+    for heading, group in (("NEWLY AVAILABLE (were sold out)", newly_available), ("NEW SESSIONS", new_sessions)):
+        if not group:
+            continue
+        lines.append(f"\n--- {heading} ---")
+        for i, session in enumerate(group, 1):
+            lines.append(f"\n{i}. {session.get('session_type', 'Unknown Type')}")
+            lines.append(f"   When: {session.get('date_time', 'Unknown')}")
+            lines.append(f"   Site: {session.get('site', 'Unknown')}")
+            lines.append(f"   URL: {session.get('url', '')}")
+
+    lines.append("\n" + "=" * 70)
+    return "\n".join(lines)
+
+
+def send_console_notification(sessions: List[Dict[str, str]], newly_available_count: int = 0) -> bool:
+    """Write the notification to the log (as one record, so it isn't interleaved)."""
+    logger.info(format_console_message(sessions, newly_available_count))
+    return True
+
+
+def format_subject(sessions: List[Dict[str, str]], newly_available_count: int = 0) -> str:
+    """One-line summary, e.g. "Hockey: 2 spots opened, 1 new session"."""
+    new_count = len(sessions) - newly_available_count
+    counts = []
+    if newly_available_count:
+        counts.append(f"{newly_available_count} spot{'s' if newly_available_count != 1 else ''} opened")
+    if new_count:
+        counts.append(f"{new_count} new session{'s' if new_count != 1 else ''}")
+    return "Hockey: " + ", ".join(counts)
+
+
+def send_email_notification(sessions: List[Dict[str, str]], newly_available_count: int = 0) -> bool:
+    """Send email notification through SMTP or SendGrid (EMAIL_PROVIDER) to NOTIFICATION_EMAIL."""
+    sender = EMAIL_FROM or SMTP_USERNAME or NOTIFICATION_EMAIL
+    subject = format_subject(sessions, newly_available_count)
+    body = format_console_message(sessions, newly_available_count)
+
     try:
-        from twilio.rest import Client
+        if not NOTIFICATION_EMAIL:
+            raise ValueError("NOTIFICATION_EMAIL is not set")
 
-        # Validate Twilio credentials - support both API Keys and Auth Token
-        if not TWILIO_ACCOUNT_SID or not TWILIO_FROM_PHONE or not TWILIO_TO_PHONE:
-            logger.error("Twilio credentials not configured. Please set TWILIO_ACCOUNT_SID, TWILIO_FROM_PHONE, and TWILIO_TO_PHONE in .env")
-            send_console_notification(sessions, newly_available_count)  # Fallback
-            return
-
-        # Create Twilio client - prefer API Key if available, fallback to Auth Token
-        if TWILIO_API_KEY and TWILIO_API_SECRET:
-            # Using API Key (recommended)
-            client = Client(TWILIO_API_KEY, TWILIO_API_SECRET, TWILIO_ACCOUNT_SID)
-            logger.info("Using Twilio API Key for authentication")
-        elif TWILIO_AUTH_TOKEN:
-            # Using Auth Token (legacy)
-            client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-            logger.info("Using Twilio Auth Token for authentication")
+        if EMAIL_PROVIDER == 'sendgrid':
+            if not SENDGRID_API_KEY:
+                raise ValueError("SENDGRID_API_KEY is not set")
+            payload = codec.dumps({
+                'personalizations': [{'to': [{'email': NOTIFICATION_EMAIL}]}],
+                'from': {'email': sender},
+                'subject': subject,
+                'content': [{'type': 'text/plain', 'value': body}],
+            })
+            status, data = http_pool(SENDGRID_API_BASE_URL, 'sendgrid').request('POST', '/v3/mail/send', body=payload, headers={
+                'Authorization': f"Bearer {SENDGRID_API_KEY}",
+                'Content-Type': 'application/json',
+            })
+            if status >= 400:
+                raise RuntimeError(f"SendGrid returned {status}: {data[:200]!r}")
         else:
-            logger.error("No Twilio authentication credentials found. Please set either TWILIO_API_KEY+TWILIO_API_SECRET or TWILIO_AUTH_TOKEN in .env")
-            send_console_notification(sessions, newly_available_count)  # Fallback
-            return
+            if not SMTP_HOST:
+                raise ValueError("SMTP_HOST is not set")
+            message = EmailMessage()
+            message['From'] = sender
+            message['To'] = NOTIFICATION_EMAIL
+            message['Subject'] = subject
+            message.set_content(body)
+            smtp_pool(SMTP_HOST, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, SMTP_STARTTLS, SMTP_SSL).send(message)
 
-        # Build message text
-        newly_available = sessions[:newly_available_count]
-        new_sessions = sessions[newly_available_count:]
+        logger.info("Email sent to %s (%s)", NOTIFICATION_EMAIL, EMAIL_PROVIDER)
+        return True
+
+    except Exception as e:
+        logger.error("Error sending email: %s", e)
+        send_console_notification(sessions, newly_available_count)  # Fallback
+        return False
+
+
+# Telegram rejects messages longer than this
+TELEGRAM_MAX_LENGTH = 4096
 
-        message_parts = ["🏒 Hockey Sessions Available!"]
 
-        if newly_available:
-            message_parts.append(f"\n🔥 {len(newly_available)} SPOTS OPENED UP:")
-            for session in newly_available:
-                message_parts.append(f"• {session.get('session_type')}")
-                message_parts.append(f"  {session.get('date_time')}")
+def _split_text(text: str, limit: int) -> List[str]:
+    """Split text into chunks of at most limit characters, at line breaks where possible."""
+    chunks = []
+    current = ''
+    for line in text.split('\n'):
+        while len(line) > limit:
+            if current:
+                chunks.append(current)
+                current = ''
+            chunks.append(line[:limit])
+            line = line[limit:]
+        candidate = f"{current}\n{line}" if current else line
+        if len(candidate) > limit:
+            chunks.append(current)
+            candidate = line
+        current = candidate
+    if current.strip():
+        chunks.append(current)
+    return chunks
 
-        if new_sessions:
-            message_parts.append(f"\n✨ {len(new_sessions)} NEW SESSION(S):")
-            for session in new_sessions:
-                message_parts.append(f"• {session.get('session_type')}")
-                message_parts.append(f"  {session.get('date_time')}")
 
-        message_parts.append(f"\n🔗 {sessions[0].get('url', '')}")
+def send_telegram_notification(sessions: List[Dict[str, str]], newly_available_count: int = 0) -> bool:
+    """Send Telegram notification through the Bot API (sendMessage) to TELEGRAM_CHAT_ID."""
+    try:
+        if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
+            raise ValueError("TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID must be set")
 
-        message_text = "\n".join(message_parts)
+        pool = http_pool(TELEGRAM_API_BASE_URL, 'telegram')
+        text = format_console_message(sessions, newly_available_count).strip()
+        for chunk in _split_text(text, TELEGRAM_MAX_LENGTH):
+            payload = codec.dumps({'chat_id': TELEGRAM_CHAT_ID, 'text': chunk, 'disable_web_page_preview': True})
+            status, data = pool.request('POST', f"/bot{TELEGRAM_BOT_TOKEN}/sendMessage", body=payload,
+                                        headers={'Content-Type': 'application/json'})
+            if status >= 400:
+                raise RuntimeError(f"Telegram returned {status}: {data[:200]!r}")
 
-        # Send SMS
-        message = client.messages.create(
-            body=message_text,
-            from_=TWILIO_FROM_PHONE,
-            to=TWILIO_TO_PHONE
-        )
+        logger.info("Telegram message sent to chat %s", TELEGRAM_CHAT_ID)
+        return True
 
-        logger.info(f"SMS sent successfully! Message SID: {message.sid}")
-        print(f"✅ SMS notification sent to {TWILIO_TO_PHONE}")
+    except Exception as e:
+        logger.error("Error sending Telegram message: %s", e)
+        send_console_notification(sessions, newly_available_count)  # Fallback
+        return False
+
+
+def format_sms_messages(sessions: List[Dict[str, str]], newly_available_count: int = 0) -> List[str]:
+    """
+    Build the SMS texts for a list of sessions (compact, split at SMS_MAX_SEGMENTS).
+
+    Args:
+        sessions: List of session dictionaries (newly available ones first)
+        newly_available_count: Number of sessions that were sold out but now have spots
+
+    Returns:
+        Message bodies
+    """
+    return pack_messages(sessions, newly_available_count)
+
+
+def send_bulk_notification(batches: List[Tuple[Optional[str], List[Dict[str, str]], int]],
+                           cancel: Optional[threading.Event] = None):
+    """
+    Send notifications to many recipients at once.
+
+    With SMS, each subscriber's messages go out concurrently through the
+    rate-limited dispatcher. The other channels have a single destination
+    (NOTIFICATION_EMAIL, TELEGRAM_CHAT_ID, the console), so they get one
+    notification covering every batch's sessions. All channels send in parallel.
+
+    Args:
+        batches: List of (recipient, sessions, newly_available_count) tuples
+        cancel: Event that stops further sends (see send_notification)
+    """
+    sends = []
+    methods = _known_methods()
+
+    shared = [m for m in methods if m != 'sms']
+    if shared:
+        sessions, newly_available_count = merge_batches(batches)
+        sends.extend(lambda m=method: _send_via(m, sessions, newly_available_count, None, cancel) for method in shared)
+
+    if 'sms' in methods:
+        sends.append(lambda: _dispatch_sms(batches, cancel))
+
+    _run_all(sends, cancel)
+
+
+def merge_batches(batches: List[Tuple[Optional[str], List[Dict[str, str]], int]]) -> Tuple[List[Dict[str, str]], int]:
+    """
+    Combine subscriber batches into one session list, each session once.
+
+    Args:
+        batches: List of (recipient, sessions, newly_available_count) tuples
+
+    Returns:
+        (sessions with the newly available ones first, number newly available)
+    """
+    newly_available: Dict[str, Dict[str, str]] = {}
+    new: Dict[str, Dict[str, str]] = {}
+    for _, sessions, newly_available_count in batches:
+        for session in sessions[:newly_available_count]:
+            newly_available.setdefault(session_id(session), session)
+        for session in sessions[newly_available_count:]:
+            new.setdefault(session_id(session), session)
+    return list(newly_available.values()) + list(new.values()), len(newly_available)
+
+
+def _dispatch_sms(batches: List[Tuple[Optional[str], List[Dict[str, str]], int]],
+                  cancel: Optional[threading.Event] = None):
+    """Send each subscriber's SMS through the shared dispatcher."""
+    if not TWILIO_ACCOUNT_SID or not TWILIO_FROM_PHONE:
+        logger.error("Twilio credentials not configured. Please set TWILIO_ACCOUNT_SID and TWILIO_FROM_PHONE in .env")
+        return
+
+    from hockey_agent.dispatcher import get_dispatcher
+
+    messages = []
+    for recipient, sessions, newly_available_count in batches:
+        if not recipient:
+            logger.warning("Skipping subscriber with no phone number")
+            continue
+        messages.extend((recipient, body) for body in format_sms_messages(sessions, newly_available_count))
+
+    if messages:
+        get_dispatcher().dispatch(messages, cancel)
+
+
+def send_sms_notification(sessions: List[Dict[str, str]], newly_available_count: int = 0,
+                          recipient: Optional[str] = None, cancel: Optional[threading.Event] = None) -> bool:
+    """Send SMS notification via Twilio (over the shared keep-alive connection pool), stopping once cancel is set."""
+    to_phone = recipient or TWILIO_TO_PHONE
+
+    try:
+        from hockey_agent.dispatcher import get_twilio_sender
+
+        # Validate Twilio credentials - support both API Keys and Auth Token
+        if not TWILIO_ACCOUNT_SID or not TWILIO_FROM_PHONE or not to_phone:
+            logger.error("Twilio credentials not configured. Please set TWILIO_ACCOUNT_SID, TWILIO_FROM_PHONE, and TWILIO_TO_PHONE in .env")
+            send_console_notification(sessions, newly_available_count)  # Fallback
+            return False
+
+        if not (TWILIO_API_KEY and TWILIO_API_SECRET) and not TWILIO_AUTH_TOKEN:
+            logger.error("No Twilio authentication credentials found. Please set either TWILIO_API_KEY+TWILIO_API_SECRET or TWILIO_AUTH_TOKEN in .env")
+            send_console_notification(sessions, newly_available_count)  # Fallback
+            return False
+
+        # Send SMS (one or more messages, each within SMS_MAX_SEGMENTS)
+        sender = get_twilio_sender()
+        for body in format_sms_messages(sessions, newly_available_count):
+            if cancel is not None and cancel.is_set():
+                logger.error("Notify deadline reached; remaining SMS to %s not sent", to_phone)
+                return False
+            body_encoding, segments = describe(body)
+            sid = sender(to_phone, body)
+            metrics.increment('sms.sent')
+            metrics.increment('sms.segments', segments)
+            logger.info("SMS sent to %s (%d segment(s), %s, message SID: %s)",
+                        to_phone, segments, body_encoding, sid)
 
         # Also print to console for debugging
         send_console_notification(sessions, newly_available_count)
+        return True
 
     except Exception as e:
-        logger.error(f"Error sending SMS: {e}")
-        print(f"❌ Failed to send SMS: {e}")
+        logger.error("Error sending SMS: %s", e)
         send_console_notification(sessions, newly_available_count)  # Fallback
+        return False
+
+
+# Notification methods and their senders (sms also takes a recipient)
+_CHANNELS: Dict[str, Callable[..., bool]] = {
+    'console': send_console_notification,
+    'email': send_email_notification,
+    'telegram': send_telegram_notification,
+    'sms': send_sms_notification,
+}
@@ -0,0 +1,334 @@
+"""Shared keep-alive HTTP and SMTP connection pools for the notifiers.
+
+Opening a connection costs a TCP handshake, usually a TLS handshake, and
+for SMTP an EHLO/STARTTLS/AUTH exchange, which can add up to more than
+the request itself. Each provider (Twilio, Telegram, SendGrid, your SMTP
+server) gets one pool shared by every sender and thread. Connections are
+checked out for a request and handed back afterwards, and idle ones are
+kept for POOL_IDLE_SECONDS.
+
+A reused connection may have been closed by the server while it sat idle.
+An idle HTTP socket that has become readable (the server's FIN) is dropped
+before use. A request that still fails on a reused connection is retried
+once on a new one, but only if the server can't have acted on it: the
+send itself failed, the server hung up without a byte of response, or the
+method is idempotent. A reused SMTP session is checked with NOOP first and
+replaced if it has gone; the message itself is never retried, since a
+session that dies mid-message may already have delivered it.
+
+Every pool counts reuses (hits) and new connections (misses) and times
+each request, in the metrics under pool.<name>.*. Base URLs and SMTP
+hosts can point at local stand-in servers (see bench_channels.py).
+"""
+
+import http.client
+import logging
+import select
+import smtplib
+import ssl
+import threading
+import time
+from email.message import EmailMessage
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from hockey_agent import metrics
+from hockey_agent.config import POOL_MAX_IDLE, POOL_IDLE_SECONDS, POOL_TIMEOUT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the server dropped the connection (e.g. a reused one it closed while idle)
+_STALE_HTTP_ERRORS = (http.client.HTTPException, ConnectionError)
+_STALE_SMTP_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError)
+
+# Safe to send twice (RFC 9110), so any failure on a reused connection may be retried
+_IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'TRACE', 'PUT', 'DELETE'})
+
+
+def _dropped(sock) -> bool:
+    """True if an idle socket can't be used: the server has closed it (or sent something unasked)."""
+    if sock is None:
+        return True
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
+
+
+class _Pool:
+    """Idle connection bookkeeping and hit/miss accounting shared by both pool types."""
+
+    def __init__(self, name: str, max_idle: int, idle_seconds: float):
+        self.name = name
+        self.max_idle = max(0, max_idle)
+        self.idle_seconds = idle_seconds
+        self.hits = 0
+        self.misses = 0
+        self._idle: List[Tuple[object, float]] = []  # (connection, returned at), most recent last
+        self._lock = threading.Lock()
+
+    def _checkout(self) -> Tuple[Optional[object], bool]:
+        """Take the most recently used live connection, or (None, False) if a new one is needed."""
+        now = time.monotonic()
+        expired = []
+        conn = None
+        with self._lock:
+            while self._idle:
+                candidate, returned_at = self._idle.pop()
+                if now - returned_at <= self.idle_seconds:
+                    conn = candidate
+                    break
+                expired.append(candidate)
+            if conn is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+            hit_rate = self.hits / (self.hits + self.misses)
+
+        for candidate in expired:
+            self._close(candidate)
+        metrics.increment(f'pool.{self.name}.hits' if conn is not None else f'pool.{self.name}.misses')
+        metrics.gauge(f'pool.{self.name}.hit_rate', hit_rate)
+        return conn, conn is not None
+
+    def _checkin(self, conn):
+        """Hand a healthy connection back (closing it if the pool is full)."""
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append((conn, time.monotonic()))
+                return
+        self._close(conn)
+
+    def _close(self, conn):
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        """Get hits, misses, hit_rate and idle connection count."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'idle': len(self._idle),
+            }
+
+    def close(self):
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+
+class HttpPool(_Pool):
+    """Keep-alive HTTP(S) connections to one host."""
+
+    def __init__(self, base_url: str, name: str, max_idle: int = POOL_MAX_IDLE,
+                 idle_seconds: float = POOL_IDLE_SECONDS, timeout: float = POOL_TIMEOUT_SECONDS):
+        """
+        Create a pool.
+
+        Args:
+            base_url: Scheme and host (e.g. https://api.telegram.org); a path is ignored
+            name: Name used in metrics
+            max_idle: Most idle connections kept
+            idle_seconds: How long an idle connection is trusted (keep under the server's keep-alive timeout)
+            timeout: Socket timeout per request
+        """
+        super().__init__(name, max_idle, idle_seconds)
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.netloc
+        self.timeout = timeout
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self.scheme == 'https':
+            return http.client.HTTPSConnection(self.host, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, timeout=self.timeout)
+
+    def _close(self, conn):
+        conn.close()
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+        """
+        Send a request on a pooled connection.
+
+        Args:
+            method: HTTP method
+            path: Request path (with query string)
+            body: Request body (bytes, so headers and body go out together)
+            headers: Request headers
+
+        Returns:
+            (status, response body)
+
+        Raises:
+            http.client.HTTPException, OSError: If the request fails
+        """
+        start = time.perf_counter()
+        for attempt in range(2):
+            conn, reused = self._checkout()
+            if conn is not None and _dropped(conn.sock):
+                conn.close()
+                conn, reused = None, False
+            if conn is None:
+                conn = self._connect()
+            sent = False
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                sent = True
+                response = conn.getresponse()
+                data = response.read()
+            except _STALE_HTTP_ERRORS as e:
+                conn.close()
+                # Only a reused connection gets a second chance, and only if the request can't have been acted on
+                unseen = not sent or isinstance(e, http.client.RemoteDisconnected)
+                if reused and attempt == 0 and (unseen or method.upper() in _IDEMPOTENT_METHODS):
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+
+            if response.will_close:
+                conn.close()
+            else:
+                self._checkin(conn)
+            metrics.observe(f'pool.{self.name}.latency', time.perf_counter() - start)
+            return response.status, data
+
+
+class SmtpPool(_Pool):
+    """Logged-in SMTP sessions to one server."""
+
+    def __init__(self, host: str, port: int, username: str = '', password: str = '', starttls: bool = True,
+                 use_ssl: bool = False, name: str = 'smtp', max_idle: int = POOL_MAX_IDLE,
+                 idle_seconds: float = POOL_IDLE_SECONDS, timeout: float = POOL_TIMEOUT_SECONDS):
+        """
+        Create a pool.
+
+        Args:
+            host: SMTP server
+            port: SMTP port (587 for STARTTLS, 465 for SSL, 25 unencrypted)
+            username: Login (no AUTH if empty)
+            password: Password
+            starttls: Upgrade with STARTTLS after connecting (ignored with use_ssl)
+            use_ssl: Connect with implicit TLS
+            name: Name used in metrics
+            max_idle: Most idle sessions kept
+            idle_seconds: How long an idle session is trusted (servers drop them after a few minutes)
+            timeout: Socket timeout
+        """
+        super().__init__(name, max_idle, idle_seconds)
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.use_ssl:
+            conn = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout, context=ssl.create_default_context())
+        else:
+            conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                conn.starttls(context=ssl.create_default_context())
+        if self.username:
+            conn.login(self.username, self.password)
+        return conn
+
+    def _close(self, conn):
+        try:
+            conn.quit()
+        except (smtplib.SMTPException, OSError):
+            conn.close()
+
+    def _alive(self, conn: smtplib.SMTP) -> bool:
+        """Check a reused session with NOOP before any of a message is sent on it."""
+        try:
+            return conn.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def send(self, message: EmailMessage):
+        """
+        Send a message on a pooled session.
+
+        Raises:
+            smtplib.SMTPException, OSError: If it can't be sent
+        """
+        start = time.perf_counter()
+        conn, _ = self._checkout()
+        if conn is not None and not self._alive(conn):
+            conn.close()
+            conn = None
+        if conn is None:
+            conn = self._connect()
+        try:
+            conn.send_message(message)
+        except _STALE_SMTP_ERRORS:
+            conn.close()
+            raise
+        except smtplib.SMTPRecipientsRefused:
+            # The session is fine; only this message was refused
+            self._checkin(conn)
+            raise
+        except BaseException:
+            self._close(conn)
+            raise
+
+        self._checkin(conn)
+        metrics.observe(f'pool.{self.name}.latency', time.perf_counter() - start)
+
+
+_pools: Dict[Tuple, _Pool] = {}
+_pools_lock = threading.Lock()
+
+
+def http_pool(base_url: str, name: str, max_idle: int = POOL_MAX_IDLE) -> HttpPool:
+    """
+    Get the shared pool for a provider and host, creating it on first use.
+
+    Args:
+        base_url: Scheme and host
+        name: Name used in metrics
+        max_idle: Most idle connections kept (an existing pool is only ever grown)
+    """
+    parts = urlsplit(base_url)
+    key = ('http', name, parts.scheme, parts.netloc)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = HttpPool(base_url, name, max_idle)
+        pool.max_idle = max(pool.max_idle, max_idle)
+        return pool
+
+
+def smtp_pool(host: str, port: int, username: str = '', password: str = '', starttls: bool = True,
+              use_ssl: bool = False) -> SmtpPool:
+    """Get the shared pool for an SMTP server and login, creating it on first use."""
+    key = ('smtp', host, port, username, starttls, use_ssl)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = SmtpPool(host, port, username, password, starttls, use_ssl)
+        return pool
+
+
+def pool_stats() -> Dict[str, Dict]:
+    """Get stats() of every pool, by name."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {pool.name: pool.stats() for pool in pools}
+
+
+def close_pools():
+    """Close every idle connection in every pool."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,255 @@
+"""Inspect and control the browser process tree (memory use, kill).
+
+Browsers are started as descendants of this process (Playwright's driver
+or chromedriver, then Chromium's browser, renderer, GPU and utility
+processes), so "the browser" is every descendant of our PID.
+
+Uses psutil when installed and falls back to reading /proc on Linux
+(which is all Lambda needs).
+"""
+
+import logging
+import os
+import signal
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _proc_parents() -> Dict[int, int]:
+    """Map every PID to its parent PID by reading /proc."""
+    parents = {}
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return parents
+
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", 'r') as f:
+                stat = f.read()
+            # The command name is in parentheses and may contain spaces
+            fields = stat[stat.rfind(')') + 2:].split()
+            parents[int(entry)] = int(fields[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    return parents
+
+
+def _walk(children: Dict[int, List[int]], pid: int) -> List[int]:
+    """Descendants of pid in a PID -> children map, parents before children."""
+    found = []
+    stack = list(children.get(pid, []))
+    while stack:
+        child = stack.pop()
+        found.append(child)
+        stack.extend(children.get(child, []))
+    return found
+
+
+def _children_map() -> Dict[int, List[int]]:
+    children: Dict[int, List[int]] = {}
+    for child, parent in _proc_parents().items():
+        children.setdefault(parent, []).append(child)
+    return children
+
+
+def descendants(pid: Optional[int] = None) -> List[int]:
+    """
+    Get all descendant PIDs of a process.
+
+    Args:
+        pid: Root process (defaults to this process)
+
+    Returns:
+        List of descendant PIDs (not including pid itself)
+    """
+    pid = pid or os.getpid()
+
+    if psutil is not None:
+        try:
+            return [child.pid for child in psutil.Process(pid).children(recursive=True)]
+        except psutil.Error:
+            return []
+
+    return _walk(_children_map(), pid)
+
+
+def descendants_of(pids: Iterable[int]) -> Set[int]:
+    """
+    Get the descendants of several processes at once (one /proc scan without psutil).
+
+    Args:
+        pids: Root processes
+
+    Returns:
+        Set of descendant PIDs (not including the roots themselves)
+    """
+    pids = list(pids)
+    if psutil is not None:
+        return {child for pid in pids for child in descendants(pid)}
+
+    children = _children_map() if pids else {}
+    return {child for pid in pids for child in _walk(children, pid)}
+
+
+def rss_bytes(pid: int) -> int:
+    """
+    Get the resident set size of one process.
+
+    Args:
+        pid: Process ID
+
+    Returns:
+        RSS in bytes (0 if the process has gone)
+    """
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return 0
+
+    try:
+        with open(f"/proc/{pid}/statm", 'r') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def tree_rss_bytes(pid: Optional[int] = None) -> int:
+    """
+    Get the combined RSS of a process's descendants (the browser tree).
+
+    Shared pages are counted once per process, so this over-estimates
+    slightly - the same way Lambda's "Max Memory Used" does.
+
+    Args:
+        pid: Root process (defaults to this process)
+
+    Returns:
+        Total RSS in bytes
+    """
+    return sum(rss_bytes(child) for child in descendants(pid))
+
+
+def _command_line(pid: int) -> str:
+    """Get a process's command line ('' if it has gone)."""
+    if psutil is not None:
+        try:
+            return ' '.join(psutil.Process(pid).cmdline())
+        except psutil.Error:
+            return ''
+
+    try:
+        with open(f"/proc/{pid}/cmdline", 'rb') as f:
+            return f.read().replace(b'\0', b' ').decode(errors='replace')
+    except OSError:
+        return ''
+
+
+def _kill(pids: Iterable[int], match: Optional[str]) -> int:
+    """SIGKILL each process whose command line contains match (any if None)."""
+    killed = 0
+    for pid in pids:
+        if match and match.lower() not in _command_line(pid).lower():
+            continue
+        try:
+            os.kill(pid, signal.SIGKILL)
+            killed += 1
+        except OSError:
+            continue
+    return killed
+
+
+def kill_tree(pid: Optional[int] = None, match: Optional[str] = None) -> int:
+    """
+    SIGKILL every descendant of a process (the process itself survives).
+
+    Args:
+        pid: Root process (defaults to this process)
+        match: Only kill processes whose command line contains this
+            (case-insensitive), e.g. 'chrom' to spare Playwright's driver
+
+    Returns:
+        Number of processes signalled
+    """
+    # Children first so parents can't respawn them
+    return _kill(reversed(descendants(pid)), match)
+
+
+def kill_processes(pids: Iterable[int], match: Optional[str] = None) -> int:
+    """
+    SIGKILL some processes along with all of their descendants.
+
+    Args:
+        pids: Processes to kill
+        match: Only kill processes whose command line contains this (case-insensitive)
+
+    Returns:
+        Number of processes signalled
+    """
+    targets = []
+    for pid in pids:
+        targets.extend(reversed(descendants(pid)))
+        targets.append(pid)
+    return _kill(dict.fromkeys(targets), match)
+
+
+class PeakRssSampler:
+    """Samples browser-tree and total RSS in a background thread.
+
+    Use as a context manager around a scrape:
+
+        with PeakRssSampler() as sampler:
+            scrape_icehq(url, name)
+        logger.info(sampler.peak_browser_bytes)
+
+    If limit_bytes is given, the browser tree is killed as soon as the
+    total (this process + browser) exceeds it, simulating an out-of-memory
+    kill at that memory setting.
+    """
+
+    def __init__(self, interval: float = 0.1, limit_bytes: Optional[int] = None):
+        self.interval = interval
+        self.limit_bytes = limit_bytes
+        self.peak_browser_bytes = 0
+        self.peak_total_bytes = 0
+        self.exceeded = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self):
+        pid = os.getpid()
+        while True:
+            browser = tree_rss_bytes(pid)
+            total = browser + rss_bytes(pid)
+            self.peak_browser_bytes = max(self.peak_browser_bytes, browser)
+            self.peak_total_bytes = max(self.peak_total_bytes, total)
+
+            if self.limit_bytes and total > self.limit_bytes and not self.exceeded:
+                self.exceeded = True
+                logger.warning("Memory %.0f MB over limit, killing browser", total / 1024 / 1024)
+                kill_tree(pid, match='chrom')
+
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._sample, name='rss-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
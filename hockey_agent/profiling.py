@@ -0,0 +1,134 @@
+"""On-demand profiling of checks using cProfile and tracemalloc.
+
+Profiling is controlled entirely by environment variables so it can be
+switched on in production without redeploying instrumented code:
+
+    PROFILE_EVERY_N_RUNS=10        # profile every 10th run (0 = disabled)
+    PROFILE_PHASE=check_all_sites  # or scrape, notify
+    PROFILE_OUTPUT_DIR=profiles    # empty = write to the log
+"""
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from typing import Dict
+from hockey_agent.config import (
+    PROFILE_EVERY_N_RUNS,
+    PROFILE_PHASE,
+    PROFILE_OUTPUT_DIR,
+    PROFILE_TOP_N
+)
+
+logger = logging.getLogger(__name__)
+
+# Number of times each phase has been entered in this process.
+# In Lambda this survives across warm invocations, so sampling still works.
+_run_counts: Dict[str, int] = {}
+
+
+def _should_profile(phase: str) -> bool:
+    """
+    Decide whether this run of a phase should be profiled.
+
+    Args:
+        phase: Name of the phase being entered
+
+    Returns:
+        True if profiling is enabled for this phase and this run is sampled
+    """
+    if PROFILE_EVERY_N_RUNS <= 0 or phase != PROFILE_PHASE:
+        return False
+
+    _run_counts[phase] = _run_counts.get(phase, 0) + 1
+    return _run_counts[phase] % PROFILE_EVERY_N_RUNS == 0
+
+
+def _build_report(phase: str, profiler: cProfile.Profile, snapshot: tracemalloc.Snapshot) -> str:
+    """Format cProfile stats and the top allocation sites as text."""
+    stream = io.StringIO()
+    stream.write(f"Profile for phase '{phase}' (run {_run_counts.get(phase, 0)})\n")
+    stream.write("=" * 70 + "\n")
+
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats('cumulative').print_stats(PROFILE_TOP_N)
+
+    stream.write(f"\nTop {PROFILE_TOP_N} allocation sites\n")
+    stream.write("-" * 70 + "\n")
+    for stat in snapshot.statistics('lineno')[:PROFILE_TOP_N]:
+        stream.write(f"{stat}\n")
+
+    return stream.getvalue()
+
+
+def _write_report(phase: str, profiler: cProfile.Profile, report: str):
+    """Write the report to PROFILE_OUTPUT_DIR, or to the log if unset."""
+    if not PROFILE_OUTPUT_DIR:
+        logger.info(report)
+        return
+
+    try:
+        os.makedirs(PROFILE_OUTPUT_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        base = os.path.join(PROFILE_OUTPUT_DIR, f"{phase}-{stamp}")
+
+        # Raw pstats can be loaded later with `python -m pstats <file>`
+        profiler.dump_stats(f"{base}.pstats")
+        with open(f"{base}.txt", 'w') as f:
+            f.write(report)
+
+        logger.info("Profile for '%s' written to %s.pstats", phase, base)
+    except IOError as e:
+        logger.error("Error writing profile: %s", e)
+        logger.info(report)
+
+
+@contextmanager
+def profile_phase(phase: str):
+    """
+    Profile a block of code if profiling is enabled and sampled for this phase.
+
+    Args:
+        phase: Name of the phase (compared against PROFILE_PHASE)
+    """
+    if not _should_profile(phase):
+        yield
+        return
+
+    # Don't stop tracemalloc if something else already started it
+    started_tracemalloc = not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start()
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        if started_tracemalloc:
+            tracemalloc.stop()
+
+        _write_report(phase, profiler, _build_report(phase, profiler, snapshot))
+
+
+def profiled(phase: str):
+    """
+    Decorator that wraps a function in profile_phase().
+
+    Args:
+        phase: Name of the phase (compared against PROFILE_PHASE)
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with profile_phase(phase):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
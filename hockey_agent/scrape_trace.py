@@ -0,0 +1,173 @@
+"""Playwright trace/HAR capture kept only for slow or failed scrapes.
+
+Every run records a trace and HAR into its own directory under
+SCRAPE_TRACE_DIR. When the scrape succeeds within SCRAPE_SLOW_SECONDS the
+directory is deleted; otherwise it is kept, and only the newest
+SCRAPE_TRACE_KEEP run directories are retained. Open a kept trace with:
+
+    playwright show-trace <dir>/trace.zip
+"""
+
+import logging
+import os
+import re
+import shutil
+import time
+from datetime import datetime
+from typing import Dict, List
+from hockey_agent.config import (
+    SCRAPE_TRACE_DIR,
+    SCRAPE_TRACE_KEEP,
+    SCRAPE_SLOW_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+# Number of slowest requests listed in the waterfall summary
+WATERFALL_TOP_N = 15
+
+
+class ScrapeRecorder:
+    """Records a trace, HAR and request timings for one scrape."""
+
+    def __init__(self, name: str):
+        """
+        Prepare a run directory.
+
+        Args:
+            name: The name of the site being scraped
+        """
+        slug = re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        self.run_dir = os.path.join(SCRAPE_TRACE_DIR, f"{stamp}-{slug}")
+        self.har_path = os.path.join(self.run_dir, 'requests.har')
+        self.trace_path = os.path.join(self.run_dir, 'trace.zip')
+        self.started = time.monotonic()
+        self.started_at = time.time()
+        self.keep = False
+        self._requests: Dict[object, Dict] = {}
+        os.makedirs(self.run_dir, exist_ok=True)
+
+    def context_options(self) -> Dict:
+        """Get keyword arguments for new_context()/launch_persistent_context()."""
+        return {'record_har_path': self.har_path, 'record_har_content': 'omit'}
+
+    def start(self, context, page):
+        """
+        Start tracing and listen for request events.
+
+        Args:
+            context: Playwright browser context
+            page: Page whose requests should be timed
+        """
+        context.tracing.start(screenshots=True, snapshots=True)
+        page.on('request', self._on_request)
+        page.on('requestfinished', self._on_request_done)
+        page.on('requestfailed', self._on_request_failed)
+
+    # Event times are only seen when Python next talks to the browser, so
+    # browser-side request.timing is preferred where it's available.
+
+    def _on_request(self, request):
+        self._requests[request] = {
+            'url': request.url,
+            'type': request.resource_type,
+            'start': time.time(),
+            'end': None,
+            'failed': False,
+        }
+
+    def _on_request_done(self, request):
+        entry = self._requests.get(request)
+        if not entry:
+            return
+        entry['end'] = time.time()
+        try:
+            timing = request.timing
+            if timing.get('startTime', 0) > 0 and timing.get('responseEnd', -1) >= 0:
+                entry['start'] = timing['startTime'] / 1000
+                entry['end'] = entry['start'] + timing['responseEnd'] / 1000
+        except Exception:
+            pass
+
+    def _on_request_failed(self, request):
+        entry = self._requests.get(request)
+        if entry:
+            entry['end'] = time.time()
+            entry['failed'] = True
+
+    def stop(self, context, failed: bool):
+        """
+        Stop tracing, saving the trace only if the run was slow or failed.
+
+        Must be called before the context is closed.
+
+        Args:
+            context: Playwright browser context
+            failed: Whether the scrape raised an error
+        """
+        elapsed = time.monotonic() - self.started
+        self.keep = failed or elapsed > SCRAPE_SLOW_SECONDS
+        try:
+            context.tracing.stop(path=self.trace_path if self.keep else None)
+        except Exception as e:
+            logger.warning("Could not stop trace: %s", e)
+
+    def finish(self):
+        """Log the waterfall and keep or discard the run's artefacts (after the context is closed)."""
+        elapsed = time.monotonic() - self.started
+        summary = self.waterfall()
+
+        if self.keep:
+            logger.warning("Slow or failed scrape (%.1fs), kept trace in %s", elapsed, self.run_dir)
+            logger.info(summary)
+            _prune_runs()
+        else:
+            logger.debug(summary)
+            shutil.rmtree(self.run_dir, ignore_errors=True)
+
+    def waterfall(self) -> str:
+        """
+        Summarise request timings, slowest first.
+
+        Returns:
+            Multi-line text listing start offset, duration and URL of the slowest
+            requests, plus any still pending (these are what hold up networkidle)
+        """
+        entries = list(self._requests.values())
+        now = time.time()
+        lines = [f"Request waterfall: {len(entries)} request(s)"]
+
+        pending = [e for e in entries if e['end'] is None]
+        finished = sorted((e for e in entries if e['end'] is not None),
+                          key=lambda e: e['end'] - e['start'], reverse=True)
+
+        for entry in finished[:WATERFALL_TOP_N]:
+            lines.append(_waterfall_line(entry, entry['end'], self.started_at, 'FAIL' if entry['failed'] else ''))
+        for entry in pending:
+            lines.append(_waterfall_line(entry, now, self.started_at, 'PENDING'))
+
+        return "\n".join(lines)
+
+
+def _waterfall_line(entry: Dict, end: float, origin: float, flag: str) -> str:
+    """Format one waterfall row: start offset, duration, resource type, URL."""
+    offset_ms = (entry['start'] - origin) * 1000
+    duration_ms = (end - entry['start']) * 1000
+    return f"  +{offset_ms:7.0f}ms {duration_ms:7.0f}ms {entry['type']:<10} {flag:<7} {entry['url'][:150]}"
+
+
+def _prune_runs():
+    """Delete the oldest kept run directories beyond SCRAPE_TRACE_KEEP."""
+    try:
+        runs = sorted(
+            os.path.join(SCRAPE_TRACE_DIR, d) for d in os.listdir(SCRAPE_TRACE_DIR)
+            if os.path.isdir(os.path.join(SCRAPE_TRACE_DIR, d))
+        )
+    except OSError:
+        return
+
+    # Directory names start with a timestamp, so sorted order is oldest first
+    stale: List[str] = runs[:-SCRAPE_TRACE_KEEP] if SCRAPE_TRACE_KEEP > 0 else runs
+    for run_dir in stale:
+        shutil.rmtree(run_dir, ignore_errors=True)
@@ -1,116 +1,452 @@
 """Web scraper for hockey rink websites."""
 
 import logging
+import threading
+import time
 from datetime import datetime
-from typing import List, Dict
-from hockey_agent.config import SITES_TO_MONITOR
-from hockey_agent.storage import get_session_status, update_session_status, status_changed
-from hockey_agent.notifier import send_notification
-from hockey_agent.scrapers.icehq_playwright import scrape_icehq
-from hockey_agent.booked import is_booked
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from hockey_agent.config import SITES_TO_MONITOR, SESSION_RETENTION_GRACE_HOURS, SCRAPER_BACKEND, DIFF_BATCH_ROWS
+from hockey_agent.storage import load_session_states, update_session_statuses, prune_past_sessions
+from hockey_agent.notifier import send_notification, send_bulk_notification
+from hockey_agent.booked import load_booked_sessions, clear_old_sessions
+from hockey_agent.columnar import classify_sessions, NO_CHANGE
+from hockey_agent.flap import advance, state_of, confirmed_status, NEW, REOPENED, SUPPRESSED
+from hockey_agent.profiling import profiled, profile_phase
+from hockey_agent.subscriptions import load_subscription_index
+from hockey_agent.history import load_history
+from hockey_agent.snapshot import SnapshotWriter
+from hockey_agent.lease import check_lease, lease_summary, SKIPPED, REUSED
+from hockey_agent.process_tree import PeakRssSampler
+from hockey_agent import metrics
+from hockey_agent.watchdog import watch_check, phase, checkpoint, DeadlineExceeded
 
 logger = logging.getLogger(__name__)
 
 
-def scrape_site(site: Dict) -> List[Dict[str, str]]:
+def _backend():
+    """Get the scraper module for SCRAPER_BACKEND (Selenium is only imported if chosen)."""
+    if SCRAPER_BACKEND == 'selenium':
+        from hockey_agent.scrapers import icehq
+        return icehq
+    from hockey_agent.scrapers import icehq_playwright
+    return icehq_playwright
+
+
+def enable_warm_browser():
     """
-    Scrape a single site for hockey sessions using the appropriate scraper.
+    Keep the backend's browser open between scrapes (call from the thread that scrapes).
+
+    Returns:
+        The backend's warm browser object (has alive, launches and scrapes)
+    """
+    return _backend().enable_warm_browser()
+
+
+def stop_warm_browser():
+    """Close the backend's warm browser (call from the thread that scrapes)."""
+    _backend().stop_warm_browser()
+
+
+def stream_site(site: Dict) -> Iterator[List[Dict[str, str]]]:
+    """
+    Scrape a single site, yielding its sessions one product block at a time.
+
+    The 'scrape' profile covers the whole stream, including whatever the
+    caller does with each block before asking for the next.
 
     Args:
         site: Site configuration dictionary with 'url', 'name', 'type' keys
 
-    Returns:
-        List of session dictionaries
+    Yields:
+        Lists of session dictionaries
+
+    Raises:
+        DeadlineExceeded: If extraction runs out of time part way through
     """
     url = site['url']
     name = site['name']
     site_type = site.get('type', 'generic')
 
-    if site_type == 'icehq':
-        return scrape_icehq(url, name)
-    else:
-        logger.warning(f"Unknown site type '{site_type}' for {name}")
-        return []
+    if site_type != 'icehq':
+        logger.warning("Unknown site type '%s' for %s", site_type, name)
+        return
+
+    # Record peak memory of the browser process tree for sizing Lambda
+    with profile_phase('scrape'), PeakRssSampler() as sampler:
+        yield from _backend().iter_icehq(url, name)
+
+    peak_mb = sampler.peak_browser_bytes / 1024 / 1024
+    metrics.gauge('browser.peak_rss_mb', peak_mb)
+    logger.info("Peak browser memory for %s: %.0f MB (total with agent %.0f MB)",
+                name, peak_mb, sampler.peak_total_bytes / 1024 / 1024)
+
+
+def scrape_site(site: Dict) -> List[Dict[str, str]]:
+    """
+    Scrape a single site for hockey sessions using the appropriate scraper.
+
+    Args:
+        site: Site configuration dictionary with 'url', 'name', 'type' keys
+
+    Returns:
+        List of session dictionaries (partial if a deadline was hit)
+    """
+    sessions = []
+    try:
+        for block in stream_site(site):
+            sessions.extend(block)
+    except DeadlineExceeded as e:
+        logger.error("Gave up on %s: %s (returning %s partial session(s))", site['name'], e, len(sessions))
+    return sessions
+
+
+_TABLE_HEADER = ["", "=" * 70, "ALL MATCHING SESSIONS", "=" * 70]
+_TABLE_ROW = ["\n%s", "  When: %s", "  Status: %s%s (%s spots)"]
+
+
+def _log_session_table(sessions: List[Dict], header: bool = False):
+    """Log rows of the session table; only the fields are taken here, the text is built by the log writer."""
+    if not logger.isEnabledFor(logging.INFO):
+        return
+
+    args = []
+    for session in sessions:
+        args += (session['session_type'], session['date_time'], session['status'],
+                 " (BOOKED)" if session['is_booked'] else "", session.get('qty_in_stock', '?'))
+    lines = (_TABLE_HEADER if header else []) + _TABLE_ROW * len(sessions)
+    logger.info("\n".join(lines), *args)
+
+
+def _notify_subscribers(subscriptions, newly_available_sessions: List[Dict], new_sessions: List[Dict],
+                        cancel: Optional[threading.Event] = None):
+    """
+    Send each subscriber only the changed sessions matching their filters.
+
+    Args:
+        subscriptions: SubscriptionIndex of subscribers
+        newly_available_sessions: Sessions that were sold out but now have spots
+        new_sessions: Sessions seen for the first time with spots available
+        cancel: Event that stops sending (the notify phase's deadline)
+    """
+    reopened = subscriptions.route(newly_available_sessions)
+    new = subscriptions.route(new_sessions)
+
+    batches = []
+    for subscriber_id in set(reopened) | set(new):
+        subscriber = subscriptions.subscribers[subscriber_id]
+        subscriber_sessions = reopened.get(subscriber_id, []) + new.get(subscriber_id, [])
+        logger.info("Notifying %s of %s session(s)", subscriber_id, len(subscriber_sessions))
+        batches.append((subscriber.get('phone'), subscriber_sessions, len(reopened.get(subscriber_id, []))))
+
+    send_bulk_notification(batches, cancel)
+
+
+def scrape_sites(sites: List[Dict]) -> Iterable[Tuple[Dict, List[Dict]]]:
+    """
+    Scrape sites one at a time.
+
+    Args:
+        sites: Site configuration dictionaries
+
+    Yields:
+        (site, sessions) for each site, as soon as it has been scraped
+    """
+    for site in sites:
+        yield site, scrape_site(site)
+
+
+def stream_sites(sites: List[Dict]) -> Iterable[Tuple[Dict, Iterator[List[Dict]]]]:
+    """
+    Scrape sites one at a time, streaming each site's sessions.
+
+    Args:
+        sites: Site configuration dictionaries
+
+    Yields:
+        (site, blocks) for each site, where blocks yields lists of session
+        dictionaries one product at a time (see stream_site)
+    """
+    for site in sites:
+        yield site, stream_site(site)
+
+
+@profiled('check_all_sites')
+def check_all_sites(scraped: Optional[Iterable[Tuple[Dict, List[Dict]]]] = None) -> Dict:
+    """
+    Check all configured sites for new or newly available hockey sessions.
+
+    The check lease is taken before scraping, so overlapping runs don't
+    scrape and notify twice: a run that can't get it is skipped, or reuses
+    the snapshot of a run that has just finished (see lease.py).
+
+    Each phase runs under a watchdog deadline; if one overruns, the check
+    carries on with whatever was collected and is marked as degraded.
+
+    Args:
+        scraped: (site, sessions) pairs that were already scraped elsewhere
+            (e.g. by fan-out workers, whose coordinator holds the lease);
+            defaults to scraping SITES_TO_MONITOR here
+
+    Returns:
+        Summary dictionary with 'sessions_found', 'newly_available', 'new',
+        'suppressed', 'degraded' and 'blown_phases' keys ('lease' too,
+        unless sessions were passed in)
+    """
+    if scraped is not None:
+        return _run_check((site, [sessions]) for site, sessions in scraped)
 
+    with check_lease() as (lease, snapshot):
+        if lease in (SKIPPED, REUSED):
+            return lease_summary(lease, snapshot)
+        summary = _run_check(stream_sites(SITES_TO_MONITOR))
+    summary['lease'] = lease
+    return summary
 
-def check_all_sites():
-    """Check all configured sites for new or newly available hockey sessions."""
+
+def _run_check(streams: Iterable[Tuple[Dict, Iterable[List[Dict]]]]) -> Dict:
+    """Run one check over streamed sites under the watchdog (see check_all_sites)."""
     logger.info("=" * 50)
     logger.info("Starting check for hockey sessions...")
 
+    with watch_check() as watchdog:
+        summary = _check_sites(streams)
+
+    summary['blown_phases'] = list(watchdog.blown_phases) if watchdog else []
+    summary['degraded'] = bool(summary['blown_phases'])
+    if summary['degraded']:
+        logger.warning("Check degraded - phase(s) over budget: %s", ', '.join(summary['blown_phases']))
+
+    logger.info("Check complete.")
+    logger.info("=" * 50)
+    return summary
+
+
+def diff_block(sessions: List[Dict], stored: Dict[str, Dict], previous: Dict[str, Optional[str]],
+               booked: Set[str], skip_booked: bool, now: float) -> Iterator[Tuple[Dict, str, bool, Optional[Dict], Optional[str]]]:
+    """
+    Decide what changed in a block of sessions, without side effects.
+
+    This is a check's whole change rule (booked exclusion, first seen or
+    reopened, flap hysteresis), shared with the polling simulator.
+
+    Args:
+        sessions: Scraped session dictionaries
+        stored: Seen-store entries ('status' and 'flap') per session ID
+        previous: Confirmed status per session ID
+        booked: Booked date/time strings
+        skip_booked: Leave booked sessions out of the diff (no subscribers)
+        now: Epoch time of the scrape
+
+    Yields:
+        (session, session_id, is_booked, state, event) per session. state is
+        the new flap state, or None for a session left out of the diff;
+        event is NEW, REOPENED, one of SUPPRESSED, HELD or None.
+    """
+    classified = classify_sessions(sessions, booked, previous, skip_booked=skip_booked)
+    for session, session_id, booked_flag, notifiable, change in zip(sessions, *classified):
+        if not notifiable:
+            yield session, session_id, booked_flag, None, None
+            continue
+
+        state = state_of(stored.get(session_id))
+        if change == NO_CHANGE and 'pending' not in state:
+            # Still at its confirmed status with nothing pending: advance() would keep the state
+            yield session, session_id, booked_flag, state, None
+            continue
+
+        # Confirm the change only once it has settled (see flap.py)
+        state, event = advance(state, session['status'], now)
+        yield session, session_id, booked_flag, state, event
+
+
+def batch_blocks(blocks: Iterable[List[Dict]], rows: int = DIFF_BATCH_ROWS) -> Iterator[List[Dict]]:
+    """
+    Join consecutive product blocks into batches of at least rows sessions.
+
+    A product block is usually a few dozen variants, too few for the columnar
+    diff to pay for building its arrays, so blocks are classified together.
+
+    Args:
+        blocks: Lists of session dictionaries
+        rows: Sessions per batch (the last batch may be smaller)
+
+    Yields:
+        Lists of session dictionaries
+
+    Raises:
+        DeadlineExceeded: If the blocks stop on a deadline (after the partial batch is yielded)
+    """
+    batch: List[Dict] = []
+    try:
+        for block in blocks:
+            batch.extend(block)
+            if len(batch) >= rows:
+                yield batch
+                batch = []
+    except DeadlineExceeded:
+        if batch:
+            yield batch
+        raise
+    if batch:
+        yield batch
+
+
+def remember_states(updates: Dict[str, Dict], flap_states: Dict[str, Dict],
+                    stored: Dict[str, Dict], previous: Dict[str, Optional[str]]):
+    """Carry a block's statuses into a check's in-memory copy of the seen store."""
+    for session_id, session in updates.items():
+        stored[session_id] = {'status': session['status'], 'flap': flap_states[session_id]}
+        previous[session_id] = flap_states[session_id]['confirmed']
+
+
+def _check_sites(scraped: Iterable[Tuple[Dict, Iterable[List[Dict]]]]) -> Dict:
+    """
+    Diff, store and notify for every scraped site (see check_all_sites).
+
+    Each site's sessions stream through a batch of product blocks at a time
+    (see batch_blocks): the batch is classified, recorded in the history and
+    snapshot, and shown in the session table, then dropped. Seen-store
+    changes are written once per site. Only sessions to notify about are
+    kept until the end of the check.
+
+    The store phase's budget covers this work for each site; scraping the
+    next blocks (which may launch and load a browser) runs outside it.
+    """
     newly_available_sessions = []
     new_sessions = []
-    all_sessions = []  # Track all sessions for display
-
-    for site in SITES_TO_MONITOR:
-        sessions = scrape_site(site)
-
-        # Check each session for status changes
-        for session in sessions:
-            # Mark if already booked
-            session['is_booked'] = is_booked(session['date_time'])
-
-            # Add to all sessions list for display
-            all_sessions.append(session)
-
-            # Skip notifications if already booked
-            if session['is_booked']:
-                logger.debug(f"Already booked: {session['date_time']}")
-                continue
-
-            # Create unique ID for this session
-            session_id = f"{session['site']}:{session['session_type']}:{session['date_time']}"
-
-            # Add timestamp
-            session['timestamp'] = datetime.now().isoformat()
-
-            current_status = session['status']
-            previous_status = get_session_status(session_id)
-
-            # Check if this is a status change we care about
-            if status_changed(session_id, current_status):
-                if previous_status is None:
-                    # New session
-                    if current_status == 'AVAILABLE':
-                        new_sessions.append(session)
-                        logger.info(f"NEW AVAILABLE: {session['session_type']} - {session['date_time']}")
-                elif previous_status == 'SOLD OUT' and current_status == 'AVAILABLE':
-                    # Previously sold out, now available!
-                    newly_available_sessions.append(session)
-                    logger.info(f"SPOT OPENED: {session['session_type']} - {session['date_time']}")
-
-            # Update storage with current status
-            update_session_status(session_id, current_status, session)
-
-    # Display all sessions
-    if all_sessions:
-        print("\n" + "=" * 70)
-        print("ALL MATCHING SESSIONS")
-        print("=" * 70)
-        for session in all_sessions:
-            status_label = session['status']
-            if session['is_booked']:
-                status_label += " (BOOKED)"
-
-            qty = session.get('qty_in_stock', '?')
-            print(f"\n{session['session_type']}")
-            print(f"  When: {session['date_time']}")
-            print(f"  Status: {status_label} ({qty} spots)")
-        print("=" * 70 + "\n")
+    sessions_found = 0
+
+    # With subscribers, booked sessions are checked per subscriber instead
+    subscriptions = load_subscription_index()
+    history = load_history()
+
+    # Forget sessions that have already happened so the stores stay small
+    if SESSION_RETENTION_GRACE_HOURS >= 0:
+        prune_past_sessions()
+        clear_old_sessions()
+        history.prune_past(SESSION_RETENTION_GRACE_HOURS)
+
+    # One read of the seen store and the booked list per check, one write per site
+    stored = load_session_states()
+    previous = {session_id: confirmed_status(entry) for session_id, entry in stored.items()}
+    booked = load_booked_sessions()
+    suppressed = 0
+
+    with SnapshotWriter() as snapshot:
+        for site, blocks in scraped:
+            # A variant listed twice only counts the first time
+            seen_ids = set()
+            # Seen-store changes for the whole site, written when it's done
+            site_updates = {}
+            site_states = {}
+            store_spent = 0.0
+            try:
+                for sessions in batch_blocks(blocks):
+                    # Check each session for status changes
+                    updates = {}
+                    flap_states = {}
+                    done = 0
+                    started = time.monotonic()
+                    try:
+                        with phase('store', spent=store_spent):
+                            now = time.time()
+                            timestamp = datetime.fromtimestamp(now).isoformat()
+                            changes = diff_block(sessions, stored, previous, booked, subscriptions is None, now)
+
+                            for session, session_id, booked_flag, state, event in changes:
+                                checkpoint()
+                                done += 1
+
+                                # Mark if already booked
+                                session['is_booked'] = booked_flag
+                                snapshot.add(session)
+
+                                # Record inventory history (booked sessions included)
+                                history.record(session_id, session.get('qty_in_stock', 0),
+                                               session['status'] == 'SOLD OUT', date_time=session['date_time'])
+
+                                # Skip notifications if already booked
+                                if state is None:
+                                    logger.debug("Already booked: %s", session['date_time'])
+                                    continue
+
+                                # Add timestamp
+                                session['timestamp'] = timestamp
+
+                                if session_id in seen_ids:
+                                    if session_id in updates:
+                                        updates[session_id] = session
+                                    continue
+                                seen_ids.add(session_id)
+
+                                if event == NEW:
+                                    new_sessions.append(session)
+                                    logger.info("NEW AVAILABLE: %s - %s", session['session_type'], session['date_time'])
+                                elif event == REOPENED:
+                                    # Previously sold out, now available!
+                                    newly_available_sessions.append(session)
+                                    logger.info("SPOT OPENED: %s - %s", session['session_type'], session['date_time'])
+                                elif event in SUPPRESSED:
+                                    suppressed += 1
+                                    metrics.increment(f'flap.suppressed.{event}')
+                                    logger.info("Suppressed (%s): %s - %s",
+                                                event, session['session_type'], session['date_time'])
+
+                                flap_states[session_id] = state
+                                updates[session_id] = session
+                    finally:
+                        store_spent += time.monotonic() - started
+                        # Keep whatever was processed before a deadline
+                        site_updates.update(updates)
+                        site_states.update(flap_states)
+                        remember_states(updates, flap_states, stored, previous)
+
+                        # Display the batch (one record, written off the hot path by the log listener)
+                        if done:
+                            _log_session_table(sessions[:done], header=not sessions_found)
+                        sessions_found += done
+            except DeadlineExceeded as e:
+                logger.error("%s - remaining sessions on %s not recorded", e, site['name'])
+            finally:
+                # Update storage with current statuses
+                update_session_statuses(site_updates, site_states)
+                # Stop the site's scrape if the check gave up on it part way through
+                if hasattr(blocks, 'close'):
+                    blocks.close()
+
+    if sessions_found:
+        logger.info("%s", "=" * 70)
+
+    history.save()
 
     # Send notifications
     all_notifiable_sessions = newly_available_sessions + new_sessions
 
     if newly_available_sessions:
-        logger.info(f"Found {len(newly_available_sessions)} newly available session(s) (were sold out)")
+        logger.info("Found %s newly available session(s) (were sold out)", len(newly_available_sessions))
 
     if new_sessions:
-        logger.info(f"Found {len(new_sessions)} new available session(s)")
+        logger.info("Found %s new available session(s)", len(new_sessions))
 
     if all_notifiable_sessions:
-        send_notification(all_notifiable_sessions, newly_available_count=len(newly_available_sessions))
+        try:
+            with phase('notify') as expired, profile_phase('notify'):
+                if subscriptions is not None:
+                    _notify_subscribers(subscriptions, newly_available_sessions, new_sessions, expired)
+                else:
+                    send_notification(all_notifiable_sessions, newly_available_count=len(newly_available_sessions),
+                                      cancel=expired)
+        except DeadlineExceeded as e:
+            logger.error("%s - some notifications may not have been sent", e)
     else:
         logger.info("No new or newly available sessions found.")
 
-    logger.info("Check complete.")
-    logger.info("=" * 50)
+    if suppressed:
+        logger.info("Suppressed %s flapping session change(s)", suppressed)
+
+    return {
+        'sessions_found': sessions_found,
+        'newly_available': len(newly_available_sessions),
+        'new': len(new_sessions),
+        'suppressed': suppressed,
+    }
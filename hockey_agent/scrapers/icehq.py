@@ -1,29 +1,81 @@
 """Scraper for IceHQ website (icehq.com.au)."""
 
 import logging
-import time
-import json
+import os
 import html
+import time
 from datetime import datetime
-from typing import List, Dict
+from typing import Dict, Iterator, List, Optional, Tuple
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from webdriver_manager.chrome import ChromeDriverManager
+from hockey_agent import codec
+from hockey_agent.columnar import filter_sessions
+from hockey_agent.watchdog import phase, checkpoint, browser_launch, DeadlineExceeded
 from hockey_agent.config import (
     HEADLESS_BROWSER,
     BROWSER_WAIT_TIME,
     MONITOR_DAYS,
     MONITOR_DATES,
-    MONITOR_SESSION_TYPES
+    MONITOR_SESSION_TYPES,
+    BROWSER_LOW_MEMORY,
+    LOW_MEMORY_CHROMIUM_ARGS,
+    LOW_MEMORY_VIEWPORT,
+    WARM_BROWSER_MAX_SCRAPES,
+    CHROMEDRIVER_PATH,
+    CHROMEDRIVER_CACHE_FILE
 )
 
 logger = logging.getLogger(__name__)
 
 
+_driver_path: Optional[str] = None
+
+
+def _resolve_driver_path() -> str:
+    """
+    Find chromedriver, resolving it with webdriver-manager at most once.
+
+    Uses CHROMEDRIVER_PATH if set, then the path cached in this process,
+    then the path saved in CHROMEDRIVER_CACHE_FILE by an earlier run. Only
+    if none of those exist is ChromeDriverManager asked (which may hit the
+    network), and its answer is saved for next time.
+
+    Returns:
+        Path to the chromedriver executable
+    """
+    global _driver_path
+
+    if CHROMEDRIVER_PATH:
+        return CHROMEDRIVER_PATH
+    if _driver_path and os.path.exists(_driver_path):
+        return _driver_path
+
+    try:
+        with open(CHROMEDRIVER_CACHE_FILE, 'r') as f:
+            cached = f.read().strip()
+        if cached and os.access(cached, os.X_OK):
+            _driver_path = cached
+            return cached
+    except OSError:
+        pass
+
+    _driver_path = ChromeDriverManager().install()
+    logger.info("Resolved chromedriver at %s", _driver_path)
+    try:
+        os.makedirs(os.path.dirname(CHROMEDRIVER_CACHE_FILE) or '.', exist_ok=True)
+        with open(CHROMEDRIVER_CACHE_FILE, 'w') as f:
+            f.write(_driver_path)
+    except OSError as e:
+        logger.warning("Could not cache chromedriver path: %s", e)
+    return _driver_path
+
+
 def _setup_driver():
     """Set up Chrome WebDriver with appropriate options."""
     chrome_options = Options()
@@ -34,14 +86,116 @@ def _setup_driver():
     chrome_options.add_argument('--no-sandbox')
     chrome_options.add_argument('--disable-dev-shm-usage')
     chrome_options.add_argument('--disable-gpu')
-    chrome_options.add_argument('--window-size=1920,1080')
 
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=chrome_options)
+    if BROWSER_LOW_MEMORY:
+        for arg in LOW_MEMORY_CHROMIUM_ARGS:
+            chrome_options.add_argument(arg)
+        chrome_options.add_argument(
+            f"--window-size={LOW_MEMORY_VIEWPORT['width']},{LOW_MEMORY_VIEWPORT['height']}"
+        )
+    else:
+        chrome_options.add_argument('--window-size=1920,1080')
+
+    # Return once the DOM is ready; the explicit wait below covers the product blocks
+    chrome_options.page_load_strategy = 'eager'
+
+    service = Service(_resolve_driver_path())
+    with browser_launch():
+        driver = webdriver.Chrome(service=service, options=chrome_options)
+    driver.set_page_load_timeout(BROWSER_WAIT_TIME)
 
     return driver
 
 
+class WarmDriver:
+    """Keeps one WebDriver session open between scrapes.
+
+    Before each scrape the session is health-checked; a dead session (e.g.
+    Chrome killed by the watchdog) is replaced, and the session is recycled
+    after WARM_BROWSER_MAX_SCRAPES scrapes to bound memory growth.
+    """
+
+    def __init__(self, max_scrapes: int = WARM_BROWSER_MAX_SCRAPES):
+        self.max_scrapes = max_scrapes
+        self.scrapes = 0
+        self.launches = 0
+        self._driver = None
+
+    @property
+    def alive(self) -> bool:
+        """True if a session is open (see _healthy() for a real check)."""
+        return self._driver is not None
+
+    def _healthy(self) -> bool:
+        """Ping the session with a trivial script."""
+        try:
+            self._driver.execute_script('return 1')
+            return True
+        except WebDriverException:
+            return False
+
+    def acquire(self):
+        """
+        Get a healthy driver, starting a new session if needed.
+
+        Returns:
+            Selenium WebDriver
+        """
+        if self._driver is not None:
+            if self.max_scrapes and self.scrapes >= self.max_scrapes:
+                logger.info("Recycling WebDriver after %s scrape(s)", self.scrapes)
+                self.close()
+            elif not self._healthy():
+                logger.warning("WebDriver session died, starting a new one")
+                self.close()
+
+        if self._driver is None:
+            self._driver = _setup_driver()
+            self.launches += 1
+            self.scrapes = 0
+
+        self.scrapes += 1
+        return self._driver
+
+    def close(self):
+        """End the session."""
+        if self._driver is not None:
+            try:
+                self._driver.quit()
+            except Exception:
+                # The watchdog may already have killed the browser
+                pass
+            self._driver = None
+
+    def stop(self):
+        """End the session (same as close(); matches the Playwright WarmBrowser)."""
+        self.close()
+
+
+_warm: Optional[WarmDriver] = None
+
+
+def enable_warm_browser() -> WarmDriver:
+    """
+    Make scrapes reuse one WebDriver session.
+
+    Returns:
+        The WarmDriver (the session starts on the first scrape)
+    """
+    global _warm
+    if _warm is None:
+        _warm = WarmDriver()
+    return _warm
+
+
+def stop_warm_browser():
+    """End the warm WebDriver session."""
+    global _warm
+    if _warm is not None:
+        _warm.stop()
+        _warm = None
+
+
 def _matches_filter(session_date_str: str) -> bool:
     """
     Check if a session date matches our monitoring criteria.
@@ -115,42 +269,77 @@ def _matches_filter(session_date_str: str) -> bool:
         return False
 
     except Exception as e:
-        logger.warning(f"Error parsing date '{session_date_str}': {e}")
+        logger.warning("Error parsing date '%s': %s", session_date_str, e)
         return False
 
 
-def scrape_icehq(url: str, name: str) -> List[Dict[str, str]]:
+def _load_product_blocks(url: str, name: str) -> List[Tuple[str, str]]:
     """
-    Scrape IceHQ website for available hockey sessions.
+    Load the page and read each monitored product block's raw data, then let the browser go.
 
-    Args:
-        url: The URL to scrape
-        name: The name of the site (for logging)
+    Uses the warm WebDriver session if enable_warm_browser() was called,
+    otherwise starts (and quits) a browser for this scrape.
 
     Returns:
-        List of session dictionaries with 'session_type', 'date_time', 'status', 'site', 'url' keys
+        (session_type, data-product JSON text) pairs (empty on error)
     """
-    sessions = []
+    blocks = []
     driver = None
+    warm = _warm
 
     try:
-        logger.info(f"Checking {name} with Selenium...")
-        driver = _setup_driver()
-        driver.get(url)
+        logger.info("Checking %s with Selenium%s...", name, ' (warm)' if warm else '')
+        with phase('launch'):
+            driver = warm.acquire() if warm else _setup_driver()
 
-        # Wait for page to load and JavaScript to execute
-        time.sleep(5)
+        with phase('load'):
+            driver.get(url)
 
+            # Wait until the product data has rendered instead of sleeping a fixed time
+            try:
+                WebDriverWait(driver, BROWSER_WAIT_TIME).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, 'div.product-block[data-product]'))
+                )
+            except TimeoutException:
+                logger.warning("Timed out waiting for product blocks on %s", name)
+
+            # Reading the DOM still talks to the browser, so it stays in a browser phase
+            _read_product_blocks(driver, name, blocks)
+
+    except DeadlineExceeded as e:
+        logger.error("Gave up on %s: %s", name, e)
+
+    except Exception as e:
+        logger.error("Error scraping %s: %s", name, e, exc_info=logger.isEnabledFor(logging.DEBUG))
+
+    finally:
+        if driver and not warm:
+            try:
+                driver.quit()
+            except Exception:
+                # The watchdog may already have killed the browser
+                pass
+
+    return blocks
+
+
+def _read_product_blocks(driver, name: str, blocks: List[Tuple[str, str]]):
+    """
+    Append (session type, data-product text) for the monitored product blocks on a loaded page.
+
+    Blocks are appended as they're read so the caller keeps what was read
+    if the browser goes away (e.g. killed by the watchdog).
+    """
+    try:
         # Find all product blocks
         product_blocks = driver.find_elements(By.CSS_SELECTOR, 'div.product-block')
 
         if not product_blocks:
-            logger.warning(f"No product blocks found on {name}")
-            return sessions
+            logger.warning("No product blocks found on %s", name)
+            return
 
-        logger.info(f"Found {len(product_blocks)} product block(s) on {name}")
+        logger.info("Found %s product block(s) on %s", len(product_blocks), name)
 
-        # Process each product block
         for idx, product_block in enumerate(product_blocks):
             try:
                 # Get the session type from the heading
@@ -159,79 +348,152 @@ def scrape_icehq(url: str, name: str) -> List[Dict[str, str]]:
                     heading = product_block.find_element(By.CSS_SELECTOR, 'h1, h2, h3, .product-title')
                     session_type = heading.text.strip()
                 except:
-                    logger.debug(f"Could not find heading for product block {idx}")
+                    logger.debug("Could not find heading for product block %s", idx)
                     pass
 
                 # Check if this session type matches our filters
                 session_type_lower = session_type.lower()
                 if MONITOR_SESSION_TYPES:
                     if not any(monitored_type in session_type_lower for monitored_type in MONITOR_SESSION_TYPES):
-                        logger.debug(f"Skipping '{session_type}' - not in monitored types")
+                        logger.debug("Skipping '%s' - not in monitored types", session_type)
                         continue
 
                 # Get the data-product attribute
                 data_product = product_block.get_attribute('data-product')
                 if not data_product:
-                    logger.warning(f"No data-product attribute found for '{session_type}'")
+                    logger.warning("No data-product attribute found for '%s'", session_type)
                     continue
 
-                # Unescape HTML entities and parse JSON
-                try:
-                    # Unescape &quot; etc.
-                    unescaped_json = html.unescape(data_product)
-                    product_data = json.loads(unescaped_json)
-                except json.JSONDecodeError as e:
-                    logger.error(f"Failed to parse JSON for '{session_type}': {e}")
-                    logger.debug(f"Raw data: {data_product[:200]}...")
-                    continue
+                blocks.append((session_type, data_product))
 
-                # Extract variants (each variant is a session date/time)
-                variants = product_data.get('variants', [])
-                logger.info(f"Processing '{session_type}' with {len(variants)} variant(s)")
+            except Exception as e:
+                logger.error("Error reading product block %s: %s", idx, e,
+                             exc_info=logger.isEnabledFor(logging.DEBUG))
+                continue
 
-                for variant in variants:
-                    # Get the date/time from attributes
-                    date_time = variant.get('attributes', {}).get('Date/time', '')
-                    if not date_time:
-                        logger.debug(f"Variant missing Date/time attribute: {variant}")
-                        continue
+    except Exception as e:
+        # Keep what was read before the browser went away (e.g. killed by the watchdog)
+        logger.error("Error reading sessions from %s: %s", name, e,
+                     exc_info=logger.isEnabledFor(logging.DEBUG))
 
-                    # Get availability status
-                    is_sold_out = variant.get('soldOut', False)
-                    qty_in_stock = variant.get('qtyInStock', 0)
 
-                    # Apply date/day filters
-                    if not _matches_filter(date_time):
-                        continue
+def _sessions_from_block(session_type: str, data_product: str, url: str, name: str) -> List[Dict[str, str]]:
+    """
+    Build session dictionaries from one product block's data-product text.
+
+    Returns:
+        Session dictionaries that pass the date/day filters (empty if the JSON is bad)
+    """
+    # Unescape HTML entities and parse JSON
+    try:
+        # Unescape &quot; etc.
+        unescaped_json = html.unescape(data_product)
+        product_data = codec.loads(unescaped_json)
+    except codec.JSONDecodeError as e:
+        logger.error("Failed to parse JSON for '%s': %s", session_type, e)
+        logger.debug("Raw data: %s...", data_product[:200])
+        return []
+
+    # Extract variants (each variant is a session date/time)
+    variants = product_data.get('variants', [])
+    candidates = []
+    missing_date = 0
+
+    for variant in variants:
+        # Get the date/time from attributes
+        date_time = variant.get('attributes', {}).get('Date/time', '')
+        if not date_time:
+            missing_date += 1
+            continue
+
+        # Get availability status
+        is_sold_out = variant.get('soldOut', False)
+        qty_in_stock = variant.get('qtyInStock', 0)
+
+        status = 'SOLD OUT' if is_sold_out else 'AVAILABLE'
+
+        candidates.append({
+            'session_type': session_type,
+            'date_time': date_time,
+            'status': status,
+            'site': name,
+            'url': url,
+            'qty_in_stock': qty_in_stock
+        })
+
+    # Apply date/day filters to all variants at once
+    matching = filter_sessions(candidates, _matches_filter)
+    matched = len(matching)
+    available = sum(1 for session in matching if session['status'] == 'AVAILABLE')
+
+    # One line per product block instead of one per variant
+    logger.info("'%s': %d variant(s), %d matched (%d available, %d sold out), %d without date/time",
+                session_type, len(variants), matched, available, matched - available, missing_date)
+    return matching
+
+
+def iter_icehq(url: str, name: str) -> Iterator[List[Dict[str, str]]]:
+    """
+    Scrape IceHQ, yielding matching sessions one product block at a time.
 
-                    status = 'SOLD OUT' if is_sold_out else 'AVAILABLE'
+    Only the blocks' raw JSON text is read while the browser is in use; each
+    block is parsed after the browser has been released, just before its
+    sessions are yielded, so only one block's sessions exist at a time
+    unless the caller keeps them.
 
-                    sessions.append({
-                        'session_type': session_type,
-                        'date_time': date_time,
-                        'status': status,
-                        'site': name,
-                        'url': url,
-                        'qty_in_stock': qty_in_stock
-                    })
+    Args:
+        url: The URL to scrape
+        name: The name of the site (for logging)
 
-                    logger.debug(f"  {status} ({qty_in_stock} spots): {date_time}")
+    Yields:
+        Lists of session dictionaries with 'session_type', 'date_time', 'status', 'site', 'url' keys
 
-            except Exception as e:
-                logger.error(f"Error processing product block {idx}: {e}")
-                import traceback
-                logger.debug(traceback.format_exc())
-                continue
+    Raises:
+        DeadlineExceeded: If the extract phase runs out of time (earlier blocks were already yielded)
+    """
+    blocks = _load_product_blocks(url, name)
+    blocks.reverse()
+    matched = 0
+    # The extract budget covers parsing each block, not the caller's work on its sessions
+    extract_spent = 0.0
+
+    while blocks:
+        started = time.monotonic()
+        try:
+            with phase('extract', spent=extract_spent):
+                checkpoint()
+                session_type, data_product = blocks.pop()
+                try:
+                    sessions = _sessions_from_block(session_type, data_product, url, name)
+                except Exception as e:
+                    logger.error("Error processing product block '%s': %s", session_type, e,
+                                 exc_info=logger.isEnabledFor(logging.DEBUG))
+                    continue
+        finally:
+            extract_spent += time.monotonic() - started
 
-        logger.info(f"Found {len(sessions)} matching sessions on {name}")
+        matched += len(sessions)
+        if sessions:
+            yield sessions
 
-    except Exception as e:
-        logger.error(f"Error scraping {name}: {e}")
-        import traceback
-        logger.debug(traceback.format_exc())
+    logger.info("Found %s matching sessions on %s", matched, name)
 
-    finally:
-        if driver:
-            driver.quit()
 
+def scrape_icehq(url: str, name: str) -> List[Dict[str, str]]:
+    """
+    Scrape IceHQ website for available hockey sessions.
+
+    Args:
+        url: The URL to scrape
+        name: The name of the site (for logging)
+
+    Returns:
+        List of session dictionaries with 'session_type', 'date_time', 'status', 'site', 'url' keys
+    """
+    sessions = []
+    try:
+        for block in iter_icehq(url, name):
+            sessions.extend(block)
+    except DeadlineExceeded as e:
+        logger.error("Gave up on %s: %s (returning %s partial session(s))", name, e, len(sessions))
     return sessions
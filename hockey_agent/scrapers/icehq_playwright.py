@@ -1,9 +1,10 @@
 """Scraper for IceHQ website (icehq.com.au) using Playwright."""
 
 import logging
-import json
 import html
-from typing import List, Dict
+import re
+import time
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 
 # Try to import playwright-aws-lambda for Lambda environment, fall back to regular playwright
 try:
@@ -16,12 +17,25 @@ except ImportError:
     USING_AWS_LAMBDA = False
 
 from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+from hockey_agent import codec
+from hockey_agent.browser_profile import prepare_profile_dir, profile_launch_args, enforce_cache_cap
+from hockey_agent.scrape_trace import ScrapeRecorder
+from hockey_agent.columnar import filter_sessions
+from hockey_agent.watchdog import phase, checkpoint, browser_launch, DeadlineExceeded
 from hockey_agent.config import (
     HEADLESS_BROWSER,
     BROWSER_WAIT_TIME,
     MONITOR_DAYS,
     MONITOR_DATES,
-    MONITOR_SESSION_TYPES
+    MONITOR_SESSION_TYPES,
+    ICEHQ_CAPTURE_NETWORK_JSON,
+    ICEHQ_PRODUCT_URL_PATTERN,
+    ICEHQ_CAPTURE_SETTLE_MS,
+    SCRAPE_TRACE_DIR,
+    BROWSER_LOW_MEMORY,
+    LOW_MEMORY_CHROMIUM_ARGS,
+    LOW_MEMORY_VIEWPORT,
+    WARM_BROWSER_MAX_SCRAPES
 )
 
 logger = logging.getLogger(__name__)
@@ -100,132 +114,582 @@ def _matches_filter(session_date_str: str) -> bool:
         return False
 
     except Exception as e:
-        logger.warning(f"Error parsing date '{session_date_str}': {e}")
+        logger.warning("Error parsing date '%s': %s", session_date_str, e)
         return False
 
 
-def scrape_icehq(url: str, name: str) -> List[Dict[str, str]]:
+def _type_is_monitored(session_type: str) -> bool:
+    """Check if a session type matches MONITOR_SESSION_TYPES."""
+    if not MONITOR_SESSION_TYPES:
+        return True
+    session_type_lower = session_type.lower()
+    return any(monitored_type in session_type_lower for monitored_type in MONITOR_SESSION_TYPES)
+
+
+def _sessions_from_product(product_data: Dict, session_type: str, name: str, url: str) -> List[Dict[str, str]]:
     """
-    Scrape IceHQ website for available hockey sessions using Playwright.
+    Build session dictionaries from one product's variants.
 
     Args:
-        url: The URL to scrape
-        name: The name of the site (for logging)
+        product_data: Parsed product JSON (with a 'variants' list)
+        session_type: Session type name for this product
+        name: The name of the site
+        url: The URL the product came from
 
     Returns:
-        List of session dictionaries with 'session_type', 'date_time', 'status', 'site', 'url' keys
+        List of session dictionaries that pass the date/day filters
     """
     sessions = []
+    missing_date = 0
+
+    # Extract variants (each variant is a session date/time)
+    variants = product_data.get('variants', [])
+
+    for variant in variants:
+        # Get the date/time from attributes (try both possible keys)
+        attributes = variant.get('attributes', {})
+        date_time = attributes.get('Date/time') or attributes.get('Date and Time', '')
+        if not date_time:
+            missing_date += 1
+            continue
+
+        # Get availability status
+        is_sold_out = variant.get('soldOut', False)
+        qty_in_stock = variant.get('qtyInStock', 0)
+
+        status = 'SOLD OUT' if is_sold_out else 'AVAILABLE'
+
+        sessions.append({
+            'session_type': session_type,
+            'date_time': date_time,
+            'status': status,
+            'site': name,
+            'url': url,
+            'qty_in_stock': qty_in_stock
+        })
+
+    # Apply date/day filters to all variants at once
+    sessions = filter_sessions(sessions, _matches_filter)
+    available = sum(1 for session in sessions if session['status'] == 'AVAILABLE')
+
+    # One line per product instead of one per variant
+    logger.info("'%s': %d variant(s), %d matched (%d available, %d sold out), %d without date/time",
+                session_type, len(variants), len(sessions), available, len(sessions) - available, missing_date)
+    return sessions
 
-    try:
-        logger.info(f"Checking {name} with Playwright...")
 
-        with sync_playwright() as p:
-            # Launch browser
-            browser = p.chromium.launch(headless=HEADLESS_BROWSER)
-            page = browser.new_page()
+def _find_products(payload, found: Optional[List[Dict]] = None) -> List[Dict]:
+    """
+    Find product objects (dicts with a 'variants' list) anywhere in a JSON payload.
+
+    Args:
+        payload: Parsed JSON response body
+        found: Accumulator used during recursion
+
+    Returns:
+        List of product dictionaries
+    """
+    if found is None:
+        found = []
+
+    if isinstance(payload, dict):
+        if isinstance(payload.get('variants'), list):
+            found.append(payload)
+        else:
+            for value in payload.values():
+                _find_products(value, found)
+    elif isinstance(payload, list):
+        for item in payload:
+            _find_products(item, found)
 
+    return found
+
+
+def _product_title(product_data: Dict, default: str = "Unknown") -> str:
+    """Get the display name of a product from its JSON (default if it has none)."""
+    for key in ('title', 'name', 'productName'):
+        value = product_data.get(key)
+        if isinstance(value, str) and value.strip():
+            return value.strip()
+    return default
+
+
+def _capture_products(page, url: str, deadline: float) -> Optional[List[bytes]]:
+    """
+    Load the page while capturing product JSON from network responses.
+
+    Returns as soon as product payloads have arrived and no new ones have
+    appeared for ICEHQ_CAPTURE_SETTLE_MS, rather than waiting for networkidle.
+    The bodies are kept as they came; they're parsed one at a time after
+    the browser has been released (see _parse_catalogue).
+
+    Args:
+        page: Playwright page (not yet navigated)
+        url: The URL to load
+        deadline: time.monotonic() by which navigation and capture must be done
+
+    Returns:
+        Raw JSON bodies that mention product variants, or None if none were captured in time
+    """
+    url_pattern = re.compile(ICEHQ_PRODUCT_URL_PATTERN, re.IGNORECASE)
+    pending = []
+
+    def on_response(response):
+        # Only queue here - reading bodies inside an event handler can deadlock
+        if 'json' in response.headers.get('content-type', '') and url_pattern.search(response.url):
+            pending.append(response)
+
+    page.on('response', on_response)
+
+    payloads = []
+    seen_urls = set()
+    page.goto(url, wait_until='commit', timeout=max(deadline - time.monotonic(), 0.001) * 1000)
+
+    last_capture = None
+    while time.monotonic() < deadline:
+        while pending:
+            response = pending.pop(0)
+            if response.url in seen_urls:
+                continue
+            seen_urls.add(response.url)
+            try:
+                body = response.body()
+            except Exception as e:
+                logger.debug("Could not read body of %s: %s", response.url, e)
+                continue
+            # Product objects carry a "variants" list; anything else is skipped without parsing
+            if b'"variants"' in body:
+                logger.debug("Captured %s bytes of product JSON from %s", len(body), response.url)
+                payloads.append(body)
+                last_capture = time.monotonic()
+
+        if last_capture and (time.monotonic() - last_capture) * 1000 >= ICEHQ_CAPTURE_SETTLE_MS:
+            break
+        page.wait_for_timeout(50)
+
+    page.remove_listener('response', on_response)
+    return payloads or None
+
+
+def _products_from_dom(page, name: str) -> List[Tuple[str, str]]:
+    """
+    Read (heading, data-product text) pairs from the rendered product blocks.
+
+    Session types are named and filtered once the JSON is parsed, the same
+    way as for captured network JSON (see _parse_catalogue); the heading is
+    only the fallback name.
+
+    Args:
+        page: Playwright page that has finished loading
+        name: The name of the site (for logging)
+
+    Returns:
+        List of (heading, data_product) tuples
+    """
+    products = []
+
+    # Find all product blocks
+    product_blocks = page.query_selector_all('div.product-block')
+
+    if not product_blocks:
+        logger.warning("No product blocks found on %s", name)
+        return products
+
+    logger.info("Found %s product block(s) on %s", len(product_blocks), name)
+
+    # Process each product block
+    for idx, product_block in enumerate(product_blocks):
+        try:
+            # Get the heading (the session type if the JSON has no title)
+            session_type = "Unknown"
+            try:
+                heading = product_block.query_selector('h1, h2, h3, .product-title')
+                if heading:
+                    session_type = heading.inner_text().strip()
+            except:
+                logger.debug("Could not find heading for product block %s", idx)
+                pass
+
+            # Get the data-product attribute
+            data_product = product_block.get_attribute('data-product')
+            if not data_product:
+                logger.warning("No data-product attribute found for '%s'", session_type)
+                continue
+
+            products.append((session_type, data_product))
+
+        except Exception as e:
+            logger.error("Error processing product block %s: %s", idx, e,
+                         exc_info=logger.isEnabledFor(logging.DEBUG))
+            continue
+
+    return products
+
+
+def _launch(p, profile_dir: Optional[str], context_options: Dict):
+    """
+    Launch Chromium and open a browser context.
+
+    Args:
+        p: Playwright instance
+        profile_dir: Persistent profile directory, or None for a fresh profile
+        context_options: Extra keyword arguments for the context (e.g. HAR recording)
+
+    Returns:
+        (closeable, context) - closing the first shuts everything down. For a
+        persistent profile both are the same persistent context.
+    """
+    args = list(LOW_MEMORY_CHROMIUM_ARGS) if BROWSER_LOW_MEMORY else []
+    if BROWSER_LOW_MEMORY:
+        context_options = dict(context_options, viewport=LOW_MEMORY_VIEWPORT)
+
+    with browser_launch():
+        if profile_dir:
+            context = p.chromium.launch_persistent_context(
+                profile_dir,
+                headless=HEADLESS_BROWSER,
+                args=args + profile_launch_args(profile_dir),
+                **context_options
+            )
+            return context, context
+
+        browser = p.chromium.launch(headless=HEADLESS_BROWSER, args=args)
+    return browser, browser.new_context(**context_options)
+
+
+def _load_products(page, url: str, name: str) -> List[Tuple[Optional[str], Union[str, bytes]]]:
+    """
+    Load the page and collect the raw product JSON to parse (see _parse_catalogue).
+
+    Args:
+        page: Playwright page
+        url: The URL to scrape
+        name: The name of the site (for logging)
+
+    Returns:
+        (heading, data-product text) pairs for the product blocks, or
+        (None, response body) pairs for captured network JSON
+    """
+    with phase('load'):
+        if ICEHQ_CAPTURE_NETWORK_JSON:
+            # One BROWSER_WAIT_TIME budget for the capture and the DOM fallback together
+            deadline = time.monotonic() + BROWSER_WAIT_TIME
+
+            # Take product JSON straight from the network, skipping the DOM
+            captured = _capture_products(page, url, deadline)
+            if captured:
+                logger.info("Captured %s product payload(s) from network responses on %s", len(captured), name)
+                return [(None, body) for body in captured]
+
+            logger.warning("No product JSON captured on %s, falling back to DOM", name)
+            remaining = deadline - time.monotonic()
+            if remaining > 0:
+                try:
+                    page.wait_for_load_state('networkidle', timeout=remaining * 1000)
+                except PlaywrightTimeoutError:
+                    logger.warning("%s still loading after %ss; reading the page as it is", name, BROWSER_WAIT_TIME)
+        else:
             # Navigate to the page
             page.goto(url, wait_until='networkidle', timeout=BROWSER_WAIT_TIME * 1000)
 
             # Wait a bit for JavaScript to render
             page.wait_for_timeout(3000)
 
-            # Find all product blocks
-            product_blocks = page.query_selector_all('div.product-block')
+        # Reading the DOM still talks to the browser, so it stays in a browser phase
+        return _products_from_dom(page, name)
+
+
+class WarmBrowser:
+    """Keeps Playwright and a browser context open between scrapes.
+
+    Each scrape opens a fresh page in the shared context, so the launch is
+    paid once and the HTTP cache stays warm. The browser is relaunched when
+    it has died (e.g. killed by the watchdog) or after WARM_BROWSER_MAX_SCRAPES
+    scrapes, to bound memory growth.
+
+    Playwright's sync API is bound to the thread that started it, so every
+    call must come from the same thread.
+    """
+
+    def __init__(self, max_scrapes: int = WARM_BROWSER_MAX_SCRAPES):
+        self.max_scrapes = max_scrapes
+        self.scrapes = 0
+        self.launches = 0
+        self._playwright = None
+        self._closeable = None
+        self._context = None
+        self._profile_dir = None
+        self._closed = False
+
+    @property
+    def alive(self) -> bool:
+        """True if the browser is running and its context is open."""
+        return self._context is not None and not self._closed
+
+    def _on_close(self, _context=None):
+        self._closed = True
+
+    def acquire(self):
+        """
+        Get the warm context, (re)launching the browser if needed.
+
+        Returns:
+            Playwright browser context
+        """
+        if self.alive and self.max_scrapes and self.scrapes >= self.max_scrapes:
+            logger.info("Recycling warm browser after %s scrape(s)", self.scrapes)
+            self.close()
+        elif self._context is not None and not self.alive:
+            logger.warning("Warm browser died, relaunching")
+            self.close()
+
+        if self._context is None:
+            if self._playwright is None:
+                self._playwright = sync_playwright().start()
+            self._profile_dir = prepare_profile_dir()
+            self._closeable, self._context = _launch(self._playwright, self._profile_dir, {})
+            self._closed = False
+            self._context.on('close', self._on_close)
+            self.launches += 1
+            self.scrapes = 0
+
+        self.scrapes += 1
+        return self._context
+
+    def close(self):
+        """Shut the browser down (Playwright itself stays running for the next launch)."""
+        if self._closeable is not None:
+            try:
+                self._closeable.close()
+            except Exception as e:
+                logger.debug("Error closing warm browser: %s", e)
+        if self._profile_dir:
+            enforce_cache_cap(self._profile_dir)
+        self._closeable = self._context = self._profile_dir = None
+
+    def stop(self):
+        """Close the browser and stop Playwright."""
+        self.close()
+        if self._playwright is not None:
+            try:
+                self._playwright.stop()
+            except Exception as e:
+                logger.debug("Error stopping Playwright: %s", e)
+            self._playwright = None
+
+
+_warm: Optional[WarmBrowser] = None
+
+
+def enable_warm_browser() -> WarmBrowser:
+    """
+    Make scrapes on the calling thread reuse a warm browser.
+
+    Returns:
+        The WarmBrowser (launched lazily on the first scrape)
+    """
+    global _warm
+    if _warm is None:
+        _warm = WarmBrowser()
+    return _warm
+
+
+def stop_warm_browser():
+    """Shut down the warm browser (call from the thread that used it)."""
+    global _warm
+    if _warm is not None:
+        _warm.stop()
+        _warm = None
+
+
+def _scrape_page(page, context, url: str, name: str,
+                 recorder: Optional[ScrapeRecorder]) -> List[Tuple[Optional[str], Union[str, bytes]]]:
+    """Load one page and return its raw product JSON (see _load_products)."""
+    if recorder:
+        recorder.start(context, page)
+
+    failed = True
+    try:
+        products = _load_products(page, url, name)
+        failed = False
+        return products
+
+    finally:
+        # Trace must be saved before the context closes; the HAR is written on close
+        if recorder:
+            recorder.stop(context, failed)
+
+
+def _load_catalogue(url: str, name: str) -> List[Tuple[Optional[str], Union[str, bytes]]]:
+    """
+    Load the page and collect its raw product JSON, then let the browser go.
 
-            if not product_blocks:
-                logger.warning(f"No product blocks found on {name}")
-                browser.close()
-                return sessions
+    Uses the warm browser if enable_warm_browser() was called, otherwise
+    launches (and closes) a browser for this scrape.
 
-            logger.info(f"Found {len(product_blocks)} product block(s) on {name}")
+    Returns:
+        Raw product JSON as returned by _load_products (empty on error)
+    """
+    products = []
+    warm = _warm
+    profile_dir = None if warm else prepare_profile_dir()
+    recorder = ScrapeRecorder(name) if SCRAPE_TRACE_DIR else None
+    # A warm context already exists, so it can't record a HAR (the trace is still kept)
+    context_options = recorder.context_options() if recorder and not warm else {}
 
-            # Process each product block
-            for idx, product_block in enumerate(product_blocks):
+    try:
+        logger.info("Checking %s with Playwright%s...", name, ' (warm)' if warm else '')
+
+        if warm:
+            with phase('launch'):
+                context = warm.acquire()
+                page = context.new_page()
+            try:
+                products = _scrape_page(page, context, url, name, recorder)
+            finally:
                 try:
-                    # Get the session type from the heading
-                    session_type = "Unknown"
-                    try:
-                        heading = product_block.query_selector('h1, h2, h3, .product-title')
-                        if heading:
-                            session_type = heading.inner_text().strip()
-                    except:
-                        logger.debug(f"Could not find heading for product block {idx}")
-                        pass
-
-                    # Check if this session type matches our filters
-                    session_type_lower = session_type.lower()
-                    if MONITOR_SESSION_TYPES:
-                        if not any(monitored_type in session_type_lower for monitored_type in MONITOR_SESSION_TYPES):
-                            logger.debug(f"Skipping '{session_type}' - not in monitored types")
-                            continue
-
-                    # Get the data-product attribute
-                    data_product = product_block.get_attribute('data-product')
-                    if not data_product:
-                        logger.warning(f"No data-product attribute found for '{session_type}'")
-                        continue
-
-                    # Unescape HTML entities and parse JSON
-                    try:
-                        # Unescape &quot; etc.
-                        unescaped_json = html.unescape(data_product)
-                        product_data = json.loads(unescaped_json)
-                    except json.JSONDecodeError as e:
-                        logger.error(f"Failed to parse JSON for '{session_type}': {e}")
-                        logger.debug(f"Raw data: {data_product[:200]}...")
-                        continue
-
-                    # Extract variants (each variant is a session date/time)
-                    variants = product_data.get('variants', [])
-                    logger.info(f"Processing '{session_type}' with {len(variants)} variant(s)")
-
-                    for variant in variants:
-                        # Get the date/time from attributes (try both possible keys)
-                        attributes = variant.get('attributes', {})
-                        date_time = attributes.get('Date/time') or attributes.get('Date and Time', '')
-                        if not date_time:
-                            logger.debug(f"Variant missing date/time attribute: {variant}")
-                            continue
-
-                        # Get availability status
-                        is_sold_out = variant.get('soldOut', False)
-                        qty_in_stock = variant.get('qtyInStock', 0)
-
-                        # Apply date/day filters
-                        if not _matches_filter(date_time):
-                            continue
-
-                        status = 'SOLD OUT' if is_sold_out else 'AVAILABLE'
-
-                        sessions.append({
-                            'session_type': session_type,
-                            'date_time': date_time,
-                            'status': status,
-                            'site': name,
-                            'url': url,
-                            'qty_in_stock': qty_in_stock
-                        })
-
-                        logger.debug(f"  {status} ({qty_in_stock} spots): {date_time}")
+                    page.close()
+                except Exception as e:
+                    logger.debug("Could not close page: %s", e)
+        else:
+            with sync_playwright() as p:
+                # Launch browser
+                with phase('launch'):
+                    browser, context = _launch(p, profile_dir, context_options)
+                    page = context.pages[0] if context.pages else context.new_page()
+                try:
+                    products = _scrape_page(page, context, url, name, recorder)
+                finally:
+                    # Close browser
+                    browser.close()
+
+    except PlaywrightTimeoutError as e:
+        logger.error("Timeout loading %s: %s", name, e)
+    except DeadlineExceeded as e:
+        logger.error("Gave up on %s: %s", name, e)
+    except Exception as e:
+        logger.error("Error scraping %s: %s", name, e, exc_info=logger.isEnabledFor(logging.DEBUG))
+
+    finally:
+        if recorder:
+            recorder.finish()
+        if profile_dir:
+            enforce_cache_cap(profile_dir)
+
+    return products
+
 
+def _parse_catalogue(catalogue: List[Tuple[Optional[str], Union[str, bytes]]]) -> Iterator[Tuple[str, Dict]]:
+    """
+    Parse raw product JSON one item at a time, dropping each as it is parsed.
+
+    Products are named from their JSON title whether they were captured from
+    the network or read from the DOM, so session IDs (and the type filter)
+    don't change when the scraper falls back from one to the other.
+
+    Args:
+        catalogue: Raw product JSON as returned by _load_products (emptied as it goes)
+
+    Yields:
+        (session_type, product_data) for monitored session types
+    """
+    catalogue.reverse()
+    while catalogue:
+        heading, raw = catalogue.pop()
+
+        if heading is None:
+            # A captured response body, possibly holding several products
+            try:
+                found = _find_products(codec.loads(raw))
+            except codec.JSONDecodeError as e:
+                logger.debug("Could not parse captured JSON: %s", e)
+                continue
+        else:
+            # Unescape HTML entities and parse JSON
+            try:
+                # Unescape &quot; etc.
+                found = [codec.loads(html.unescape(raw))]
+            except codec.JSONDecodeError as e:
+                logger.error("Failed to parse JSON for '%s': %s", heading, e)
+                logger.debug("Raw data: %s...", raw[:200])
+                continue
+        del raw
+
+        for product_data in found:
+            session_type = _product_title(product_data, default=heading or "Unknown")
+            if not _type_is_monitored(session_type):
+                logger.debug("Skipping '%s' - not in monitored types", session_type)
+                continue
+            yield session_type, product_data
+
+
+def iter_icehq(url: str, name: str) -> Iterator[List[Dict[str, str]]]:
+    """
+    Scrape IceHQ with Playwright, yielding matching sessions one product at a time.
+
+    The browser work (launch and load) happens up front and only collects
+    the raw product JSON; the browser is released before anything is
+    parsed. Each product is then parsed just before its sessions are
+    yielded and dropped once they've been built, so only one product's
+    sessions exist at a time unless the caller keeps them.
+
+    Args:
+        url: The URL to scrape
+        name: The name of the site (for logging)
+
+    Yields:
+        Lists of session dictionaries with 'session_type', 'date_time', 'status', 'site', 'url' keys
+
+    Raises:
+        DeadlineExceeded: If the extract phase runs out of time (earlier blocks were already yielded)
+    """
+    products = _parse_catalogue(_load_catalogue(url, name))
+    matched = 0
+    # The extract budget covers parsing each product, not the caller's work on its block
+    extract_spent = 0.0
+
+    while True:
+        started = time.monotonic()
+        try:
+            with phase('extract', spent=extract_spent):
+                checkpoint()
+                product = next(products, None)
+                if product is None:
+                    break
+                session_type, product_data = product
+                del product
+                try:
+                    sessions = _sessions_from_product(product_data, session_type, name, url)
                 except Exception as e:
-                    logger.error(f"Error processing product block {idx}: {e}")
-                    import traceback
-                    logger.debug(traceback.format_exc())
+                    logger.error("Error processing product '%s': %s", session_type, e,
+                                 exc_info=logger.isEnabledFor(logging.DEBUG))
                     continue
+                del product_data
+        finally:
+            extract_spent += time.monotonic() - started
 
-            logger.info(f"Found {len(sessions)} matching sessions on {name}")
+        matched += len(sessions)
+        if sessions:
+            yield sessions
 
-            # Close browser
-            browser.close()
+    logger.info("Found %s matching sessions on %s", matched, name)
 
-    except PlaywrightTimeoutError as e:
-        logger.error(f"Timeout loading {name}: {e}")
-    except Exception as e:
-        logger.error(f"Error scraping {name}: {e}")
-        import traceback
-        logger.debug(traceback.format_exc())
 
+def scrape_icehq(url: str, name: str) -> List[Dict[str, str]]:
+    """
+    Scrape IceHQ website for available hockey sessions using Playwright.
+
+    Args:
+        url: The URL to scrape
+        name: The name of the site (for logging)
+
+    Returns:
+        List of session dictionaries with 'session_type', 'date_time', 'status', 'site', 'url' keys
+    """
+    sessions = []
+    try:
+        for block in iter_icehq(url, name):
+            sessions.extend(block)
+    except DeadlineExceeded as e:
+        logger.error("Gave up on %s: %s (returning %s partial session(s))", name, e, len(sessions))
     return sessions
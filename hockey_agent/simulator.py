@@ -0,0 +1,332 @@
+"""Replay inventory timelines against polling policies on a virtual clock.
+
+A timeline is one session's status changes over time. It is either
+replayed from HISTORY_FILE (only as fine-grained as the real polls that
+recorded it) or generated by synthetic_timelines(). In a synthetic
+timeline a session sells out, then players drop out at random, more
+often in the LEAD_HOURS before it starts. Each freed spot is taken again
+after a while.
+
+simulate() runs one policy as a discrete-event simulation: inventory
+changes, session starts and polls sit in one heap ordered by virtual time.
+Each poll diffs the inventory it sees with scraper.diff_block(), the same
+rule a real check uses (flap hysteresis included), against an in-memory
+seen store.
+
+A reopening is a SOLD OUT -> AVAILABLE change. It is detected when a poll
+notifies REOPENED for that session while the spot is still open. It is
+missed when the spot is taken again (or the session starts) first, which
+includes reopenings whose notification was suppressed.
+"""
+
+import heapq
+import math
+import random
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from hockey_agent.columnar import session_id
+from hockey_agent.dates import format_label, parse_session_times
+from hockey_agent.flap import NEW, REOPENED, SUPPRESSED
+from hockey_agent.history import HistoryStore
+from hockey_agent.scraper import diff_block, remember_states
+
+AVAILABLE = 'AVAILABLE'
+SOLD_OUT = 'SOLD OUT'
+
+# Spots mostly open up in the last couple of days, when people cancel
+LEAD_HOURS = 48
+
+# Heap event kinds; at the same time, changes apply before a poll sees them
+_CHANGE, _START, _POLL = 0, 1, 2
+
+
+class Timeline(NamedTuple):
+    """One session's inventory over time."""
+    session: Dict  # site, session_type, date_time, url
+    start: float  # epoch time the session starts (it is no longer listed after)
+    changes: List[Tuple[float, str]]  # (epoch time, status), oldest first
+
+
+class Poll(NamedTuple):
+    """What a policy is told after each poll."""
+    time: float
+    changes: int  # reopenings and new sessions notified by this poll
+    soonest_sold_out: Optional[float]  # start time of the soonest sold-out session, if any
+
+
+class SimulationResult(NamedTuple):
+    """Outcome of simulating one policy."""
+    policy: str
+    scrapes: int
+    compute_seconds: float
+    reopenings: int
+    detected: int
+    missed: int
+    suppressed: int
+    latencies: List[float]  # seconds from each detected reopening to its notification
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Detection latency in seconds at a percentile (nearest rank), or None if nothing was detected."""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        rank = max(1, math.ceil(percentile / 100 * len(ordered)))
+        return ordered[rank - 1]
+
+
+class FixedInterval:
+    """Poll every N minutes (what main.py and the Lambda schedule do)."""
+
+    def __init__(self, minutes: float):
+        self.minutes = minutes
+        self.name = f"every {minutes:g} min"
+
+    def interval(self, poll: Poll) -> float:
+        return self.minutes * 60
+
+
+class LeadTimePolicy:
+    """Poll fast while a sold-out session starts within lead_hours, slowly otherwise."""
+
+    def __init__(self, fast_minutes: float = 5, slow_minutes: float = 30, lead_hours: float = LEAD_HOURS):
+        self.fast = fast_minutes * 60
+        self.slow = slow_minutes * 60
+        self.lead = lead_hours * 3600
+        self.name = f"{fast_minutes:g} min within {lead_hours:g}h, else {slow_minutes:g}"
+
+    def interval(self, poll: Poll) -> float:
+        if poll.soonest_sold_out is not None and poll.soonest_sold_out - poll.time <= self.lead:
+            return self.fast
+        return self.slow
+
+
+class BackoffPolicy:
+    """Poll fast after a change, backing off by factor per quiet poll up to slow_minutes."""
+
+    def __init__(self, fast_minutes: float = 5, slow_minutes: float = 60, factor: float = 1.5):
+        self.fast = fast_minutes * 60
+        self.slow = slow_minutes * 60
+        self.factor = factor
+        self._current = self.fast
+        self.name = f"backoff {fast_minutes:g}-{slow_minutes:g} min"
+
+    def interval(self, poll: Poll) -> float:
+        if poll.changes:
+            self._current = self.fast
+        else:
+            self._current = min(self.slow, self._current * self.factor)
+        return self._current
+
+
+def simulate(timelines: List[Timeline], policy, start: float, end: float, scrape_seconds: float = 20,
+             booked: Optional[Set[str]] = None) -> SimulationResult:
+    """
+    Run one polling policy over the timelines.
+
+    Args:
+        timelines: Session timelines
+        policy: Object with a name and interval(poll) -> seconds to the next poll
+        start: Epoch time of the first poll
+        end: Epoch time to stop at
+        scrape_seconds: Compute time one check costs
+        booked: Booked date/time strings (left out of the diff)
+
+    Returns:
+        SimulationResult for the policy
+    """
+    booked = booked or set()
+    heap: List[Tuple[float, int, int, Optional[str]]] = []
+    index_of: Dict[str, int] = {}
+    for i, timeline in enumerate(timelines):
+        index_of[session_id(timeline.session)] = i
+        heap.append((timeline.start, _START, i, None))
+        heap.extend((t, _CHANGE, i, status) for t, status in timeline.changes)
+    heap.append((start, _POLL, -1, None))
+    heapq.heapify(heap)
+
+    listed: Dict[int, str] = {}  # session index -> current status, while listed
+    open_since: Dict[int, float] = {}  # session index -> when its undetected reopening started
+    stored: Dict[str, Dict] = {}
+    previous: Dict[str, Optional[str]] = {}
+    scrapes = reopenings = missed = suppressed = 0
+    latencies: List[float] = []
+
+    while heap:
+        now, kind, i, status = heapq.heappop(heap)
+        if now > end:
+            break
+
+        if kind == _CHANGE:
+            if i not in listed and timelines[i].start <= now:
+                continue
+            was = listed.get(i)
+            listed[i] = status
+            if was == SOLD_OUT and status == AVAILABLE:
+                reopenings += 1
+                open_since[i] = now
+            elif status == SOLD_OUT and open_since.pop(i, None) is not None:
+                missed += 1
+
+        elif kind == _START:
+            listed.pop(i, None)
+            if open_since.pop(i, None) is not None:
+                missed += 1
+
+        else:
+            scrapes += 1
+            sessions = [dict(timelines[j].session, status=status) for j, status in listed.items()]
+            updates = {}
+            flap_states = {}
+            changes = 0
+            for session, sid, _, state, event in diff_block(sessions, stored, previous, booked, True, now):
+                if state is None or sid in updates:
+                    continue
+                if event == REOPENED:
+                    changes += 1
+                    since = open_since.pop(index_of[sid], None)
+                    if since is not None:
+                        latencies.append(now - since)
+                elif event == NEW:
+                    changes += 1
+                elif event in SUPPRESSED:
+                    suppressed += 1
+                flap_states[sid] = state
+                updates[sid] = session
+            remember_states(updates, flap_states, stored, previous)
+
+            sold_out = [timelines[j].start for j, status in listed.items() if status == SOLD_OUT]
+            poll = Poll(now, changes, min(sold_out) if sold_out else None)
+            heapq.heappush(heap, (now + max(1.0, policy.interval(poll)), _POLL, -1, None))
+
+    return SimulationResult(
+        policy=policy.name,
+        scrapes=scrapes,
+        compute_seconds=scrapes * scrape_seconds,
+        reopenings=reopenings,
+        detected=len(latencies),
+        missed=missed,
+        suppressed=suppressed,
+        latencies=latencies,
+    )
+
+
+def synthetic_timelines(sessions: int = 40, days: float = 7, start: Optional[float] = None, seed: int = 1,
+                        dropouts_per_day: float = 1.0, lead_boost: float = 4.0,
+                        refill_minutes: float = 20) -> List[Timeline]:
+    """
+    Generate sell-out and drop-out timelines.
+
+    Each session is listed (available) at start and starts between 1 and
+    days days later. It sells out after an exponential time with a mean of
+    a day. After that, drop-outs arrive at dropouts_per_day, multiplied by
+    lead_boost in the last LEAD_HOURS. Each freed spot is taken again after
+    an exponential time with a mean of refill_minutes.
+
+    Args:
+        sessions: Number of sessions
+        days: Length of the listing horizon in days
+        start: Epoch time the sessions are listed (defaults to now, rounded down to the hour)
+        seed: Random seed
+        dropouts_per_day: Drop-out rate per sold-out session, away from its start
+        lead_boost: Drop-out rate multiplier within LEAD_HOURS of the start
+        refill_minutes: Mean time for a freed spot to be taken again
+
+    Returns:
+        Timelines, one per session
+    """
+    rng = random.Random(seed)
+    start = start if start is not None else time.time() // 3600 * 3600
+    timelines = []
+
+    for i in range(sessions):
+        session_start = start + 86400 * rng.uniform(1, max(1.0, days))
+        session_start -= session_start % 1800
+        begins = datetime.fromtimestamp(session_start)
+        label = format_label(begins, [(begins.hour, begins.minute), ((begins.hour + 1) % 24, begins.minute)])
+        session = {
+            'site': 'Simulated Rink',
+            'session_type': f"Stick & Puck #{i + 1}",
+            'date_time': label,
+            'url': '',
+            'qty_in_stock': 0,
+        }
+
+        changes = [(start, AVAILABLE)]
+        t = start + rng.expovariate(1 / 86400)
+        lead_from = session_start - LEAD_HOURS * 3600
+        while t < session_start:
+            changes.append((t, SOLD_OUT))
+
+            # Next drop-out; the rate steps up at lead_from (memoryless, so redraw from there)
+            rate = dropouts_per_day / 86400
+            gap = rng.expovariate(rate * (lead_boost if t >= lead_from else 1))
+            if t < lead_from and t + gap > lead_from:
+                gap = lead_from - t + rng.expovariate(rate * lead_boost)
+            t += gap
+            if t >= session_start:
+                break
+            changes.append((t, AVAILABLE))
+            t += rng.expovariate(1 / (refill_minutes * 60))
+
+        timelines.append(Timeline(session, session_start, changes))
+    return timelines
+
+
+def recorded_timelines(store: HistoryStore) -> List[Timeline]:
+    """
+    Build timelines from recorded inventory history.
+
+    Sessions whose start time can't be parsed from their ID are skipped.
+
+    Args:
+        store: Loaded HistoryStore (see history.load_history)
+
+    Returns:
+        Timelines, one per session with history
+    """
+    timelines = []
+    for key, history in store.sessions.items():
+        samples = list(history.samples())
+        date_time = store.date_time(key)
+        if not samples or not date_time or not key.endswith(':' + date_time):
+            continue
+
+        # Session IDs are "site:session type:date/time" (site names have no colons)
+        site, _, session_type = key[:-len(date_time) - 1].partition(':')
+        times = parse_session_times(date_time, datetime.fromtimestamp(samples[0][0]))
+        if times is None:
+            continue
+
+        changes: List[Tuple[float, str]] = []
+        for timestamp, _, sold_out in samples:
+            status = SOLD_OUT if sold_out else AVAILABLE
+            if not changes or changes[-1][1] != status:
+                changes.append((float(timestamp), status))
+
+        session = {'site': site, 'session_type': session_type, 'date_time': date_time, 'url': '', 'qty_in_stock': 0}
+        timelines.append(Timeline(session, times[0].timestamp(), changes))
+    return timelines
+
+
+def compare_policies(timelines: List[Timeline], policies: Iterable, scrape_seconds: float = 20,
+                     start: Optional[float] = None, end: Optional[float] = None) -> List[SimulationResult]:
+    """
+    Simulate each policy over the same timelines.
+
+    Args:
+        timelines: Session timelines
+        policies: Policy objects (see simulate)
+        scrape_seconds: Compute time one check costs
+        start: First poll (defaults to the first change)
+        end: End of the simulation (defaults to the last change; nothing is
+            known after it when replaying history)
+
+    Returns:
+        One SimulationResult per policy, in order
+    """
+    if not timelines:
+        return []
+    start = start if start is not None else min(t.changes[0][0] for t in timelines if t.changes)
+    end = end if end is not None else max(t.changes[-1][0] for t in timelines if t.changes)
+    return [simulate(timelines, policy, start, end, scrape_seconds) for policy in policies]
@@ -0,0 +1,145 @@
+"""SMS encoding, segment counting and message packing.
+
+Carriers bill per segment, not per message. A message that only uses the
+GSM-7 alphabet fits 160 characters in one segment (153 per segment when
+concatenated); a single character outside it (any emoji, curly quotes,
+en dashes) switches the whole message to UCS-2 at 70 (67) characters per
+segment. Messages are therefore written in compact GSM-7 by default:
+abbreviated dates, no emoji, common typographic characters replaced by
+their plain equivalents. Sessions are packed into as few messages as
+possible, each at most SMS_MAX_SEGMENTS segments long.
+"""
+
+from typing import Dict, List, Tuple
+from hockey_agent.config import SMS_MAX_SEGMENTS, SMS_EMOJI
+from hockey_agent.dates import short_label
+
+GSM7 = 'GSM-7'
+UCS2 = 'UCS-2'
+
+# GSM 03.38 basic character set (one septet each)
+_GSM_BASIC = set(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+# Extension table (escape + character, two septets each)
+_GSM_EXTENDED = set("^{}\\[~]|€\f")
+
+_SINGLE_LIMITS = {GSM7: 160, UCS2: 70}
+_MULTI_LIMITS = {GSM7: 153, UCS2: 67}
+
+# Typographic characters sites and editors like, and what to send instead
+_GSM_REPLACEMENTS = str.maketrans({
+    '‘': "'", '’': "'", '“': '"', '”': '"',
+    '–': '-', '—': '-', '•': '-', ' ': ' ',
+    '…': '...', '\t': ' ',
+})
+
+
+def encoding(text: str) -> str:
+    """Get the encoding a message will be sent in (GSM7 or UCS2)."""
+    return GSM7 if all(c in _GSM_BASIC or c in _GSM_EXTENDED for c in text) else UCS2
+
+
+def _length(text: str, text_encoding: str) -> int:
+    """Length in septets (GSM-7) or UTF-16 code units (UCS-2)."""
+    if text_encoding == GSM7:
+        return len(text) + sum(1 for c in text if c in _GSM_EXTENDED)
+    return len(text.encode('utf-16-le')) // 2
+
+
+def segment_count(text: str) -> int:
+    """
+    Count the billed segments of a message.
+
+    Args:
+        text: Message body
+
+    Returns:
+        Number of segments (at least 1)
+    """
+    text_encoding = encoding(text)
+    length = _length(text, text_encoding)
+    if length <= _SINGLE_LIMITS[text_encoding]:
+        return 1
+    return -(-length // _MULTI_LIMITS[text_encoding])
+
+
+def describe(text: str) -> Tuple[str, int]:
+    """Get (encoding, segment count) of a message."""
+    return encoding(text), segment_count(text)
+
+
+def to_gsm(text: str) -> str:
+    """Replace typographic characters that would force UCS-2 with plain ones."""
+    return text.translate(_GSM_REPLACEMENTS)
+
+
+def format_session(session: Dict[str, str]) -> str:
+    """One compact line for a session, e.g. "Stick & Puck Sat 8 Nov 10-11am"."""
+    return to_gsm(f"{session.get('session_type', '')} {short_label(session.get('date_time', ''))}".strip())
+
+
+def _header(opened: int, new: int, emoji: bool) -> str:
+    counts = []
+    if opened:
+        counts.append(f"{opened} opened")
+    if new:
+        counts.append(f"{new} new")
+    return ("🏒 " if emoji else "") + "Hockey: " + ", ".join(counts)
+
+
+def pack_messages(sessions: List[Dict[str, str]], newly_available_count: int = 0,
+                  max_segments: int = SMS_MAX_SEGMENTS, emoji: bool = SMS_EMOJI) -> List[str]:
+    """
+    Pack sessions into as few SMS messages as possible.
+
+    Sessions are added in order, one line each, until the next one would
+    take the message over max_segments; then a new message is started.
+    When there is more than one message, each header is numbered "(1/2)".
+    The booking link only goes in the last message.
+
+    Args:
+        sessions: List of session dictionaries (newly available ones first)
+        newly_available_count: Number of sessions that were sold out but now have spots
+        max_segments: Most segments per message
+        emoji: Decorate the messages with emoji (forces UCS-2)
+
+    Returns:
+        Message bodies
+    """
+    if not sessions:
+        return []
+
+    header = _header(newly_available_count, len(sessions) - newly_available_count, emoji)
+    headings = {
+        True: "🔥 OPENED:" if emoji else "OPENED:",
+        False: "✨ NEW:" if emoji else "NEW:",
+    }
+    url = sessions[0].get('url', '')
+    # Leave room for the part number and the link in every message
+    reserve = [url] if url else []
+    numbered_header = f"{header} (99/99)"
+
+    messages: List[List[str]] = []
+    current: List[str] = []
+    section = None
+    for i, session in enumerate(sessions):
+        opened = i < newly_available_count
+        lines = ([headings[opened]] if opened != section else []) + [format_session(session)]
+
+        if current and segment_count('\n'.join([numbered_header] + current + lines + reserve)) > max_segments:
+            messages.append(current)
+            current = []
+            # Repeat the section heading at the top of the next message
+            lines = [headings[opened], format_session(session)]
+
+        current.extend(lines)
+        section = opened
+    messages.append(current)
+
+    bodies = []
+    for part, lines in enumerate(messages, 1):
+        part_header = f"{header} ({part}/{len(messages)})" if len(messages) > 1 else header
+        bodies.append('\n'.join([part_header] + lines + (reserve if part == len(messages) else [])))
+    return bodies
@@ -0,0 +1,318 @@
+"""Last-scrape snapshot with fast "what's coming up" queries.
+
+Every check saves the sessions it saw to SNAPSHOT_FILE, writing them out
+as they are scraped (SnapshotWriter) rather than collecting them first. The snapshot is
+indexed in memory by start time, grouped by session type, so queries like
+"next 5 available stick & puck" are a bisect plus a short walk instead of
+a browser launch. Results always carry the snapshot's age so callers can
+tell how fresh the data is.
+"""
+
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from itertools import islice
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from hockey_agent import codec, filestore
+from hockey_agent.config import SNAPSHOT_FILE, JSON_PRETTY
+from hockey_agent.dates import parse_session_times
+
+logger = logging.getLogger(__name__)
+
+# Fields kept in the snapshot file
+SNAPSHOT_FIELDS = ('session_type', 'date_time', 'status', 'qty_in_stock', 'site', 'url', 'is_booked')
+
+
+class SnapshotIndex:
+    """Sessions from one snapshot, sorted by start time and grouped by type."""
+
+    def __init__(self, sessions: Iterable[Dict], taken_at: float):
+        """
+        Build the index.
+
+        Args:
+            sessions: Session dictionaries from a scrape
+            taken_at: Epoch time the snapshot was taken
+        """
+        self.taken_at = taken_at
+        self.size = 0
+        # session type (lower case) -> (sorted start times, sessions in the same order)
+        self._groups: Dict[str, tuple] = {}
+        self._seen_at = datetime.fromtimestamp(taken_at)
+        self._grouped: Dict[str, List[tuple]] = {}
+
+        for session in sessions:
+            self.add(session)
+        self.sort()
+
+    def add(self, session: Dict):
+        """Add a session while building the index (queries only see it after sort())."""
+        self.size += 1
+        times = parse_session_times(session.get('date_time', ''), self._seen_at)
+        if times is None:
+            return
+        start = times[0].timestamp()
+        key = session.get('session_type', '').lower()
+        self._grouped.setdefault(key, []).append((start, dict(session, start=start)))
+
+    def sort(self):
+        """Sort the added sessions into the groups queries use (once, after the last add())."""
+        for key, entries in self._grouped.items():
+            entries.sort(key=lambda e: e[0])
+            self._groups[key] = ([e[0] for e in entries], [e[1] for e in entries])
+        self._grouped = {}
+
+    @property
+    def age_seconds(self) -> float:
+        """Seconds since the snapshot was taken."""
+        return time.time() - self.taken_at
+
+    @property
+    def session_types(self) -> List[str]:
+        """Session types present in the snapshot."""
+        return sorted(self._groups)
+
+    def _iter_from(self, now: float, session_type: Optional[str]):
+        """Merge matching type groups into one stream of sessions starting at or after now."""
+        streams = []
+        for key, (starts, sessions) in self._groups.items():
+            if session_type and session_type.lower() not in key:
+                continue
+            idx = bisect_left(starts, now)
+            streams.append(islice(zip(starts, sessions), idx, None))
+
+        for _, session in heapq.merge(*streams, key=lambda e: e[0]):
+            yield session
+
+    def upcoming(self, n: int = 5, session_type: Optional[str] = None, available_only: bool = True,
+                 include_booked: bool = False, now: Optional[float] = None) -> List[Dict]:
+        """
+        Get the next sessions by start time.
+
+        Args:
+            n: Maximum number of sessions to return
+            session_type: Only include types containing this text (case-insensitive)
+            available_only: Skip sold-out sessions
+            include_booked: Include sessions you've already booked
+            now: Epoch time to search from (defaults to now)
+
+        Returns:
+            Up to n session dictionaries (each with a 'start' epoch time), soonest first
+        """
+        results = []
+        for session in self._iter_from(time.time() if now is None else now, session_type):
+            if available_only and session.get('status') != 'AVAILABLE':
+                continue
+            if not include_booked and session.get('is_booked'):
+                continue
+            results.append(session)
+            if len(results) >= n:
+                break
+        return results
+
+    def search(self, text: str, n: int = 20, available_only: bool = False,
+               now: Optional[float] = None) -> List[Dict]:
+        """
+        Find upcoming sessions whose type or date/time contains some text.
+
+        Args:
+            text: Text to look for (case-insensitive), e.g. "saturday" or "nov 9"
+            n: Maximum number of sessions to return
+            available_only: Skip sold-out sessions
+            now: Epoch time to search from (defaults to now)
+
+        Returns:
+            Up to n matching session dictionaries, soonest first
+        """
+        words = text.lower().split()
+        results = []
+        for session in self._iter_from(time.time() if now is None else now, None):
+            haystack = f"{session.get('session_type', '')} {session.get('date_time', '')}".lower()
+            if not all(word in haystack for word in words):
+                continue
+            if available_only and session.get('status') != 'AVAILABLE':
+                continue
+            results.append(session)
+            if len(results) >= n:
+                break
+        return results
+
+
+_index: Optional[SnapshotIndex] = None
+_index_signature: Optional[filestore.Signature] = None
+_index_lock = threading.Lock()
+
+
+def slim_session(session: Dict) -> Dict:
+    """Keep only the SNAPSHOT_FIELDS of a session dictionary."""
+    return {k: session.get(k) for k in SNAPSHOT_FIELDS}
+
+
+class SnapshotWriter:
+    """Saves a check's snapshot one session at a time.
+
+    Use as a context manager around the check. Each session passed to add()
+    is slimmed, written straight to a temporary file and added to a new
+    index, so the check doesn't keep a list of every session it saw. When
+    the block ends normally the file replaces SNAPSHOT_FILE and the new
+    index replaces the in-memory one; if it raises, both are left as they
+    were. If the file can't be written the index is still swapped in.
+
+    The snapshot is stamped when it is finished, not when it is started, so
+    a run that waited on the check lease sees it as taken after it started
+    waiting (see lease.py).
+    """
+
+    def __init__(self, taken_at: Optional[float] = None):
+        """
+        Start a snapshot.
+
+        Args:
+            taken_at: Epoch time of the scrape (defaults to when the snapshot is finished)
+        """
+        self.taken_at = taken_at
+        self.index = SnapshotIndex([], taken_at or time.time())
+        self._stack = ExitStack()
+        self._file = None
+        self._separator = b''
+
+    def __enter__(self) -> 'SnapshotWriter':
+        try:
+            self._file = self._stack.enter_context(filestore.atomic_writer(SNAPSHOT_FILE))
+            self._file.write(b'{"sessions":[')
+        except OSError as e:
+            self._abandon(e)
+        return self
+
+    def _abandon(self, error: OSError):
+        """Give up on the file (the old snapshot stays) but keep building the index."""
+        logger.error("Error saving snapshot: %s", error)
+        self._file = None
+        self._stack.__exit__(type(error), error, error.__traceback__)
+
+    def add(self, session: Dict):
+        """Add a session dictionary from the scrape."""
+        slim = slim_session(session)
+        self.index.add(slim)
+        if self._file is None:
+            return
+        try:
+            self._file.write(self._separator + codec.dumps(slim, pretty=JSON_PRETTY))
+            self._separator = b',\n'
+        except OSError as e:
+            self._abandon(e)
+
+    def __exit__(self, exc_type, exc, tb):
+        global _index, _index_signature
+
+        if exc_type is not None:
+            self._stack.__exit__(exc_type, exc, tb)
+            return False
+
+        if self.taken_at is None:
+            self.taken_at = time.time()
+        self.index.taken_at = self.taken_at
+
+        sig = None
+        if self._file is not None:
+            try:
+                self._file.write(b'],"taken_at":' + codec.dumps(self.taken_at) + b'}')
+                self._stack.close()
+                sig = filestore.signature(SNAPSHOT_FILE)
+            except OSError as e:
+                self._abandon(e)
+
+        self.index.sort()
+        with _index_lock:
+            _index, _index_signature = self.index, sig
+        return False
+
+
+def save_snapshot(sessions: Iterable[Dict], taken_at: Optional[float] = None):
+    """
+    Save the sessions from a check and refresh the in-memory index.
+
+    Args:
+        sessions: Session dictionaries from the scrape
+        taken_at: Epoch time of the scrape (defaults to now)
+    """
+    with SnapshotWriter(taken_at) as snapshot:
+        for session in sessions:
+            snapshot.add(session)
+
+
+def load_snapshot_index() -> Optional[SnapshotIndex]:
+    """
+    Get the index of the latest snapshot, reloading it only if the file changed.
+
+    Returns:
+        SnapshotIndex, or None if no snapshot has been saved yet
+    """
+    global _index, _index_signature
+
+    sig = filestore.signature(SNAPSHOT_FILE)
+    if sig is None:
+        return _index
+
+    with _index_lock:
+        if _index is not None and sig == _index_signature:
+            return _index
+
+    try:
+        data = codec.load_file(SNAPSHOT_FILE)
+    except (codec.JSONDecodeError, IOError) as e:
+        logger.error("Error loading snapshot: %s", e)
+        return _index
+
+    index = SnapshotIndex(data.get('sessions', []), data.get('taken_at', sig[1] / 1e9))
+    with _index_lock:
+        _index, _index_signature = index, sig
+    return index
+
+
+def format_age(seconds: float) -> str:
+    """Describe a snapshot age, e.g. '12 min ago'."""
+    if seconds < 90:
+        return f"{seconds:.0f} sec ago"
+    if seconds < 90 * 60:
+        return f"{seconds / 60:.0f} min ago"
+    if seconds < 48 * 3600:
+        return f"{seconds / 3600:.1f} hours ago"
+    return f"{seconds / 86400:.1f} days ago"
+
+
+def query_snapshot(path: str, params: Dict[str, str]) -> Dict:
+    """
+    Answer an /upcoming or /search query against the latest snapshot.
+
+    Args:
+        path: '/upcoming' or '/search'
+        params: Query parameters (n, type, q, all)
+
+    Returns:
+        JSON-serialisable response with 'sessions', 'taken_at' and 'age_seconds'
+        (or 'error' if there's no snapshot or the path is unknown)
+    """
+    index = load_snapshot_index()
+    if index is None:
+        return {'error': 'no snapshot yet'}
+
+    n = int(params.get('n', '5'))
+    available_only = params.get('all', '').lower() not in ('1', 'true', 'yes')
+
+    if path == '/upcoming':
+        sessions = index.upcoming(n, params.get('type'), available_only=available_only)
+    elif path == '/search':
+        sessions = index.search(params.get('q', ''), n, available_only=available_only)
+    else:
+        return {'error': f"unknown path {path}"}
+
+    return {
+        'sessions': sessions,
+        'taken_at': datetime.fromtimestamp(index.taken_at).isoformat(),
+        'age_seconds': round(index.age_seconds, 1),
+    }
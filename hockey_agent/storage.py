@@ -1,30 +1,34 @@
 """Storage for tracking session availability status."""
 
-import json
-import os
+import logging
+from datetime import datetime
 from typing import Dict, Optional
-from hockey_agent.config import STORAGE_FILE
+from hockey_agent import codec, filestore
+from hockey_agent.config import STORAGE_FILE, SESSION_RETENTION_GRACE_HOURS
+from hockey_agent.dates import session_has_ended
+
+logger = logging.getLogger(__name__)
 
 
 def _load_sessions() -> Dict[str, Dict]:
-    """Load session data from storage."""
-    if os.path.exists(STORAGE_FILE):
-        try:
-            with open(STORAGE_FILE, 'r') as f:
-                data = json.load(f)
-                return data.get('sessions', {})
-        except (json.JSONDecodeError, IOError):
-            return {}
-    return {}
+    """
+    Load session data from storage.
+
+    Lock-free, and only re-parsed when the file has changed; the result is
+    shared, so copy it (dict(...)) before modifying it.
+    """
+    try:
+        return filestore.read_json(STORAGE_FILE).get('sessions', {})
+    except (codec.JSONDecodeError, IOError):
+        return {}
 
 
 def _save_sessions(sessions: Dict[str, Dict]):
-    """Save session data to storage."""
+    """Save session data to storage (call while holding filestore.locked(STORAGE_FILE))."""
     try:
-        with open(STORAGE_FILE, 'w') as f:
-            json.dump({'sessions': sessions}, f, indent=2)
+        filestore.write_json(STORAGE_FILE, {'sessions': sessions})
     except IOError as e:
-        print(f"Error saving sessions: {e}")
+        logger.error("Error saving sessions: %s", e)
 
 
 def get_session_status(session_id: str) -> Optional[str]:
@@ -51,13 +55,53 @@ def update_session_status(session_id: str, status: str, session_info: Dict):
         status: Current status ('AVAILABLE', 'SOLD OUT')
         session_info: Additional info about the session
     """
-    sessions = _load_sessions()
-    sessions[session_id] = {
-        'status': status,
-        'info': session_info,
-        'last_updated': session_info.get('timestamp', '')
-    }
-    _save_sessions(sessions)
+    with filestore.locked(STORAGE_FILE):
+        sessions = dict(_load_sessions())
+        sessions[session_id] = {
+            'status': status,
+            'info': session_info,
+            'last_updated': session_info.get('timestamp', '')
+        }
+        _save_sessions(sessions)
+
+
+def load_session_states() -> Dict[str, Dict]:
+    """
+    Get the stored state of every session in one read.
+
+    Returns:
+        Dictionary mapping session ID to its entry without 'info'
+        ('status', 'last_updated' and 'flap' if set)
+    """
+    return {session_id: {key: value for key, value in data.items() if key != 'info'}
+            for session_id, data in _load_sessions().items()}
+
+
+def update_session_statuses(updates: Dict[str, Dict], states: Optional[Dict[str, Dict]] = None):
+    """
+    Update the status of many sessions with one read and one write.
+
+    Args:
+        updates: Dictionary mapping session ID to its session dictionary
+            (with 'status' and 'timestamp' keys)
+        states: Flap state to store per session ID (see flap.py)
+    """
+    if not updates:
+        return
+
+    states = states or {}
+    with filestore.locked(STORAGE_FILE):
+        sessions = dict(_load_sessions())
+        for session_id, session_info in updates.items():
+            entry = {
+                'status': session_info['status'],
+                'info': session_info,
+                'last_updated': session_info.get('timestamp', '')
+            }
+            if session_id in states:
+                entry['flap'] = states[session_id]
+            sessions[session_id] = entry
+        _save_sessions(sessions)
 
 
 def status_changed(session_id: str, new_status: str) -> bool:
@@ -82,3 +126,41 @@ def status_changed(session_id: str, new_status: str) -> bool:
         return True
 
     return False
+
+
+def prune_past_sessions(grace_hours: float = SESSION_RETENTION_GRACE_HOURS,
+                        now: Optional[datetime] = None) -> int:
+    """
+    Remove sessions that ended more than grace_hours ago.
+
+    Sessions whose date can't be parsed are kept.
+
+    Args:
+        grace_hours: How long to keep a session after it ends
+        now: Current time (defaults to now)
+
+    Returns:
+        Number of sessions removed
+    """
+    now = now or datetime.now()
+
+    with filestore.locked(STORAGE_FILE):
+        sessions = _load_sessions()
+        kept = {}
+        for session_id, data in sessions.items():
+            info = data.get('info', {})
+            try:
+                seen_at = datetime.fromisoformat(data.get('last_updated', ''))
+            except ValueError:
+                seen_at = None
+
+            if session_has_ended(info.get('date_time', ''), grace_hours, now, seen_at):
+                continue
+            kept[session_id] = data
+
+        removed = len(sessions) - len(kept)
+        if removed:
+            _save_sessions(kept)
+    if removed:
+        logger.info("Pruned %s past session(s) from %s", removed, STORAGE_FILE)
+    return removed
@@ -0,0 +1,215 @@
+"""Multiple subscribers, each with their own filters and booked sessions.
+
+Subscribers are read from SUBSCRIPTIONS_FILE:
+
+    {
+      "subscribers": [
+        {
+          "id": "alice",
+          "phone": "+61400000000",
+          "days": [5, 6],
+          "dates": ["2025-11-04"],
+          "session_types": ["stick & puck"],
+          "booked": ["Saturday 8th November 10:00am-11:00am"]
+        }
+      ]
+    }
+
+Filters have the same meaning as the global MONITOR_* settings: a session
+matches if its date is in `dates` or its weekday is in `days` (or neither is
+set), and its type contains one of `session_types` (or none is set).
+
+Subscribers are indexed by (weekday, session type, date) so each scraped
+change is routed by a handful of dictionary lookups rather than by testing
+it against every subscriber.
+"""
+
+import logging
+import os
+from typing import Dict, List, Optional, Set, Tuple
+from hockey_agent import codec
+from hockey_agent.config import SUBSCRIPTIONS_FILE
+from hockey_agent.dates import parse_session_date, parse_weekday, session_key
+
+logger = logging.getLogger(__name__)
+
+# (weekday, session type, date) - None means "any"
+IndexKey = Tuple[Optional[int], Optional[str], Optional[str]]
+
+
+class SubscriptionIndex:
+    """Inverted index from (weekday, session type, date) to subscriber IDs."""
+
+    def __init__(self, subscribers: List[Dict]):
+        """
+        Build the index.
+
+        Args:
+            subscribers: List of subscriber dictionaries (see module docstring)
+        """
+        self.subscribers: Dict[str, Dict] = {}
+        self._index: Dict[IndexKey, Set[str]] = {}
+        self._booked: Dict[str, Set[str]] = {}
+        self._type_keys: Set[str] = set()
+        # session_type string -> matching type keys (session types repeat a lot)
+        self._type_cache: Dict[str, List[str]] = {}
+
+        for subscriber in subscribers:
+            self.add(subscriber)
+
+    def add(self, subscriber: Dict):
+        """
+        Add (or replace) a subscriber.
+
+        Args:
+            subscriber: Subscriber dictionary with at least an 'id' key
+        """
+        subscriber_id = str(subscriber['id'])
+        if subscriber_id in self.subscribers:
+            self.remove(subscriber_id)
+
+        self.subscribers[subscriber_id] = subscriber
+        self._booked[subscriber_id] = {session_key(b) for b in subscriber.get('booked', [])}
+
+        types = [t.strip().lower() for t in subscriber.get('session_types', []) if t.strip()]
+        self._type_keys.update(types)
+        self._type_cache.clear()
+
+        for key in self._keys_for(subscriber, types):
+            self._index.setdefault(key, set()).add(subscriber_id)
+
+    def remove(self, subscriber_id: str):
+        """
+        Remove a subscriber from the index.
+
+        Args:
+            subscriber_id: ID of the subscriber to remove
+        """
+        subscriber = self.subscribers.pop(subscriber_id, None)
+        if subscriber is None:
+            return
+
+        self._booked.pop(subscriber_id, None)
+        types = [t.strip().lower() for t in subscriber.get('session_types', []) if t.strip()]
+        for key in self._keys_for(subscriber, types):
+            ids = self._index.get(key)
+            if ids:
+                ids.discard(subscriber_id)
+                if not ids:
+                    del self._index[key]
+
+    @staticmethod
+    def _keys_for(subscriber: Dict, types: List[str]) -> List[IndexKey]:
+        """Get the index keys a subscriber is filed under."""
+        type_keys = types or [None]
+        days = [int(d) for d in subscriber.get('days', [])]
+        dates = [str(d).strip() for d in subscriber.get('dates', []) if str(d).strip()]
+
+        keys = []
+        for session_type in type_keys:
+            if not days and not dates:
+                keys.append((None, session_type, None))
+            for day in days:
+                keys.append((day, session_type, None))
+            for date in dates:
+                keys.append((None, session_type, date))
+        return keys
+
+    def _matching_types(self, session_type: str) -> List[Optional[str]]:
+        """Get the indexed type keys contained in a session type (plus "any")."""
+        cached = self._type_cache.get(session_type)
+        if cached is None:
+            lowered = session_type.lower()
+            cached = [t for t in self._type_keys if t in lowered]
+            self._type_cache[session_type] = cached
+        return cached + [None]
+
+    def match(self, session: Dict) -> Set[str]:
+        """
+        Find the subscribers interested in a session.
+
+        Args:
+            session: Session dictionary with 'session_type' and 'date_time' keys
+
+        Returns:
+            Set of subscriber IDs whose filters match and who haven't booked it
+        """
+        date_time = session.get('date_time', '')
+        weekday = parse_weekday(date_time)
+        date = parse_session_date(date_time)
+        date_str = date.strftime('%Y-%m-%d') if date else None
+
+        matched: Set[str] = set()
+        for session_type in self._matching_types(session.get('session_type', '')):
+            for key in ((weekday, session_type, None), (None, session_type, date_str), (None, session_type, None)):
+                ids = self._index.get(key)
+                if ids:
+                    matched.update(ids)
+
+        if matched:
+            key = session_key(date_time)
+            matched = {s for s in matched if key not in self._booked[s]}
+        return matched
+
+    def route(self, sessions: List[Dict]) -> Dict[str, List[Dict]]:
+        """
+        Route sessions to the subscribers that want them.
+
+        Args:
+            sessions: List of session dictionaries
+
+        Returns:
+            Dictionary of subscriber ID to that subscriber's sessions (in input order)
+        """
+        routed: Dict[str, List[Dict]] = {}
+        for session in sessions:
+            for subscriber_id in self.match(session):
+                routed.setdefault(subscriber_id, []).append(session)
+        return routed
+
+    def is_booked(self, subscriber_id: str, date_time: str) -> bool:
+        """
+        Check if a subscriber has booked a session.
+
+        Args:
+            subscriber_id: ID of the subscriber
+            date_time: The date/time string from the session
+
+        Returns:
+            True if this subscriber has booked the session
+        """
+        return session_key(date_time) in self._booked.get(subscriber_id, set())
+
+
+_cached_index: Optional[SubscriptionIndex] = None
+_cached_mtime: Optional[float] = None
+
+
+def load_subscription_index() -> Optional[SubscriptionIndex]:
+    """
+    Load the subscription index from SUBSCRIPTIONS_FILE.
+
+    The index is rebuilt only when the file changes.
+
+    Returns:
+        SubscriptionIndex, or None if subscriptions aren't configured
+    """
+    global _cached_index, _cached_mtime
+
+    if not SUBSCRIPTIONS_FILE or not os.path.exists(SUBSCRIPTIONS_FILE):
+        return None
+
+    try:
+        mtime = os.path.getmtime(SUBSCRIPTIONS_FILE)
+        if _cached_index is not None and mtime == _cached_mtime:
+            return _cached_index
+
+        data = codec.load_file(SUBSCRIPTIONS_FILE)
+    except (codec.JSONDecodeError, IOError) as e:
+        logger.error("Error loading subscriptions: %s", e)
+        return _cached_index
+
+    _cached_index = SubscriptionIndex(data.get('subscribers', []))
+    _cached_mtime = mtime
+    logger.info("Loaded %s subscriber(s)", len(_cached_index.subscribers))
+    return _cached_index
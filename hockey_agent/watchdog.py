@@ -0,0 +1,209 @@
+"""Hard per-phase deadlines for a check.
+
+Each phase of a check (launch, load, extract, store, notify) gets a time
+budget. When a browser phase (launch, load) overruns, the browser process
+tree is killed, which makes the pending Playwright/Selenium call fail
+straight away and the scraper returns whatever it had collected.
+Python-only phases can't be killed safely, so they check in between units
+of work with checkpoint(). Every phase also yields an Event that is set
+when its budget runs out; the notify phase hands it to the dispatcher,
+which stops sending (network calls are bounded by per-call timeouts), and
+DeadlineExceeded is raised when the phase ends.
+
+The check is then reported as degraded, along with the phases that blew
+their budget, so billed duration stays bounded however the site behaves.
+
+The active watchdog is per thread, and only the browsers launched by the
+overrunning phase's thread are killed (see browser_launch()), so checks
+running side by side in one process (e.g. local fan-out workers) can't
+cut each other short.
+"""
+
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Set
+from hockey_agent.config import WATCHDOG_ENABLED, WATCHDOG_BUDGETS
+from hockey_agent.process_tree import descendants, descendants_of, kill_processes
+
+logger = logging.getLogger(__name__)
+
+BROWSER_PHASES = ('launch', 'load')
+CANCELLABLE_PHASES = ('notify',)
+
+# Browser processes launched by each thread (thread ident -> PIDs)
+_browsers: Dict[int, Set[int]] = {}
+_browsers_lock = threading.Lock()
+# Held across a launch so each thread's before/after process lists only differ by its own browser
+_launch_lock = threading.Lock()
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a phase runs past its budget."""
+
+    def __init__(self, phase: str):
+        super().__init__(f"Phase '{phase}' exceeded its deadline")
+        self.phase = phase
+
+
+class Watchdog:
+    """Enforces phase budgets for one check."""
+
+    def __init__(self, budgets: Dict[str, float]):
+        """
+        Create a watchdog.
+
+        Args:
+            budgets: Seconds allowed per phase name (phases not listed are unbounded)
+        """
+        self.budgets = budgets
+        self.blown_phases: List[str] = []
+        self._expired: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @property
+    def degraded(self) -> bool:
+        """True if any phase blew its budget."""
+        return bool(self.blown_phases)
+
+    def _expire(self, phase: str, expired: threading.Event, owner: int):
+        """Timer callback: record the overrun and stop the work of the owner thread."""
+        with self._lock:
+            self._expired = phase
+            self.blown_phases.append(phase)
+        expired.set()
+
+        logger.error("Watchdog: phase '%s' exceeded %gs budget", phase, self.budgets[phase])
+
+        if phase in BROWSER_PHASES:
+            killed = _kill_browsers(owner)
+            logger.error("Watchdog: killed %s browser process(es)", killed)
+
+    @contextmanager
+    def phase(self, name: str, spent: float = 0.0):
+        """
+        Run a block of code under the named phase's deadline.
+
+        Args:
+            name: Phase name (launch, load, extract, store, notify)
+            spent: Seconds of the budget already used, for a phase run in
+                several pieces (e.g. store, once per product block)
+
+        Yields:
+            Event set when the budget runs out (never set for an unbounded phase)
+
+        Raises:
+            DeadlineExceeded: When a cancellable phase (notify) ends after its budget ran out
+        """
+        expired = threading.Event()
+        budget = self.budgets.get(name)
+        if not budget:
+            yield expired
+            return
+
+        timer = threading.Timer(max(budget - spent, 0), self._expire, args=(name, expired, threading.get_ident()))
+        timer.daemon = True
+        timer.start()
+        try:
+            yield expired
+        finally:
+            timer.cancel()
+            with self._lock:
+                if self._expired == name:
+                    self._expired = None
+
+        if name in CANCELLABLE_PHASES and expired.is_set():
+            raise DeadlineExceeded(name)
+
+    def checkpoint(self):
+        """Raise DeadlineExceeded if the current phase has run out of time."""
+        expired = self._expired
+        if expired:
+            raise DeadlineExceeded(expired)
+
+
+_local = threading.local()
+
+
+def _current() -> Optional[Watchdog]:
+    """The calling thread's active watchdog, if any."""
+    return getattr(_local, 'watchdog', None)
+
+
+@contextmanager
+def watch_check():
+    """
+    Install a Watchdog on the calling thread for the duration of a check.
+
+    Yields:
+        The Watchdog, or None if the watchdog is disabled
+    """
+    if not WATCHDOG_ENABLED:
+        yield None
+        return
+
+    previous = _current()
+    _local.watchdog = Watchdog(WATCHDOG_BUDGETS)
+    try:
+        yield _local.watchdog
+    finally:
+        _local.watchdog = previous
+
+
+@contextmanager
+def browser_launch():
+    """
+    Record the browser processes started inside the block as the calling thread's.
+
+    Launches are serialised, so the processes that appear meanwhile are this
+    thread's browser, apart from children of browsers already recorded
+    (another thread's renderers), which are left out.
+    """
+    with _launch_lock:
+        before = set(descendants())
+        try:
+            yield
+        finally:
+            alive = set(descendants())
+            with _browsers_lock:
+                for pids in _browsers.values():
+                    pids &= alive
+                known = set().union(*_browsers.values())
+                started = alive - before - known - descendants_of(known)
+                _browsers.setdefault(threading.get_ident(), set()).update(started)
+
+
+def _kill_browsers(owner: int) -> int:
+    """Kill the browsers launched by one thread, sparing Playwright's driver so its pending call fails cleanly."""
+    with _browsers_lock:
+        pids = set(_browsers.get(owner, ()))
+    # Only ever our own descendants, in case a PID has been reused
+    return kill_processes(pids & set(descendants()), match='chrom')
+
+
+@contextmanager
+def phase(name: str, spent: float = 0.0):
+    """
+    Run a block under the active watchdog's deadline for a phase (no-op without one).
+
+    Args:
+        name: Phase name (launch, load, extract, store, notify)
+        spent: Seconds of the budget already used (see Watchdog.phase)
+
+    Yields:
+        Event set when the phase's budget runs out (see Watchdog.phase)
+    """
+    watchdog = _current()
+    if watchdog is None:
+        yield threading.Event()
+        return
+
+    with watchdog.phase(name, spent) as expired:
+        yield expired
+
+
+def checkpoint():
+    """Raise DeadlineExceeded if the active watchdog's current phase has expired."""
+    watchdog = _current()
+    if watchdog is not None:
+        watchdog.checkpoint()
@@ -2,18 +2,25 @@
 AWS Lambda handler for hockey session checker.
 
 This function is triggered by EventBridge (CloudWatch Events) on a schedule.
+With FANOUT_SHARDS > 1 that invocation coordinates, invoking this same
+function once per shard with {"mode": "worker", "sites": [...]}.
 """
 
-import json
 import logging
 import os
 
-# Set up logging for Lambda
+# Set up logging for Lambda (replaces the runtime's handler with a queue
+# drained by a background thread; flushed before each invocation returns)
+from hockey_agent.logs import setup_logging, flush_logs
+setup_logging()
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
 
 # Import after logger setup
+from hockey_agent import codec
 from hockey_agent.scraper import check_all_sites
+from hockey_agent.fanout import WORKER_MODE, run_worker, run_coordinator
+from hockey_agent.lease import SKIPPED, REUSED
+from hockey_agent.config import FANOUT_SHARDS
 
 
 def lambda_handler(event, context):
@@ -27,28 +34,50 @@ def lambda_handler(event, context):
     Returns:
         Response with status code and message
     """
+    try:
+        return _handle(event)
+    finally:
+        # Write out queued log records before the environment is frozen
+        flush_logs()
+
+
+def _handle(event):
+    """Run a worker shard or a full check for one invocation."""
     logger.info("Hockey Agent Lambda function started")
-    logger.info(f"Event: {json.dumps(event)}")
+    logger.info("Event: %s", event)
+
+    # Worker invocations just scrape their shard and hand the sessions back
+    if event.get('mode') == WORKER_MODE:
+        return run_worker(event)
 
     try:
         # Run the scraper
-        check_all_sites()
+        if FANOUT_SHARDS > 1:
+            summary = run_coordinator()
+        else:
+            summary = check_all_sites()
 
-        logger.info("Hockey Agent Lambda function completed successfully")
+        if summary.get('lease') in (SKIPPED, REUSED):
+            logger.info("Hockey Agent Lambda function skipped the check (another run held the lease)")
+        elif summary['degraded']:
+            logger.warning("Hockey Agent Lambda function completed with partial results")
+        else:
+            logger.info("Hockey Agent Lambda function completed successfully")
 
         return {
             'statusCode': 200,
-            'body': json.dumps({
-                'message': 'Hockey session check completed successfully'
+            'body': codec.dumps_str({
+                'message': 'Hockey session check completed successfully',
+                **summary
             })
         }
 
     except Exception as e:
-        logger.error(f"Error in Lambda function: {e}", exc_info=True)
+        logger.error("Error in Lambda function: %s", e, exc_info=True)
 
         return {
             'statusCode': 500,
-            'body': json.dumps({
+            'body': codec.dumps_str({
                 'message': 'Error checking hockey sessions',
                 'error': str(e)
             })
@@ -4,9 +4,18 @@
 import sys
 from hockey_agent.booked import (
     add_booked_session,
+    add_booked_sessions,
     remove_booked_session,
-    list_booked_sessions
+    replace_booked_sessions,
+    list_booked_sessions,
+    clear_old_sessions
 )
+from hockey_agent import filestore
+from hockey_agent.calendar_import import load_bookings
+from hockey_agent.storage import prune_past_sessions
+from hockey_agent.history import load_history
+from hockey_agent.snapshot import load_snapshot_index, format_age
+from hockey_agent.config import SESSION_RETENTION_GRACE_HOURS, HISTORY_FILE
 
 
 def print_help():
@@ -18,6 +27,11 @@ Usage:
     python manage_booked.py list              - List all booked sessions
     python manage_booked.py add <date_time>   - Add a booked session
     python manage_booked.py remove <date_time> - Remove a booked session
+    python manage_booked.py import <file> [text] - Add bookings from an .ics or .csv file
+    python manage_booked.py sync <file> [text]  - Make the booked list match the file exactly
+    python manage_booked.py compact [hours]   - Drop sessions that ended more than [hours] ago
+    python manage_booked.py upcoming [n] [type] - Next n available sessions from the last check
+    python manage_booked.py search <text>     - Find upcoming sessions from the last check
 
 Examples:
     # List all booked sessions
@@ -31,13 +45,48 @@ Examples:
     python manage_booked.py remove "Monday, November 4"
     python manage_booked.py remove "Nov 9"
 
+    # Add bookings from a calendar export (only events mentioning "hockey")
+    python manage_booked.py import ~/Downloads/calendar.ics hockey
+    python manage_booked.py import bookings.csv
+
+    # Replace the booked list with the file's bookings (one write)
+    python manage_booked.py sync bookings.csv
+
+    # Remove past sessions from the booked, seen and history files
+    python manage_booked.py compact
+    python manage_booked.py compact 0
+
+    # What's coming up, from the last check (no scraping)
+    python manage_booked.py upcoming
+    python manage_booked.py upcoming 10 "stick"
+    python manage_booked.py search saturday
+
 Tips:
     - Use quotes around date/time strings with spaces
     - Copy the exact date/time format from the agent's notifications
     - Partial matches work for removal (e.g., just the date)
+    - CSV files need a date_time (or date and time) column, or the date/time in the first column
 """)
 
 
+def print_snapshot_sessions(index, sessions):
+    """Print sessions from the snapshot along with how fresh the data is."""
+    print(f"\nFrom the check {format_age(index.age_seconds)}:\n")
+    if not sessions:
+        print("No matching sessions.\n")
+        return
+
+    for session in sessions:
+        status_label = session['status']
+        if session.get('is_booked'):
+            status_label += " (BOOKED)"
+        qty = session.get('qty_in_stock', '?')
+        print(f"{session['session_type']}")
+        print(f"  When: {session['date_time']}")
+        print(f"  Status: {status_label} ({qty} spots)")
+    print()
+
+
 def main():
     """Main CLI entry point."""
     if len(sys.argv) < 2:
@@ -76,6 +125,76 @@ def main():
         remove_booked_session(date_time)
         print(f"\nRemoved session(s) matching: {date_time}\n")
 
+    elif command in ['import', 'sync']:
+        if len(sys.argv) < 3:
+            print(f"Error: Please provide an .ics or .csv file to {command}.")
+            print(f'Example: python manage_booked.py {command} bookings.ics hockey')
+            return
+
+        try:
+            bookings = load_bookings(sys.argv[2], ' '.join(sys.argv[3:]))
+        except OSError as e:
+            print(f"Error: Could not read {sys.argv[2]}: {e}")
+            return
+
+        if command == 'import':
+            added = add_booked_sessions(bookings)
+            print(f"\nImported {len(added)} new booking(s) ({len(bookings) - len(added)} already booked)")
+            for date_time in added:
+                print(f"  + {date_time}")
+        else:
+            added, removed = replace_booked_sessions(bookings)
+            print(f"\nSynced {len(bookings)} booking(s): {len(added)} added, {len(removed)} removed")
+            for date_time in added:
+                print(f"  + {date_time}")
+            for date_time in removed:
+                print(f"  - {date_time}")
+        print()
+
+    elif command == 'compact':
+        grace_hours = SESSION_RETENTION_GRACE_HOURS
+        if len(sys.argv) > 2:
+            try:
+                grace_hours = float(sys.argv[2])
+            except ValueError:
+                print("Error: hours must be a number.")
+                return
+        grace_hours = max(0.0, grace_hours)
+
+        booked_removed = clear_old_sessions(grace_hours)
+        seen_removed = prune_past_sessions(grace_hours)
+        with filestore.locked(HISTORY_FILE):
+            history = load_history()
+            history_removed = history.prune_past(grace_hours)
+            history.save()
+
+        print(f"\nRemoved sessions that ended more than {grace_hours:g} hour(s) ago:")
+        print(f"  Booked:  {booked_removed}")
+        print(f"  Seen:    {seen_removed}")
+        print(f"  History: {history_removed}\n")
+
+    elif command in ['upcoming', 'search']:
+        index = load_snapshot_index()
+        if index is None:
+            print("\nNo snapshot yet - run a check first.\n")
+            return
+
+        if command == 'upcoming':
+            args = sys.argv[2:]
+            n = 5
+            if args and args[0].isdigit():
+                n = int(args.pop(0))
+            session_type = ' '.join(args) or None
+            sessions = index.upcoming(n, session_type)
+        else:
+            if len(sys.argv) < 3:
+                print("Error: Please provide text to search for.")
+                print('Example: python manage_booked.py search "nov 9"')
+                return
+            sessions = index.search(' '.join(sys.argv[2:]))
+
+        print_snapshot_sessions(index, sessions)
+
     elif command in ['help', '-h', '--help']:
         print_help()
 
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Compare polling policies offline with the discrete-event simulator.
+
+Every policy is replayed over the same inventory timelines on a virtual
+clock (see hockey_agent/simulator.py). Polls are diffed with the real
+check logic, including FLAP_DWELL_SECONDS / FLAP_COOLDOWN_SECONDS. For
+each policy it reports how many reopenings were caught and how quickly,
+how many were missed, and what the scrapes would cost.
+
+Usage:
+    python simulate_polling.py [days] [sessions] [scrape_seconds]   # synthetic sell-outs and drop-outs
+    python simulate_polling.py history [scrape_seconds]             # replay HISTORY_FILE
+"""
+
+import sys
+from hockey_agent.history import load_history
+from hockey_agent.simulator import (
+    FixedInterval,
+    LeadTimePolicy,
+    BackoffPolicy,
+    compare_policies,
+    recorded_timelines,
+    synthetic_timelines,
+)
+
+
+def build_policies():
+    """The policies to compare (fresh objects, since some keep state)."""
+    return [
+        FixedInterval(5),
+        FixedInterval(15),
+        FixedInterval(30),
+        FixedInterval(60),
+        LeadTimePolicy(5, 30),
+        LeadTimePolicy(10, 60),
+        BackoffPolicy(5, 60),
+    ]
+
+
+def _minutes(seconds):
+    return f"{seconds / 60:7.1f}" if seconds is not None else f"{'-':>7}"
+
+
+def main():
+    """Build timelines, simulate every policy and print a comparison table."""
+    if len(sys.argv) > 1 and sys.argv[1] == 'history':
+        scrape_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 20.0
+        timelines = recorded_timelines(load_history())
+        source = f"{len(timelines)} recorded session(s) from the history file"
+    else:
+        days = float(sys.argv[1]) if len(sys.argv) > 1 else 7
+        sessions = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+        scrape_seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 20.0
+        timelines = synthetic_timelines(sessions, days)
+        source = f"{sessions} synthetic session(s) over {days:g} day(s)"
+
+    if not timelines:
+        print("\nNo timelines to replay.\n")
+        return 1
+
+    print(f"\nSimulating {source}, {scrape_seconds:g}s per scrape\n")
+    print(f"{'policy':<28} {'scrapes':>8} {'compute s':>10} {'reopened':>9} {'caught':>7} {'missed':>7} "
+          f"{'suppr.':>7} {'p50 min':>7} {'p90 min':>7} {'p99 min':>7}")
+    print("-" * 112)
+    for result in compare_policies(timelines, build_policies(), scrape_seconds):
+        print(f"{result.policy:<28} {result.scrapes:>8} {result.compute_seconds:>10.0f} {result.reopenings:>9} "
+              f"{result.detected:>7} {result.missed:>7} {result.suppressed:>7} "
+              f"{_minutes(result.latency_percentile(50))} {_minutes(result.latency_percentile(90))} "
+              f"{_minutes(result.latency_percentile(99))}")
+    print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -8,6 +8,7 @@ without starting the scheduler.
 
 import logging
 import sys
+from hockey_agent.lease import SKIPPED, REUSED
 from hockey_agent.scraper import check_all_sites
 
 # Set up detailed logging for testing
@@ -30,16 +31,21 @@ def main():
     print("\nRunning a single check of all configured sites...")
     print("This will show you what sessions are found with your current filters.\n")
 
+    summary = {}
     try:
-        check_all_sites()
+        summary = check_all_sites()
     except KeyboardInterrupt:
         print("\n\nTest interrupted by user.")
     except Exception as e:
-        logger.error(f"Error during test: {e}", exc_info=True)
+        logger.error("Error during test: %s", e, exc_info=True)
         print(f"\nERROR: {e}")
         print("Check the logs above for details.")
         return 1
 
+    if summary.get('lease') in (SKIPPED, REUSED):
+        print("\nAnother check (e.g. the daemon) was running, so this one didn't scrape.")
+        print("Set LEASE_WAIT_SECONDS to wait for it, or LEASE_BACKEND=none to run anyway.")
+
     print("\n" + "=" * 70)
     print("TEST COMPLETE")
     print("=" * 70)
@@ -0,0 +1,83 @@
+"""Shared test setup and fixtures.
+
+hockey_agent.config reads the environment once, at import, so the store
+files are pointed at a scratch directory before anything imports it. Tests
+that write stores still use their own tmp_path files (the stores fixture).
+"""
+
+import os
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+_scratch = tempfile.mkdtemp(prefix='hockey-agent-tests-')
+
+os.environ.update({
+    'STORAGE_FILE': os.path.join(_scratch, 'seen_sessions.json'),
+    'BOOKED_SESSIONS_FILE': os.path.join(_scratch, 'booked_sessions.json'),
+    'HISTORY_FILE': os.path.join(_scratch, 'session_history.bin'),
+    'SNAPSHOT_FILE': os.path.join(_scratch, 'last_snapshot.json'),
+    'LEASE_FILE': os.path.join(_scratch, 'check_lease.json'),
+    'LEASE_DB_FILE': os.path.join(_scratch, 'leases.sqlite3'),
+    'SUBSCRIPTIONS_FILE': '',
+    'NOTIFICATION_METHOD': 'console',
+    'MONITOR_DAYS': '',
+    'MONITOR_DATES': '',
+    'MONITOR_SESSION_TYPES': 'stick & puck,scrimmage',
+})
+
+# Only now that the environment is set
+from hockey_agent import booked, scraper, snapshot, storage, watchdog  # noqa: E402
+from hockey_agent.history import HistoryStore  # noqa: E402
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    """Point every store at tmp_path and capture notifications."""
+    paths = SimpleNamespace(seen=tmp_path / 'seen.json', booked=tmp_path / 'booked.json',
+                            snapshot=tmp_path / 'snapshot.json', history=tmp_path / 'history.bin')
+    monkeypatch.setattr(storage, 'STORAGE_FILE', str(paths.seen))
+    monkeypatch.setattr(booked, 'BOOKED_SESSIONS_FILE', str(paths.booked))
+    monkeypatch.setattr(snapshot, 'SNAPSHOT_FILE', str(paths.snapshot))
+    monkeypatch.setattr(snapshot, '_index', None)
+    monkeypatch.setattr(scraper, 'load_history', lambda: HistoryStore(str(paths.history)).load())
+    monkeypatch.setattr(watchdog, 'WATCHDOG_ENABLED', False)
+
+    paths.notifications = []
+    monkeypatch.setattr(scraper, 'send_notification', lambda sessions, newly_available_count, cancel=None:
+                        paths.notifications.append((list(sessions), newly_available_count)))
+    return paths
+
+
+@pytest.fixture
+def fake_backend(monkeypatch):
+    """
+    Replace the scraper backend with one yielding canned product blocks.
+
+    Returns:
+        install(blocks, pause=0.0), which makes each scrape yield copies of
+        blocks (sleeping pause seconds before each one) and returns a
+        record with the names of the sites scraped and closed
+    """
+    def install(blocks, pause=0.0):
+        record = SimpleNamespace(scraped=[], closed=[])
+        lock = threading.Lock()
+
+        def iter_icehq(url, name):
+            with lock:
+                record.scraped.append(name)
+            try:
+                for block in blocks:
+                    time.sleep(pause)
+                    yield [dict(s) for s in block]
+            finally:
+                with lock:
+                    record.closed.append(name)
+
+        monkeypatch.setattr(scraper, '_backend', lambda: SimpleNamespace(iter_icehq=iter_icehq))
+        return record
+
+    return install
@@ -0,0 +1,149 @@
+"""Tests for a streaming check over a fake scraper backend."""
+
+import json
+import time
+
+import pytest
+
+from hockey_agent import booked, codec, scraper, snapshot, watchdog
+from hockey_agent.columnar import session_id
+from hockey_agent.history import HistoryStore
+from hockey_agent.watchdog import DeadlineExceeded
+from hockey_agent.scrapers import icehq_playwright
+
+SITE = {'name': 'IceHQ', 'url': 'https://example.com/stick-and-puck', 'type': 'icehq'}
+
+
+def session(day, status='AVAILABLE', session_type='Stick & Puck'):
+    return {
+        'site': SITE['name'], 'url': SITE['url'], 'session_type': session_type,
+        'date_time': f'Saturday {day}th November 2031 10:00am-11:00am',
+        'status': status, 'qty_in_stock': 0 if status == 'SOLD OUT' else 5,
+    }
+
+
+@pytest.fixture
+def slow_history(stores, monkeypatch):
+    """Make recording each session in the history take 5ms."""
+    history = HistoryStore(str(stores.history)).load()
+    record = history.record
+
+    def slow_record(*args, **kwargs):
+        time.sleep(0.005)
+        record(*args, **kwargs)
+
+    monkeypatch.setattr(history, 'record', slow_record)
+    monkeypatch.setattr(scraper, 'load_history', lambda: history)
+    return history
+
+
+@pytest.fixture
+def run_check(fake_backend):
+    """Run a check of SITE over a fake backend yielding blocks (pausing before each one)."""
+    def run(blocks, pause=0.0):
+        record = fake_backend(blocks, pause)
+        summary = scraper._run_check(scraper.stream_sites([SITE]))
+        assert record.closed == [SITE['name']]
+        return summary
+
+    return run
+
+
+def seen_statuses(stores):
+    return {sid: entry['status'] for sid, entry in codec.load_file(str(stores.seen))['sessions'].items()}
+
+
+def test_new_sessions_are_stored_snapshotted_and_notified(stores, run_check):
+    blocks = [[session(8), session(15, 'SOLD OUT')], [session(22, session_type='Scrimmage'), session(8)]]
+    summary = run_check(blocks)
+
+    assert summary['sessions_found'] == 4
+    assert (summary['new'], summary['newly_available'], summary['degraded']) == (2, 0, False)
+    assert seen_statuses(stores) == {session_id(session(8)): 'AVAILABLE',
+                                     session_id(session(15)): 'SOLD OUT',
+                                     session_id(session(22, session_type='Scrimmage')): 'AVAILABLE'}
+
+    (notified, newly_available_count), = stores.notifications
+    assert [s['date_time'] for s in notified] == [session(8)['date_time'], session(22)['date_time']]
+    assert newly_available_count == 0
+
+    saved = json.loads(stores.snapshot.read_text())
+    assert len(saved['sessions']) == 4
+    assert snapshot.load_snapshot_index().size == 4
+
+
+def test_reopened_session_is_notified_once(stores, run_check):
+    run_check([[session(15, 'SOLD OUT')]])
+    assert stores.notifications == []
+
+    summary = run_check([[session(15)]])
+    assert (summary['newly_available'], summary['new']) == (1, 0)
+    assert stores.notifications[-1][1] == 1
+
+    summary = run_check([[session(15)]])
+    assert (summary['newly_available'], summary['new']) == (0, 0)
+    assert len(stores.notifications) == 1
+
+
+def test_booked_sessions_are_stored_but_not_notified(stores, run_check):
+    booked.add_booked_session(session(8)['date_time'])
+    summary = run_check([[session(8), session(15)]])
+
+    assert (summary['sessions_found'], summary['new']) == (2, 1)
+    assert list(seen_statuses(stores)) == [session_id(session(15))]
+    assert [s['is_booked'] for s in json.loads(stores.snapshot.read_text())['sessions']] == [True, False]
+
+
+def test_store_deadline_keeps_partial_work(stores, slow_history, run_check, monkeypatch):
+    monkeypatch.setattr(watchdog, 'WATCHDOG_ENABLED', True)
+    monkeypatch.setattr(watchdog, 'WATCHDOG_BUDGETS', {'store': 0.03})
+
+    summary = run_check([[session(day) for day in range(4, 20)], [session(25)]])
+    assert summary['degraded']
+    assert summary['blown_phases'] == ['store']
+    assert 0 < summary['sessions_found'] < 16
+    assert len(seen_statuses(stores)) == summary['sessions_found']
+    # Whatever was processed is still notified
+    assert len(stores.notifications[0][0]) == summary['new'] == summary['sessions_found']
+
+
+def test_scraping_time_is_outside_the_store_budget(stores, run_check, monkeypatch):
+    monkeypatch.setattr(watchdog, 'WATCHDOG_ENABLED', True)
+    monkeypatch.setattr(watchdog, 'WATCHDOG_BUDGETS', {'store': 0.05})
+    summary = run_check([[session(8)], [session(15)], [session(22)]], pause=0.04)
+    assert (summary['sessions_found'], summary['degraded']) == (3, False)
+
+
+def test_store_time_is_outside_the_extract_budget(stores, slow_history, monkeypatch):
+    monkeypatch.setattr(watchdog, 'WATCHDOG_ENABLED', True)
+    monkeypatch.setattr(watchdog, 'WATCHDOG_BUDGETS', {'extract': 0.3, 'store': 30})
+    catalogue = [
+        (f'Stick & Puck {product}', json.dumps({'variants': [
+            {'attributes': {'Date/time': f'{day} November 2031 10:00am-11:00am'}, 'soldOut': False, 'qtyInStock': 5}
+            for day in range(1, 25)
+        ]}))
+        for product in range(6)
+    ]
+    monkeypatch.setattr(icehq_playwright, '_load_catalogue', lambda url, name: list(catalogue))
+    monkeypatch.setattr(scraper, '_backend', lambda: icehq_playwright)
+
+    summary = scraper._run_check(scraper.stream_sites([SITE]))
+    assert (summary['sessions_found'], summary['degraded']) == (144, False)
+
+
+def test_blocks_are_batched_for_classifying():
+    blocks = [[session(day)] * 3 for day in range(1, 6)]
+    assert [len(batch) for batch in scraper.batch_blocks(blocks, rows=5)] == [6, 6, 3]
+    assert [len(batch) for batch in scraper.batch_blocks(blocks, rows=1)] == [3] * 5
+
+
+def test_partial_batch_is_kept_on_a_deadline():
+    def blocks():
+        yield [session(8)]
+        yield [session(15)]
+        raise DeadlineExceeded('extract')
+
+    batches = scraper.batch_blocks(blocks(), rows=500)
+    assert len(next(batches)) == 2
+    with pytest.raises(DeadlineExceeded):
+        next(batches)
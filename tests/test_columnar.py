@@ -0,0 +1,82 @@
+"""Tests that the NumPy paths of columnar.py agree with the per-dict fallback."""
+
+import pytest
+
+from hockey_agent import columnar
+from hockey_agent.columnar import NEW, NO_CHANGE, REOPENED, SOLD, classify_sessions, filter_sessions
+from hockey_agent.scrapers import icehq_playwright
+
+pytest.importorskip('numpy')
+
+DATE_TIMES = [
+    'Tuesday 4th November 11:45am-12:45pm',
+    'Tue, Nov 4 - 7:00pm',
+    '2025-11-04 10:00',
+    'Wednesday 5th November 6:00am-7:00am',
+    'Saturday 8th November 10:00am-11:00am',
+    'Sunday 9th November 1:00-2:00pm',
+    'Date TBA',
+]
+
+
+def make_sessions():
+    sessions = []
+    for i, date_time in enumerate(DATE_TIMES):
+        for session_type in ('Stick & Puck', 'Scrimmage'):
+            sessions.append({
+                'site': 'IceHQ', 'session_type': session_type, 'date_time': date_time,
+                'status': 'SOLD OUT' if (i + len(session_type)) % 3 == 0 else 'AVAILABLE',
+            })
+    return sessions
+
+
+def both_paths(monkeypatch, fn, *args):
+    results = []
+    for have_numpy in (True, False):
+        monkeypatch.setattr(columnar, 'HAVE_NUMPY', have_numpy)
+        results.append(fn(*args))
+    return results
+
+
+@pytest.mark.parametrize('booked', [set(), {'Sat 8 Nov 10am'}, {'tuesday 4th november 11:45am-12:45pm', '2025-11-04'}])
+@pytest.mark.parametrize('skip_booked', [True, False])
+def test_classify_sessions_matches_fallback(monkeypatch, booked, skip_booked):
+    sessions = make_sessions()
+    ids = [columnar.session_id(s) for s in sessions]
+    previous = {ids[0]: 'SOLD OUT', ids[1]: 'AVAILABLE', ids[2]: 'SOLD OUT', ids[5]: 'AVAILABLE', ids[8]: 'SOLD OUT'}
+
+    vectorised, fallback = both_paths(monkeypatch, classify_sessions, sessions, booked, previous, skip_booked)
+    assert vectorised == fallback
+    assert set(vectorised.change) <= {NO_CHANGE, NEW, REOPENED, SOLD}
+
+
+def test_classify_sessions_changes(monkeypatch):
+    sessions = make_sessions()[:4]
+    sessions[0]['status'] = 'AVAILABLE'
+    sessions[1]['status'] = 'SOLD OUT'
+    sessions[2]['status'] = 'AVAILABLE'
+    sessions[3]['status'] = 'SOLD OUT'
+    ids = [columnar.session_id(s) for s in sessions]
+    previous = {ids[0]: 'SOLD OUT', ids[1]: 'AVAILABLE', ids[3]: 'SOLD OUT'}
+
+    for result in both_paths(monkeypatch, classify_sessions, sessions, set(), previous, True):
+        assert result.change == [REOPENED, SOLD, NEW, NO_CHANGE]
+
+
+@pytest.mark.parametrize('days, dates', [([], ['2025-11-04']), ([2], ['2025-11-04']), ([5, 6], ['2025-11-05'])])
+def test_filter_sessions_matches_fallback(monkeypatch, days, dates):
+    for module in (columnar, icehq_playwright):
+        monkeypatch.setattr(module, 'MONITOR_DAYS', days)
+        monkeypatch.setattr(module, 'MONITOR_DATES', dates)
+    sessions = make_sessions()
+
+    vectorised, fallback = both_paths(monkeypatch, filter_sessions, sessions, icehq_playwright._matches_filter)
+    assert vectorised == fallback
+    assert 0 < len(vectorised) < len(sessions)
+
+
+def test_filter_sessions_without_filters_keeps_everything(monkeypatch):
+    monkeypatch.setattr(columnar, 'MONITOR_DAYS', [])
+    monkeypatch.setattr(columnar, 'MONITOR_DATES', [])
+    sessions = make_sessions()
+    assert filter_sessions(sessions, lambda date_time: False) is sessions
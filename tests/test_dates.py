@@ -0,0 +1,90 @@
+"""Tests for session date/time parsing."""
+
+from datetime import datetime
+
+from hockey_agent.dates import (
+    parse_session_date,
+    parse_session_times,
+    parse_weekday,
+    session_has_ended,
+    session_key,
+    short_label,
+)
+
+NOV_1 = datetime(2025, 11, 1)
+
+
+def test_year_is_inferred_closest_to_now():
+    assert parse_session_date("Friday 2nd January 10am", datetime(2025, 12, 20)) == datetime(2026, 1, 2)
+    assert parse_session_date("Saturday 27th December", datetime(2026, 1, 5)) == datetime(2025, 12, 27)
+
+
+def test_leap_day_falls_back_to_a_leap_year():
+    assert parse_session_date("Sat 29 Feb", datetime(2025, 6, 1)) == datetime(2024, 2, 29)
+
+
+def test_explicit_year_and_iso_dates():
+    assert parse_session_date("Nov 4, 2024", NOV_1) == datetime(2024, 11, 4)
+    assert parse_session_date("2025-11-08 10:00", NOV_1) == datetime(2025, 11, 8)
+
+
+def test_unparseable_dates():
+    assert parse_session_date("31 November", NOV_1) is None
+    assert parse_session_date("no date here", NOV_1) is None
+    assert parse_session_times("no date here", NOV_1) is None
+
+
+def test_start_borrows_meridiem_of_end():
+    start, end = parse_session_times("Tuesday 4th November 1:00-2:00pm", NOV_1)
+    assert (start, end) == (datetime(2025, 11, 4, 13), datetime(2025, 11, 4, 14))
+
+
+def test_borrowed_meridiem_never_puts_start_after_end():
+    start, end = parse_session_times("Tuesday 4th November 11:45-12:45pm", NOV_1)
+    assert (start, end) == (datetime(2025, 11, 4, 11, 45), datetime(2025, 11, 4, 12, 45))
+
+
+def test_overnight_range_ends_next_day():
+    start, end = parse_session_times("Friday 7th November 11:30pm-12:30am", NOV_1)
+    assert (start, end) == (datetime(2025, 11, 7, 23, 30), datetime(2025, 11, 8, 0, 30))
+
+
+def test_missing_times():
+    assert parse_session_times("Saturday 8th November", NOV_1) == (datetime(2025, 11, 8), datetime(2025, 11, 9))
+    assert parse_session_times("Saturday 8th November 7pm", NOV_1) == (
+        datetime(2025, 11, 8, 19), datetime(2025, 11, 8, 20))
+
+
+def test_day_of_month_is_not_a_time():
+    start, _ = parse_session_times("Tue 4 Nov 20:00", NOV_1)
+    assert start == datetime(2025, 11, 4, 20)
+
+
+def test_weekday_from_name_or_date():
+    assert parse_weekday("Sat 8 Nov") == 5
+    assert parse_weekday("8 November 2025") == 5
+    assert parse_weekday("whenever") is None
+
+
+def test_session_key_ignores_format():
+    assert session_key("Tuesday 4th November 11:45am-12:45pm", NOV_1) == "2025-11-04T11:45"
+    assert session_key("Tue, Nov 4 - 11:45am", NOV_1) == "2025-11-04T11:45"
+    assert session_key("  Something  ODD ") == "something odd"
+
+
+def test_short_label():
+    assert short_label("Tuesday 4th November 11:45am-12:45pm", NOV_1) == "Tue 4 Nov 11:45am-12:45pm"
+    assert short_label("Saturday 8th November 10:00am-11:00am", NOV_1) == "Sat 8 Nov 10-11am"
+    assert short_label("whenever") == "whenever"
+
+
+def test_session_has_ended_with_grace():
+    date_time = "Saturday 8th November 10:00am-11:00am"
+    assert session_has_ended(date_time, 0, datetime(2025, 11, 8, 11, 30), NOV_1)
+    assert not session_has_ended(date_time, 1, datetime(2025, 11, 8, 11, 30), NOV_1)
+
+
+def test_session_has_ended_infers_year_from_when_it_was_seen():
+    # Without seen_at, June 2026 would put "8th November" in November 2026
+    assert not session_has_ended("Saturday 8th November 10am", 0, datetime(2026, 6, 1))
+    assert session_has_ended("Saturday 8th November 10am", 0, datetime(2026, 6, 1), NOV_1)
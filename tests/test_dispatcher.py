@@ -0,0 +1,109 @@
+"""Tests for SMS fan-out: deduplication and the token bucket."""
+
+import threading
+import time
+
+from hockey_agent.dispatcher import NotificationDispatcher, TokenBucket
+
+
+class RecordingSender:
+    """Sender that records messages and fails for chosen recipients."""
+
+    def __init__(self, failing=()):
+        self.sent = []
+        self.failing = set(failing)
+        self._lock = threading.Lock()
+
+    def __call__(self, recipient, body):
+        if recipient in self.failing:
+            raise RuntimeError('provider error')
+        with self._lock:
+            self.sent.append((recipient, body))
+        return 'SM1'
+
+
+def make_dispatcher(sender, **kwargs):
+    kwargs.setdefault('rate_per_second', 0)
+    return NotificationDispatcher(sender, concurrency=4, dedup_seconds=60, **kwargs)
+
+
+def test_duplicates_are_sent_once():
+    sender = RecordingSender()
+    dispatcher = make_dispatcher(sender)
+
+    stats = dispatcher.dispatch([('+1 (555) 000-0001', 'Spot open'), ('+15550000001', 'Spot open'),
+                                 ('+15550000002', 'Spot open'), ('', 'Spot open')])
+    assert stats['sent'] == 2
+    assert stats['deduplicated'] == 2
+    assert sorted(sender.sent) == [('+15550000001', 'Spot open'), ('+15550000002', 'Spot open')]
+
+    # Still inside the dedup window
+    stats = dispatcher.dispatch([('+15550000001', 'Spot open'), ('+15550000001', 'Another spot')])
+    assert (stats['sent'], stats['deduplicated']) == (1, 1)
+
+
+def test_dedup_window_expires():
+    sender = RecordingSender()
+    dispatcher = NotificationDispatcher(sender, rate_per_second=0, dedup_seconds=0.05)
+    dispatcher.dispatch([('+15550000001', 'Spot open')])
+    time.sleep(0.06)
+    assert dispatcher.dispatch([('+15550000001', 'Spot open')])['sent'] == 1
+    assert len(sender.sent) == 2
+
+
+def test_failed_send_is_retried_next_dispatch():
+    sender = RecordingSender(failing={'+15550000001'})
+    dispatcher = make_dispatcher(sender)
+
+    stats = dispatcher.dispatch([('+15550000001', 'Spot open')])
+    assert (stats['sent'], stats['failed']) == (0, 1)
+
+    sender.failing.clear()
+    stats = dispatcher.dispatch([('+15550000001', 'Spot open')])
+    assert (stats['sent'], stats['deduplicated']) == (1, 0)
+
+
+def test_cancelled_messages_can_go_out_next_time():
+    sender = RecordingSender()
+    dispatcher = make_dispatcher(sender)
+    cancel = threading.Event()
+    cancel.set()
+
+    stats = dispatcher.dispatch([('+15550000001', 'Spot open')], cancel)
+    assert (stats['sent'], stats['cancelled']) == (0, 1)
+    assert sender.sent == []
+
+    assert dispatcher.dispatch([('+15550000001', 'Spot open')])['sent'] == 1
+
+
+def test_segments_count_only_sent_messages():
+    sender = RecordingSender(failing={'+15550000002'})
+    dispatcher = make_dispatcher(sender)
+    stats = dispatcher.dispatch([('+15550000001', 'x' * 161), ('+15550000002', 'Spot open')])
+    assert stats['segments'] == 2
+
+
+def test_token_bucket_allows_burst_then_limits_rate():
+    bucket = TokenBucket(rate=20, burst=2)
+    start = time.monotonic()
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == 0.0
+    waited = bucket.acquire()
+    assert waited > 0
+    assert time.monotonic() - start >= 0.04
+
+
+def test_token_bucket_disabled():
+    bucket = TokenBucket(rate=0)
+    assert all(bucket.acquire() == 0.0 for _ in range(100))
+
+
+def test_token_bucket_wait_ends_on_cancel():
+    bucket = TokenBucket(rate=0.1)
+    bucket.acquire()
+    cancel = threading.Event()
+    threading.Timer(0.05, cancel.set).start()
+
+    start = time.monotonic()
+    bucket.acquire(cancel)
+    assert time.monotonic() - start < 1
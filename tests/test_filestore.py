@@ -0,0 +1,115 @@
+"""Tests for store file locking, atomic replacement and cached reads."""
+
+import os
+import threading
+
+import pytest
+
+from hockey_agent import filestore
+from hockey_agent.filestore import atomic_write, atomic_writer, locked, read_json, write_json
+
+fcntl = pytest.importorskip('fcntl')
+
+
+def _flock_free(lock_path):
+    """True if another open file description could take the flock now."""
+    with open(lock_path, 'a+b') as f:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        return True
+
+
+def test_lock_is_reentrant_and_held_on_the_sidecar(tmp_path):
+    path = str(tmp_path / 'store.json')
+    with locked(path):
+        with locked(path):
+            assert not _flock_free(path + '.lock')
+        # Still held by the outer block
+        assert not _flock_free(path + '.lock')
+    assert _flock_free(path + '.lock')
+
+
+def test_lock_excludes_other_threads(tmp_path):
+    path = str(tmp_path / 'store.json')
+    acquired = threading.Event()
+
+    def other_thread():
+        with locked(path):
+            acquired.set()
+
+    with locked(path):
+        thread = threading.Thread(target=other_thread)
+        thread.start()
+        assert not acquired.wait(0.1)
+    thread.join(1)
+    assert acquired.is_set()
+
+
+def test_lock_is_released_on_error(tmp_path):
+    path = str(tmp_path / 'store.json')
+    with pytest.raises(RuntimeError):
+        with locked(path):
+            raise RuntimeError('boom')
+    assert _flock_free(path + '.lock')
+
+
+def test_atomic_write_replaces_the_file(tmp_path):
+    path = tmp_path / 'store.json'
+    path.write_bytes(b'old')
+    inode = os.stat(path).st_ino
+
+    atomic_write(str(path), b'new')
+    assert path.read_bytes() == b'new'
+    assert os.stat(path).st_ino != inode
+    assert os.listdir(tmp_path) == ['store.json']
+
+
+def test_failed_write_leaves_the_old_file(tmp_path):
+    path = tmp_path / 'store.json'
+    path.write_bytes(b'old')
+
+    with pytest.raises(RuntimeError):
+        with atomic_writer(str(path)) as f:
+            f.write(b'half a ')
+            raise RuntimeError('boom')
+    assert path.read_bytes() == b'old'
+    assert os.listdir(tmp_path) == ['store.json']
+
+
+def test_writer_streams_pieces(tmp_path):
+    path = tmp_path / 'store.json'
+    with atomic_writer(str(path)) as f:
+        f.write(b'[1,')
+        assert not path.exists()
+        f.write(b'2]')
+    assert read_json(str(path)) == [1, 2]
+
+
+def test_read_json_reparses_only_when_the_file_changes(tmp_path):
+    path = str(tmp_path / 'store.json')
+    atomic_write(path, b'{"a": 1}')
+
+    first = read_json(path)
+    assert first == {'a': 1}
+    assert read_json(path) is first
+
+    atomic_write(path, b'{"a": 2}')
+    assert read_json(path) == {'a': 2}
+
+
+def test_write_json_primes_the_cache(tmp_path):
+    path = str(tmp_path / 'store.json')
+    value = {'sessions': [1, 2, 3]}
+    with locked(path):
+        write_json(path, value)
+    assert read_json(path) is value
+    assert filestore.signature(path) is not None
+
+
+def test_read_json_errors(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        read_json(str(tmp_path / 'missing.json'))
+    assert filestore.signature(str(tmp_path / 'missing.json')) is None
@@ -0,0 +1,66 @@
+"""Tests for the flap hysteresis state machine."""
+
+from hockey_agent.flap import COOLDOWN, FLAPPED, HELD, NEW, REOPENED, advance, confirmed_status, state_of
+
+SOLD = {'confirmed': 'SOLD OUT', 'notified_at': 0.0}
+
+
+def feed(state, observations, dwell=60, cooldown=600):
+    """Feed (time, status) observations in order, returning the final state and the events."""
+    events = []
+    for now, observed in observations:
+        state, event = advance(state, observed, now, dwell, cooldown)
+        events.append(event)
+    return state, events
+
+
+def test_first_sighting():
+    assert advance(None, 'AVAILABLE', 10.0) == ({'confirmed': 'AVAILABLE', 'notified_at': 10.0}, NEW)
+    assert advance(None, 'SOLD OUT', 10.0) == ({'confirmed': 'SOLD OUT'}, None)
+
+
+def test_unchanged_status_is_a_noop():
+    assert advance(SOLD, 'SOLD OUT', 1000.0, 60, 600) == (SOLD, None)
+
+
+def test_reopening_is_confirmed_after_the_dwell():
+    state, events = feed(SOLD, [(1000, 'AVAILABLE'), (1030, 'AVAILABLE'), (1060, 'AVAILABLE')])
+    assert events == [HELD, HELD, REOPENED]
+    assert state == {'confirmed': 'AVAILABLE', 'notified_at': 1060}
+
+
+def test_reverted_reopening_is_flapped():
+    state, events = feed(SOLD, [(1000, 'AVAILABLE'), (1030, 'SOLD OUT')])
+    assert events == [HELD, FLAPPED]
+    assert state == SOLD
+
+
+def test_reverted_sell_out_is_not_flapped():
+    available = {'confirmed': 'AVAILABLE', 'notified_at': 0.0}
+    state, events = feed(available, [(1000, 'SOLD OUT'), (1030, 'AVAILABLE')])
+    assert events == [HELD, None]
+    assert state == available
+
+
+def test_sell_out_is_confirmed_silently():
+    state, events = feed({'confirmed': 'AVAILABLE', 'notified_at': 0.0}, [(1000, 'SOLD OUT'), (1060, 'SOLD OUT')])
+    assert events == [HELD, None]
+    assert state == {'confirmed': 'SOLD OUT', 'notified_at': 0.0}
+
+
+def test_reopening_inside_cooldown_is_suppressed():
+    state, events = feed({'confirmed': 'SOLD OUT', 'notified_at': 900.0}, [(1000, 'AVAILABLE'), (1060, 'AVAILABLE')])
+    assert events == [HELD, COOLDOWN]
+    assert state == {'confirmed': 'AVAILABLE', 'notified_at': 900.0}
+
+
+def test_no_dwell_or_cooldown_notifies_every_change():
+    state, events = feed(SOLD, [(1, 'AVAILABLE'), (2, 'SOLD OUT'), (3, 'AVAILABLE')], dwell=0, cooldown=0)
+    assert events == [REOPENED, None, REOPENED]
+    assert state == {'confirmed': 'AVAILABLE', 'notified_at': 3}
+
+
+def test_legacy_entries_are_confirmed_at_their_status():
+    assert state_of(None) is None
+    assert state_of({'status': 'SOLD OUT'}) == {'confirmed': 'SOLD OUT'}
+    assert confirmed_status({'status': 'AVAILABLE', 'flap': {'confirmed': 'SOLD OUT', 'pending': 'AVAILABLE'}}) == 'SOLD OUT'
@@ -0,0 +1,89 @@
+"""Tests for parsing the IceHQ catalogue the Playwright scraper collects."""
+
+import html
+import json
+import time
+
+import pytest
+
+pytest.importorskip('playwright')
+
+from hockey_agent.columnar import session_id  # noqa: E402
+from hockey_agent.scrapers import icehq_playwright  # noqa: E402
+from hockey_agent.scrapers.icehq_playwright import _parse_catalogue, _sessions_from_product  # noqa: E402
+
+PRODUCT = {
+    'title': 'Stick & Puck',
+    'variants': [
+        {'attributes': {'Date/time': f'Saturday {day}th November 2031 10:00am-11:00am'},
+         'soldOut': day % 2 == 0, 'qtyInStock': day}
+        for day in (8, 15, 22)
+    ],
+}
+
+
+def session_ids(catalogue):
+    return [session_id(session)
+            for session_type, product_data in _parse_catalogue(catalogue)
+            for session in _sessions_from_product(product_data, session_type, 'IceHQ', 'https://example.com')]
+
+
+def test_capture_and_dom_give_the_same_session_ids():
+    captured = [(None, json.dumps({'data': {'products': [PRODUCT]}}).encode())]
+    # The heading shows more than the product's title
+    dom = [('STICK & PUCK\nAll ages', html.escape(json.dumps(PRODUCT)))]
+
+    ids = session_ids(captured)
+    assert len(ids) == 3
+    assert session_ids(dom) == ids
+
+
+def test_dom_heading_is_used_when_the_json_has_no_title():
+    untitled = dict(PRODUCT)
+    del untitled['title']
+    assert [session_type for session_type, _ in _parse_catalogue([('Stick & Puck', json.dumps(untitled))])] == [
+        'Stick & Puck']
+
+
+def test_unmonitored_products_are_skipped_in_both_modes():
+    public_skate = dict(PRODUCT, title='Public Skate')
+    assert list(_parse_catalogue([(None, json.dumps([public_skate]).encode())])) == []
+    # Even when the heading would have matched
+    assert list(_parse_catalogue([('Stick & Puck', json.dumps(public_skate))])) == []
+
+
+class SilentPage:
+    """Page stand-in whose responses never include product JSON."""
+
+    def __init__(self):
+        self.load_state_timeouts = []
+
+    def on(self, event, handler):
+        pass
+
+    def remove_listener(self, event, handler):
+        pass
+
+    def goto(self, url, wait_until, timeout):
+        pass
+
+    def wait_for_timeout(self, ms):
+        time.sleep(ms / 1000)
+
+    def wait_for_load_state(self, state, timeout):
+        self.load_state_timeouts.append(timeout)
+
+    def query_selector_all(self, selector):
+        return []
+
+
+def test_dom_fallback_only_gets_the_rest_of_the_wait(monkeypatch):
+    monkeypatch.setattr(icehq_playwright, 'ICEHQ_CAPTURE_NETWORK_JSON', True)
+    monkeypatch.setattr(icehq_playwright, 'BROWSER_WAIT_TIME', 0.3)
+    page = SilentPage()
+
+    started = time.monotonic()
+    assert icehq_playwright._load_products(page, 'https://example.com', 'IceHQ') == []
+    assert time.monotonic() - started < 0.5
+    # The capture used up the budget, so the fallback doesn't wait again
+    assert all(timeout < 300 for timeout in page.load_state_timeouts)
@@ -0,0 +1,139 @@
+"""Tests for the local lease backends and check_lease()."""
+
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from hockey_agent import lease, scraper
+from hockey_agent.lease import ACQUIRED, REUSED, SKIPPED, UNLOCKED, FileLease, SqliteLease, check_lease, lease_owner
+
+
+@pytest.fixture(params=['file', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'file':
+        return FileLease(str(tmp_path / 'lease.json'))
+    return SqliteLease(str(tmp_path / 'leases.sqlite3'))
+
+
+def dead_owner():
+    """Owner ID of a process on this machine that has exited."""
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return f"{socket.gethostname()}:{process.pid}:deadbeef"
+
+
+def test_acquire_and_release(backend):
+    me, other = lease_owner(), lease_owner()
+    assert backend.holder('check') is None
+    assert backend.acquire('check', me, 60)
+    assert backend.holder('check') == me
+    # Taking it again extends it
+    assert backend.acquire('check', me, 60)
+    assert not backend.acquire('check', other, 60)
+
+    backend.release('check', other)
+    assert backend.holder('check') == me
+    backend.release('check', me)
+    assert backend.holder('check') is None
+    assert backend.acquire('check', other, 60)
+
+
+def test_leases_are_independent(backend):
+    assert backend.acquire('check', lease_owner(), 60)
+    assert backend.acquire('other', lease_owner(), 60)
+
+
+def test_expired_lease_can_be_taken(backend):
+    first, second = lease_owner(), lease_owner()
+    assert backend.acquire('check', first, 0.05)
+    assert not backend.acquire('check', second, 60)
+    time.sleep(0.1)
+    assert backend.holder('check') is None
+    assert backend.acquire('check', second, 60)
+    assert backend.holder('check') == second
+
+
+def test_lease_of_a_dead_local_process_is_free(backend):
+    owner = dead_owner()
+    assert backend.acquire('check', owner, 60)
+    assert backend.holder('check') is None
+    assert backend.acquire('check', lease_owner(), 60)
+
+
+def test_lease_of_another_host_is_kept_until_it_expires(backend):
+    owner = f"some-other-host:{os.getpid()}:deadbeef"
+    assert backend.acquire('check', owner, 60)
+    assert backend.holder('check') == owner
+    assert not backend.acquire('check', lease_owner(), 60)
+
+
+def test_expired():
+    now = time.time()
+    live = lease_owner()
+    assert not lease._expired(live, now + 60, now)
+    assert lease._expired(live, now, now)
+    assert lease._expired(dead_owner(), now + 60, now)
+    assert not lease._expired('not-an-owner-id', now + 60, now)
+
+
+@pytest.fixture
+def no_wait(monkeypatch):
+    monkeypatch.setattr(lease, 'LEASE_WAIT_SECONDS', 0)
+    monkeypatch.setattr(lease, 'load_snapshot_index', lambda: None)
+
+
+def test_check_lease_is_held_for_the_check(backend, no_wait):
+    with check_lease(backend) as (status, snapshot):
+        assert (status, snapshot) == (ACQUIRED, None)
+        assert backend.holder('check') is not None
+        with check_lease(backend) as (overlapping, _):
+            assert overlapping == SKIPPED
+    assert backend.holder('check') is None
+
+
+def test_waiting_check_reuses_the_snapshot_of_the_running_one(stores, fake_backend, tmp_path, monkeypatch):
+    monkeypatch.setattr(lease, '_backend', FileLease(str(tmp_path / 'lease.json')))
+    monkeypatch.setattr(lease, 'LEASE_WAIT_SECONDS', 10)
+    monkeypatch.setattr(lease, 'LEASE_POLL_SECONDS', 0.02)
+    monkeypatch.setattr(lease, 'LEASE_FRESH_SECONDS', 0)
+    site = {'name': 'IceHQ', 'url': 'https://example.com/stick-and-puck', 'type': 'icehq'}
+    monkeypatch.setattr(scraper, 'SITES_TO_MONITOR', [site])
+    blocks = [[{'site': 'IceHQ', 'url': site['url'], 'session_type': 'Stick & Puck', 'status': 'AVAILABLE',
+                'date_time': f'Saturday {day}th November 2031 10:00am-11:00am', 'qty_in_stock': 5}]
+              for day in (8, 15, 22)]
+    record = fake_backend(blocks, pause=0.3)
+
+    summaries = {}
+    first = threading.Thread(target=lambda: summaries.setdefault('first', scraper.check_all_sites()))
+    first.start()
+    while not record.scraped:
+        time.sleep(0.01)
+    summaries['second'] = scraper.check_all_sites()
+    first.join()
+
+    assert summaries['first']['lease'] == ACQUIRED
+    assert summaries['second']['lease'] == REUSED
+    assert summaries['second']['sessions_found'] == 3
+    assert record.scraped == ['IceHQ']
+
+
+def test_check_lease_waits_for_the_holder(backend, monkeypatch, no_wait):
+    monkeypatch.setattr(lease, 'LEASE_WAIT_SECONDS', 5)
+    monkeypatch.setattr(lease, 'LEASE_POLL_SECONDS', 0.02)
+    assert backend.acquire('check', lease_owner(), 0.1)
+    with check_lease(backend) as (status, _):
+        assert status == ACQUIRED
+
+
+def test_check_lease_runs_unlocked_if_the_backend_fails(no_wait):
+    class Broken(lease.LeaseBackend):
+        def acquire(self, name, owner, ttl):
+            raise OSError('disk full')
+
+    with check_lease(Broken()) as (status, snapshot):
+        assert (status, snapshot) == (UNLOCKED, None)
@@ -0,0 +1,77 @@
+"""Tests for SMS encoding, segment counting and message packing."""
+
+import pytest
+
+from hockey_agent.sms import GSM7, UCS2, describe, encoding, format_session, pack_messages, segment_count, to_gsm
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('a' * 160, (GSM7, 1)),
+    ('a' * 161, (GSM7, 2)),
+    ('a' * 306, (GSM7, 2)),
+    ('a' * 307, (GSM7, 3)),
+    ('€' * 80, (GSM7, 1)),  # extension characters take two septets
+    ('€' * 81, (GSM7, 2)),
+    ('é' * 70, (GSM7, 1)),
+    ('ç' * 70, (UCS2, 1)),  # only the capital Ç is in the GSM-7 alphabet
+    ('a' * 71 + '’', (UCS2, 2)),
+    ('🏒' + 'a' * 68, (UCS2, 1)),
+    ('🏒' + 'a' * 69, (UCS2, 2)),
+    ('🏒' * 35, (UCS2, 1)),  # a surrogate pair is two UTF-16 code units
+    ('🏒' * 36, (UCS2, 2)),
+    ('', (GSM7, 1)),
+])
+def test_describe(text, expected):
+    assert describe(text) == expected
+
+
+def test_to_gsm_keeps_messages_in_gsm7():
+    text = 'Spots “open” – don’t wait…'
+    assert encoding(text) == UCS2
+    assert to_gsm(text) == 'Spots "open" - don\'t wait...'
+    assert encoding(to_gsm(text)) == GSM7
+
+
+def test_format_session():
+    session = {'session_type': 'Stick & Puck', 'date_time': 'Saturday 8th November 2025 10:00am-11:00am'}
+    assert format_session(session) == 'Stick & Puck Sat 8 Nov 10-11am'
+
+
+def make_sessions(count):
+    return [{'session_type': 'Stick & Puck', 'date_time': f'Saturday {day}th November 2025 10:00am-11:00am',
+             'url': 'https://example.com/book'} for day in range(4, 4 + count)]
+
+
+def test_single_message():
+    assert pack_messages(make_sessions(2), 1, max_segments=1, emoji=False) == [
+        'Hockey: 1 opened, 1 new\nOPENED:\nStick & Puck Sat 4 Nov 10-11am\n'
+        'NEW:\nStick & Puck Sat 5 Nov 10-11am\nhttps://example.com/book'
+    ]
+
+
+def test_messages_are_split_within_max_segments():
+    bodies = pack_messages(make_sessions(20), 5, max_segments=1, emoji=False)
+    assert len(bodies) > 1
+    assert all(segment_count(body) == 1 for body in bodies)
+    assert bodies[0].startswith(f'Hockey: 5 opened, 15 new (1/{len(bodies)})\nOPENED:')
+    # The link only goes in the last message, and every session is sent once
+    assert [body.endswith('https://example.com/book') for body in bodies] == [False] * (len(bodies) - 1) + [True]
+    lines = [line for body in bodies for line in body.split('\n') if line.startswith('Stick & Puck')]
+    assert lines == [format_session(s) for s in make_sessions(20)]
+    # A message starting mid-section repeats its heading
+    assert all(body.split('\n')[1] in ('OPENED:', 'NEW:') for body in bodies)
+
+
+def test_more_segments_means_fewer_messages():
+    sessions = make_sessions(20)
+    assert len(pack_messages(sessions, max_segments=3, emoji=False)) < len(pack_messages(sessions, max_segments=1, emoji=False))
+
+
+def test_emoji_forces_ucs2():
+    body, = pack_messages(make_sessions(1), 1, max_segments=3, emoji=True)
+    assert body.startswith('🏒 Hockey: 1 opened\n🔥 OPENED:')
+    assert encoding(body) == UCS2
+
+
+def test_no_sessions():
+    assert pack_messages([]) == []
@@ -0,0 +1,77 @@
+"""Tests for routing sessions to subscribers through the subscription index."""
+
+import json
+
+from hockey_agent import subscriptions
+from hockey_agent.subscriptions import SubscriptionIndex
+
+SATURDAY = {'session_type': 'Stick & Puck (All Ages)', 'date_time': 'Saturday 8th November 2025 10:00am-11:00am'}
+MONDAY = {'session_type': 'Scrimmage', 'date_time': 'Monday 10th November 2025 7:00pm-8:00pm'}
+
+
+def test_weekday_filter():
+    index = SubscriptionIndex([{'id': 'weekend', 'days': [5, 6]}, {'id': 'monday', 'days': [0]}])
+    assert index.match(SATURDAY) == {'weekend'}
+    assert index.match(MONDAY) == {'monday'}
+
+
+def test_date_filter():
+    index = SubscriptionIndex([{'id': 'alice', 'dates': ['2025-11-08']}])
+    assert index.match(SATURDAY) == {'alice'}
+    assert index.match(MONDAY) == set()
+
+
+def test_day_or_date_matches():
+    index = SubscriptionIndex([{'id': 'alice', 'days': [0], 'dates': ['2025-11-08']}])
+    assert index.match(SATURDAY) == {'alice'}
+    assert index.match(MONDAY) == {'alice'}
+
+
+def test_session_type_is_a_substring_match():
+    index = SubscriptionIndex([{'id': 'puck', 'session_types': ['stick & puck']},
+                               {'id': 'games', 'session_types': ['Scrimmage']}])
+    assert index.match(SATURDAY) == {'puck'}
+    assert index.match(MONDAY) == {'games'}
+
+
+def test_no_filters_match_everything():
+    index = SubscriptionIndex([{'id': 'all'}])
+    assert index.match(SATURDAY) == {'all'}
+    assert index.match(MONDAY) == {'all'}
+
+
+def test_booked_sessions_are_excluded_per_subscriber_in_any_format():
+    index = SubscriptionIndex([{'id': 'alice', 'booked': ['Sat 8 Nov 2025 10am']}, {'id': 'bob'}])
+    assert index.match(SATURDAY) == {'bob'}
+    assert index.is_booked('alice', SATURDAY['date_time'])
+    assert not index.is_booked('bob', SATURDAY['date_time'])
+
+
+def test_replace_and_remove():
+    index = SubscriptionIndex([{'id': 'alice', 'days': [0]}])
+    index.add({'id': 'alice', 'days': [5]})
+    assert index.match(SATURDAY) == {'alice'}
+    assert index.match(MONDAY) == set()
+
+    index.remove('alice')
+    assert index.match(SATURDAY) == set()
+    assert index._index == {}
+
+
+def test_route_keeps_session_order():
+    index = SubscriptionIndex([{'id': 'all'}, {'id': 'weekend', 'days': [5]}])
+    routed = index.route([MONDAY, SATURDAY])
+    assert routed == {'all': [MONDAY, SATURDAY], 'weekend': [SATURDAY]}
+
+
+def test_load_subscription_index(tmp_path, monkeypatch):
+    path = tmp_path / 'subscriptions.json'
+    monkeypatch.setattr(subscriptions, 'SUBSCRIPTIONS_FILE', str(path))
+    monkeypatch.setattr(subscriptions, '_cached_index', None)
+    assert subscriptions.load_subscription_index() is None
+
+    path.write_text(json.dumps({'subscribers': [{'id': 'alice', 'days': [5]}]}))
+    index = subscriptions.load_subscription_index()
+    assert index.match(SATURDAY) == {'alice'}
+    # Unchanged file: the same index
+    assert subscriptions.load_subscription_index() is index
@@ -0,0 +1,89 @@
+"""Tests for per-phase watchdog deadlines."""
+
+import threading
+import time
+
+import pytest
+
+from hockey_agent import watchdog
+from hockey_agent.watchdog import DeadlineExceeded, Watchdog
+
+
+def test_phase_within_budget():
+    dog = Watchdog({'extract': 1})
+    with dog.phase('extract') as expired:
+        dog.checkpoint()
+    assert not expired.is_set()
+    assert not dog.degraded
+
+
+def test_expired_phase_sets_event_and_checkpoint_raises():
+    dog = Watchdog({'extract': 0.02})
+    with dog.phase('extract') as expired:
+        assert expired.wait(1)
+        with pytest.raises(DeadlineExceeded) as error:
+            dog.checkpoint()
+        assert error.value.phase == 'extract'
+    assert dog.blown_phases == ['extract']
+    assert dog.degraded
+    # The overrun is cleared once its phase ends
+    dog.checkpoint()
+
+
+def test_unbounded_phase_never_expires():
+    dog = Watchdog({'extract': 0.01})
+    with dog.phase('store') as expired:
+        time.sleep(0.03)
+        dog.checkpoint()
+    assert not expired.is_set()
+
+
+def test_notify_raises_when_it_ends_late():
+    dog = Watchdog({'notify': 0.02})
+    with pytest.raises(DeadlineExceeded):
+        with dog.phase('notify') as expired:
+            expired.wait(1)
+    assert dog.blown_phases == ['notify']
+
+
+def test_spent_time_counts_against_the_budget():
+    dog = Watchdog({'store': 5})
+    with dog.phase('store', spent=5) as expired:
+        assert expired.wait(1)
+    with dog.phase('store', spent=1) as expired:
+        assert not expired.wait(0.05)
+
+
+def test_module_helpers_are_noops_without_a_watchdog():
+    with watchdog.phase('notify') as expired:
+        watchdog.checkpoint()
+    assert not expired.is_set()
+
+
+def test_watch_check_is_per_thread(monkeypatch):
+    monkeypatch.setattr(watchdog, 'WATCHDOG_ENABLED', True)
+    monkeypatch.setattr(watchdog, 'WATCHDOG_BUDGETS', {'extract': 0.02})
+    seen = {}
+
+    def other_thread():
+        seen['watchdog'] = watchdog._current()
+        watchdog.checkpoint()
+
+    with watchdog.watch_check() as dog:
+        with watchdog.phase('extract') as expired:
+            assert expired.wait(1)
+            thread = threading.Thread(target=other_thread)
+            thread.start()
+            thread.join()
+            with pytest.raises(DeadlineExceeded):
+                watchdog.checkpoint()
+    assert seen['watchdog'] is None
+    assert dog.blown_phases == ['extract']
+    assert watchdog._current() is None
+
+
+def test_watch_check_disabled(monkeypatch):
+    monkeypatch.setattr(watchdog, 'WATCHDOG_ENABLED', False)
+    with watchdog.watch_check() as dog:
+        assert dog is None
+        assert watchdog._current() is None